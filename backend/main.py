@@ -9,6 +9,7 @@ from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from dotenv import load_dotenv
 from models.database import init_db
+from services import bhashini, feed_registry, groq_whisper, ocr, sarvam
 from routers import classify, match, voice, verify, onboard, contracts
 
 load_dotenv()
@@ -61,9 +62,20 @@ async def startup_event():
     """Initialize database tables on startup."""
     init_db()
     print("✅ Database initialized")
+    await groq_whisper.init_client()
     print("✅ MSE Agent Mapping API is ready")
 
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Close pooled HTTP clients and the OCR worker pool."""
+    await feed_registry.close_client()
+    await groq_whisper.close_client()
+    await sarvam.close_client()
+    await bhashini.close_client()
+    ocr.shutdown_pool()
+
+
 # ─── Health Check ────────────────────────────────────────────────────────────
 
 @app.get("/", tags=["Health"])
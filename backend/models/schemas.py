@@ -92,3 +92,6 @@ class VerifyDocumentResponse(BaseModel):
     verification_status: str
     confidence: float
     raw_text_preview: str
+    timings: Optional[dict] = None   # per-stage ms: text_layer, rasterize, preprocess, ocr, parse, queue, total
+    extraction: Optional[str] = None  # text_layer | ocr | mixed | none | failed
+    pages: Optional[dict] = None      # pages from the text layer / OCRed (header-only or full) / skipped
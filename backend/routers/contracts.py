@@ -2,9 +2,13 @@
 Contracts Router — Live MSME Opportunity Search
 Searches 13 Indian portals (GeM, NSIC, CPPP, SIDBI, etc.) for live contracts.
 """
-from fastapi import APIRouter, Query
-from typing import Optional
-from services.contract_search import search_contracts
+import json
+import asyncio
+from fastapi import APIRouter, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from typing import List, Optional
+from services.contract_search import search_contracts, stream_contracts, decode_cursor, StaleCursorError
+from services import feed_registry, percolator, tender_store
 
 router = APIRouter(prefix="/contracts", tags=["Contract Search"])
 
@@ -14,10 +18,18 @@ router = APIRouter(prefix="/contracts", tags=["Contract Search"])
     summary="🔍 Search live MSME contracts & opportunities from 13 Indian portals",
 )
 async def search_msme_contracts(
-    product_desc: str = Query(..., description="Product or service description, e.g. 'handmade leather shoes'"),
+    product_desc: Optional[str] = Query(None, description="Product or service description, e.g. 'handmade leather shoes' (required unless `cursor` is given)"),
     location: Optional[str] = Query(None, description="City/district, e.g. 'Agra'"),
     state: Optional[str] = Query(None, description="State, e.g. 'Uttar Pradesh'"),
-    top_k: int = Query(10, ge=1, le=20, description="Number of results to return"),
+    top_k: int = Query(10, ge=1, le=20, description="Number of results per page"),
+    portal: Optional[List[str]] = Query(None, description="Facet filter: portal (repeatable)"),
+    type: Optional[List[str]] = Query(None, description="Facet filter: contract/scheme/tender/... (repeatable)"),
+    category: Optional[List[str]] = Query(None, description="Facet filter: category (repeatable)"),
+    region: Optional[List[str]] = Query(None, description="Facet filter: region (repeatable)"),
+    deadline: Optional[List[str]] = Query(
+        None, description="Facet filter: ongoing/closing_7d/closing_30d/later/closed/unspecified (repeatable)"
+    ),
+    cursor: Optional[str] = Query(None, description="`next_cursor` from a previous page; overrides the other parameters (410 once the results have been refreshed)"),
 ):
     """
     Fetches live tenders and business opportunities from:
@@ -25,15 +37,113 @@ async def search_msme_contracts(
       SC/ST Hub, ZED, TReDS, CPPP (live RSS), NIC Tenders (live RSS)
 
     Results are **ranked by relevance** to your product description + location.
+    Facet counts (portal, type, category, region, deadline) come back with every page;
+    filtering and paging reuse the cached ranking instead of re-scoring.
     """
-    return await search_contracts(
-        product_desc=product_desc,
-        location=location,
-        state=state,
-        top_k=top_k,
+    offset = 0
+    snapshot = None
+    filters = {"portal": portal, "type": type, "category": category, "region": region, "deadline": deadline}
+    if cursor:
+        try:
+            params = decode_cursor(cursor)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        product_desc = params["product_desc"]
+        location = params.get("location")
+        state = params.get("state")
+        top_k = min(max(params.get("top_k", top_k), 1), 20)
+        filters = params.get("filters") or {}
+        offset = params.get("offset", 0)
+        snapshot = params.get("snapshot")
+    elif not product_desc:
+        raise HTTPException(status_code=400, detail="product_desc is required")
+
+    try:
+        return await search_contracts(
+            product_desc=product_desc,
+            location=location,
+            state=state,
+            top_k=top_k,
+            filters={f: v for f, v in filters.items() if v},
+            offset=offset,
+            snapshot=snapshot,
+        )
+    except StaleCursorError:
+        raise HTTPException(
+            status_code=410,
+            detail="Results were refreshed since this cursor was issued. Repeat the search without a cursor.",
+        )
+
+
+@router.get(
+    "/search/stream",
+    summary="📡 Stream contract search results as live feeds arrive (Server-Sent Events)",
+)
+async def stream_msme_contracts(
+    product_desc: str = Query(..., description="Product or service description, e.g. 'handmade leather shoes'"),
+    location: Optional[str] = Query(None, description="City/district, e.g. 'Agra'"),
+    state: Optional[str] = Query(None, description="State, e.g. 'Uttar Pradesh'"),
+    top_k: int = Query(10, ge=1, le=20, description="Number of results to return"),
+):
+    """
+    Same ranking as `/contracts/search`, delivered as `text/event-stream`:
+    - `results` — curated + stored opportunities, sent immediately
+    - `update` — re-ranked results each time a live feed completes or times out
+    - `done` — final summary
+    """
+    async def event_stream():
+        async for event, payload in stream_contracts(product_desc, location, state, top_k):
+            yield f"event: {event}\ndata: {json.dumps(payload, ensure_ascii=False)}\n\n"
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
     )
 
 
+@router.get("/tenders", summary="Keyword search over accumulated live tenders")
+async def search_stored_tenders(
+    q: str = Query(..., description="Keywords, e.g. 'leather footwear supply'"),
+    limit: int = Query(20, ge=1, le=100, description="Number of tenders to return"),
+):
+    """
+    Full-text (SQLite FTS5) search over every unexpired tender collected from the
+    live RSS feeds — weeks of polls, deduplicated across feeds.
+    """
+    # SQLite calls wait on the store lock while a feed poll writes — keep them off the event loop
+    results = await asyncio.to_thread(tender_store.search, q, limit=limit)
+    return {"query": q, "results": results, "total_stored": await asyncio.to_thread(tender_store.count)}
+
+
+@router.get("/feed/{mse_id}", summary="🔔 New tenders matching an onboarded MSE's saved search")
+async def get_mse_tender_feed(
+    mse_id: int,
+    limit: int = Query(20, ge=1, le=100, description="Number of matches to return"),
+    since: Optional[float] = Query(None, description="Only matches after this UNIX timestamp"),
+):
+    """
+    Every onboarded MSE gets a saved search (product description + ONDC category + state).
+    Each newly polled tender is percolated against all saved searches; this returns the
+    MSE's matches, newest first.
+    """
+    saved_search = await asyncio.to_thread(percolator.get_saved_search, mse_id)
+    if saved_search is None:
+        raise HTTPException(status_code=404, detail=f"No saved search for MSE {mse_id}")
+    return {
+        "mse_id": mse_id,
+        "saved_search": saved_search,
+        "matches": await asyncio.to_thread(percolator.get_feed, mse_id, limit=limit, since=since),
+    }
+
+
+@router.get("/feeds", summary="Live feed registry health and statistics")
+async def list_feed_stats():
+    """Per-feed status, backoff, latency and download size for every registered live feed."""
+    feeds = feed_registry.feed_stats()
+    return {"feeds": feeds, "total": len(feeds), "percolator": await asyncio.to_thread(percolator.stats)}
+
+
 @router.get("/portals", summary="List all searched MSME portals")
 async def list_portals():
     """Returns the list of all portals searched in the contract search."""
@@ -3,6 +3,7 @@ from models.schemas import MSEOnboardRequest, MSEOnboardResponse
 from services.classifier import classify_product
 from services.matcher import find_best_snps
 from services.supabase_client import insert_mse, list_mses
+from services.percolator import register_mse
 
 router = APIRouter(prefix="/onboard", tags=["Onboarding"])
 
@@ -18,7 +19,8 @@ async def onboard_mse(request: MSEOnboardRequest):
     1. Classifies product → ONDC taxonomy + HSN code (Gemini AI)
     2. Matches MSE profile → Top-3 SNPs via TF-IDF similarity
     3. Saves to Supabase database
-    4. Returns classification result + best SNP recommendation
+    4. Registers a saved search so new matching tenders land in /contracts/feed/{id}
+    5. Returns classification result + best SNP recommendation
     """
     # Step 1: AI Classify
     classification = classify_product(request.product_description)
@@ -52,6 +54,16 @@ async def onboard_mse(request: MSEOnboardRequest):
 
     record_id = record.get("id", 0) if record else 0
 
+    # Step 4: Saved search for the tender feed
+    if record_id:
+        register_mse(
+            mse_id=record_id,
+            product_description=request.product_description,
+            state=request.state,
+            category=classification.get("category"),
+            business_name=request.business_name,
+        )
+
     return MSEOnboardResponse(
         id=record_id,
         business_name=request.business_name,
@@ -1,6 +1,7 @@
+from concurrent.futures.process import BrokenProcessPool
 from fastapi import APIRouter, UploadFile, File, HTTPException
 from models.schemas import VerifyDocumentResponse
-from services.ocr import verify_document
+from services import ocr
 
 router = APIRouter(prefix="/verify", tags=["Document Verification"])
 
@@ -26,5 +27,25 @@ async def verify_doc(file: UploadFile = File(..., description="Upload Udyam Cert
     if len(file_bytes) > 10 * 1024 * 1024:  # 10 MB limit
         raise HTTPException(status_code=413, detail="File too large. Maximum size is 10MB.")
 
-    result = verify_document(file_bytes, file.filename or "unknown")
+    try:
+        result = await ocr.verify_document_async(file_bytes, file.filename or "unknown")
+    except ocr.OCRBusy as e:
+        raise HTTPException(
+            status_code=503,
+            detail="Document scanner is busy. Please retry shortly.",
+            headers={"Retry-After": str(e.retry_after)},
+        )
+    except BrokenProcessPool:
+        # A worker crashed (e.g. out of memory on a huge scan); the pool is being replaced
+        raise HTTPException(
+            status_code=503,
+            detail="Document scanner restarted. Please retry.",
+            headers={"Retry-After": str(ocr.OCR_RETRY_AFTER)},
+        )
     return VerifyDocumentResponse(**result)
+
+
+@router.get("/stats", summary="OCR worker pool queue depth and per-stage latency")
+async def ocr_stats():
+    """Workers, in-flight documents, 503 rejections and p50/p95 per stage (rasterize, OCR, parse, queue)."""
+    return ocr.stats()
@@ -2,16 +2,32 @@
 Voice Router — Speech-to-Text + Translation
 Primary:  Groq Whisper (whisper-large-v3-turbo) — ultra-fast, auto language detect
 Fallback: Sarvam AI (saarika:v2) — Indian language specialist
+Base64 clips go through services.speech_pipeline (hedged Groq/Sarvam race by default).
+/voice/stream (WebSocket) transcribes live audio segment by segment.
 """
-from fastapi import APIRouter, UploadFile, File, Form
-from pydantic import BaseModel
-from typing import Optional
-from services.groq_whisper import transcribe_base64 as groq_transcribe_base64
+import os
+import json
+import base64
+import asyncio
+from fastapi import APIRouter, HTTPException, UploadFile, File, Form, WebSocket, WebSocketDisconnect
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, Field
+from typing import List, Optional
 from services.sarvam import (
-    transcribe_base64 as sarvam_transcribe_base64,
     translate_to_english,
+    translate_many,
     text_to_speech,
     get_supported_languages,
+    TTS_MAX_TEXT_CHARS,
+)
+from services import (
+    audio_preprocess,
+    bhashini,
+    lang_id,
+    provider_router,
+    speech_pipeline,
+    transcription_cache,
+    translation_cache,
 )
 
 router = APIRouter(prefix="/voice", tags=["Voice & Language"])
@@ -28,9 +44,34 @@ class TranslateRequest(BaseModel):
     source_lang: str = "hi"
 
 
+class TranslateBatchRequest(BaseModel):
+    texts: List[str] = Field(..., min_length=1, max_length=100)
+    source_lang: str = "hi"
+
+
 class TTSRequest(BaseModel):
-    text: str
+    text: str = Field(..., min_length=1, max_length=TTS_MAX_TEXT_CHARS)
     target_lang: str = "hi"
+    speaker: str = "meera"
+    pace: float = 1.0
+
+
+async def _with_english(result: dict) -> dict:
+    """
+    Add english_translation to a transcription result (Sarvam results already
+    have one) plus the locally identified language. The provider's
+    detected_language is only a hint — translation is skipped for English and
+    Hinglish transcripts.
+    """
+    transcript = result.get("transcript", "")
+    detected_lang = result.get("detected_language") or result.get("language") or ""
+    identified = lang_id.identify(transcript, detected_lang)
+    result = {**result, "identified_language": identified["language"], "script": identified["script"]}
+    if "english_translation" in result:
+        return result
+
+    english_text = await translate_to_english(transcript, detected_lang) if transcript else transcript
+    return {**result, "english_translation": english_text}
 
 
 @router.get("/languages", summary="List all supported Indian languages")
@@ -54,40 +95,136 @@ async def transcribe_voice_base64(request: TranscribeBase64Request):
 
     - **source_lang=auto** → Groq Whisper auto-detects language
     - **source_lang=hi/ta/te/kn/...** → Force specific language
-    - Falls back to Sarvam AI if Groq fails
+    - Sarvam AI is raced in if Groq hasn't answered within ASR_HEDGE_DELAY_MS
+      (or fails sooner); the first usable transcript wins
+    - Re-sent recordings are answered from the transcription cache
 
     Returns: transcript (regional) + english_translation + detected_language
     """
-    # Primary: Groq Whisper
-    result = await groq_transcribe_base64(
-        audio_base64=request.audio_base64,
-        source_lang=request.source_lang,
-        audio_format=request.audio_format,
-    )
+    # Decode once; both providers get the same bytes
+    audio_bytes = base64.b64decode(request.audio_base64)
 
-    # Fallback to Sarvam if Groq fails or returns empty
-    if result.get("error") or not result.get("transcript"):
-        lang = request.source_lang if request.source_lang != "auto" else "hi"
-        sarvam_result = await sarvam_transcribe_base64(
-            audio_base64=request.audio_base64,
-            source_lang=lang,
+    async def _transcribe() -> dict:
+        result = await speech_pipeline.transcribe(
+            audio_bytes,
+            source_lang=request.source_lang,
             audio_format=request.audio_format,
         )
-        if sarvam_result.get("transcript"):
-            return sarvam_result
+        return await _with_english(result)
 
-    # If Groq succeeded, add English translation for non-English
-    transcript = result.get("transcript", "")
-    detected_lang = result.get("detected_language", "hi")
+    # Retries of the same recording share one transcription
+    key = transcription_cache.key_for_bytes(audio_bytes, request.source_lang)
+    return await transcription_cache.get_or_compute(key, _transcribe)
 
-    english_text = transcript
-    if detected_lang not in ("en", "english") and transcript:
-        english_text = await translate_to_english(transcript, detected_lang[:2])
 
-    return {
-        **result,
-        "english_translation": english_text,
-    }
+_STREAM_SAMPLE_RATES = (8000, 192000)     # accepted client sample-rate range (Hz)
+_STREAM_MAX_CHANNELS = 8
+
+
+@router.websocket("/stream")
+async def transcribe_stream(websocket: WebSocket):
+    """
+    Streaming transcription over a WebSocket.
+
+    1. Client sends a JSON config: {"sample_rate": 48000, "channels": 1, "source_lang": "auto"}
+    2. Client sends binary frames of little-endian PCM16 audio as they are recorded
+    3. Each VAD-delimited speech segment is transcribed as soon as it closes and
+       pushed back as {"type": "partial", "index", "start", "end", "text", "provider"}
+    4. Client sends {"event": "end"}; the server flushes the last segment and replies
+       {"type": "final", "transcript", "english_translation", "segments", ...}
+    """
+    await websocket.accept()
+    try:
+        config = await websocket.receive_json()
+        sample_rate = int(config.get("sample_rate", 16000))
+        channels = int(config.get("channels", 1))
+        source_lang = config.get("source_lang", "auto")
+    except (ValueError, TypeError, AttributeError, KeyError):
+        # KeyError: receive_json() on a binary frame
+        await websocket.close(code=1003, reason="First message must be a JSON config")
+        return
+    if not (_STREAM_SAMPLE_RATES[0] <= sample_rate <= _STREAM_SAMPLE_RATES[1]
+            and 1 <= channels <= _STREAM_MAX_CHANNELS and isinstance(source_lang, str)):
+        await websocket.close(
+            code=1003,
+            reason=f"sample_rate must be {_STREAM_SAMPLE_RATES[0]}-{_STREAM_SAMPLE_RATES[1]}, "
+                   f"channels 1-{_STREAM_MAX_CHANNELS}",
+        )
+        return
+
+    segmenter = audio_preprocess.StreamSegmenter(sample_rate, channels)
+    send_lock = asyncio.Lock()
+    segments: dict = {}
+    tasks = []
+
+    async def _transcribe_segment(index: int, start: float, end: float, samples) -> None:
+        try:
+            wav = audio_preprocess.encode_wav(samples, sample_rate)
+            result = await speech_pipeline.transcribe(wav, source_lang, "wav")
+        except Exception as e:
+            # One bad segment yields an empty partial instead of ending the stream
+            result = {"error": str(e)}
+        segments[index] = {
+            "index": index,
+            "start": start,
+            "end": end,
+            "text": (result.get("transcript") or "").strip(),
+            "provider": result.get("provider"),
+            "language": result.get("detected_language") or result.get("language"),
+            **({"error": result["error"]} if result.get("error") else {}),
+        }
+        async with send_lock:
+            await websocket.send_json({"type": "partial", **segments[index]})
+
+    def _launch(closed) -> None:
+        for start, end, samples in closed:
+            tasks.append(asyncio.create_task(_transcribe_segment(len(tasks), start, end, samples)))
+
+    try:
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                raise WebSocketDisconnect(message.get("code", 1000))
+            if message.get("bytes"):
+                _launch(segmenter.feed(message["bytes"]))
+            elif message.get("text"):
+                try:
+                    event = json.loads(message["text"]).get("event")
+                except (ValueError, AttributeError):
+                    continue
+                if event == "end":
+                    break
+
+        _launch(segmenter.flush())
+        await asyncio.gather(*tasks)
+
+        ordered = [segments[i] for i in sorted(segments)]
+        detected = next((s["language"] for s in ordered if s["text"] and s["language"]), source_lang)
+        final = await _with_english({
+            "transcript": " ".join(s["text"] for s in ordered if s["text"]),
+            "detected_language": detected,
+        })
+        async with send_lock:
+            await websocket.send_json({"type": "final", **final, "segments": ordered})
+        await websocket.close()
+    except WebSocketDisconnect:
+        for task in tasks:
+            task.cancel()
+
+
+@router.get("/stats", summary="ASR provider win rates and latency")
+async def asr_stats():
+    """Per-provider wins / latency and end-to-end p50/p99 for hedged vs sequential ASR."""
+    return speech_pipeline.stats()
+
+
+@router.get("/providers", summary="ASR provider health, circuit breakers and routing decisions")
+async def provider_health():
+    """
+    Rolling latency / error rate, per-language quality and breaker state per ASR
+    backend, plus Bhashini's pipeline-config cache hits, fetches and auth refreshes.
+    """
+    return {**provider_router.stats(), "bhashini": bhashini.stats()}
 
 
 @router.post("/transcribe", summary="Transcribe audio file upload (multipart)")
@@ -95,21 +232,44 @@ async def transcribe_voice_file(
     file: UploadFile = File(...),
     source_lang: str = Form("auto"),
 ):
-    """Transcribe uploaded audio file (wav/mp3/webm/ogg)."""
-    import base64
-    audio_bytes = await file.read()
-    audio_b64 = base64.b64encode(audio_bytes).decode()
+    """
+    Transcribe uploaded audio file (wav/mp3/webm/ogg).
+    Compressed uploads are streamed from the spooled temp file straight to the
+    routed provider (Sarvam fallback, circuit breakers) — no read into memory,
+    no base64 round-trip. WAV uploads also get preprocessing, chunking of long
+    recordings and hedging.
+    """
     fmt = (file.filename or "audio.webm").rsplit(".", 1)[-1]
 
-    result = await groq_transcribe_base64(audio_b64, source_lang, fmt)
-    transcript = result.get("transcript", "")
-    detected_lang = result.get("detected_language", "hi")
+    # Hash the upload to dedupe retries. Only a miss copies it, so the shared
+    # transcription doesn't depend on this request's form file (closed when the
+    # request ends); hits and joined requests never touch the disk.
+    key = await asyncio.to_thread(transcription_cache.key_for_file, file.file, source_lang)
+    audio = None
+    if not transcription_cache.covers(key):
+        audio = await asyncio.to_thread(transcription_cache.copy_file, file.file)
+    started = False
 
-    english_text = transcript
-    if detected_lang not in ("en", "english") and transcript:
-        english_text = await translate_to_english(transcript, detected_lang[:2])
+    async def _transcribe() -> dict:
+        # The cached result or in-flight task can lapse while we copy
+        source = audio if audio is not None else await asyncio.to_thread(transcription_cache.copy_file, file.file)
+        with source:
+            if fmt.lower() == "wav":
+                result = await speech_pipeline.transcribe(await asyncio.to_thread(source.read), source_lang, fmt)
+            else:
+                result = await speech_pipeline.transcribe_file(source, source_lang, fmt)
+        return await _with_english(result)
 
-    return {**result, "english_translation": english_text}
+    def _start():
+        nonlocal started
+        started = True
+        return _transcribe()
+
+    try:
+        return await transcription_cache.get_or_compute(key, _start)
+    finally:
+        if audio is not None and not started:
+            audio.close()       # another request started the same clip while we copied
 
 
 @router.post("/translate", summary="Translate Indian language text to English")
@@ -123,15 +283,58 @@ async def translate_text(request: TranslateRequest):
     }
 
 
-@router.post("/tts", summary="Text-to-Speech in Indian language (Sarvam bulbul:v1)")
-async def text_to_speech_endpoint(request: TTSRequest):
-    """Convert text to speech in target Indian language."""
-    import base64
-    audio_bytes = await text_to_speech(request.text, request.target_lang)
-    if not audio_bytes:
-        return {"error": "TTS unavailable. Set SARVAM_API_KEY.", "audio_base64": None}
+@router.post("/translate/batch", summary="Translate many Indian language texts to English in one call")
+async def translate_batch(request: TranslateBatchRequest):
+    """
+    Translate up to 100 texts (e.g. every regional field of the onboarding form)
+    in one round-trip. Duplicates are translated once; results keep input order.
+    """
+    translated = await translate_many(request.texts, request.source_lang)
     return {
-        "audio_base64": base64.b64encode(audio_bytes).decode(),
-        "target_lang": request.target_lang,
-        "format": "wav",
+        "results": [
+            {"original": original, "translated": english}
+            for original, english in zip(request.texts, translated)
+        ],
+        "count": len(request.texts),
+        "unique": len(set(request.texts)),
+        "source_lang": request.source_lang,
     }
+
+
+@router.get("/translate/cache", summary="Translation cache hit-rate metrics")
+async def translation_cache_stats():
+    """Hits per tier (memory / SQLite), misses, hit rate and occupancy of the translation cache."""
+    return translation_cache.stats()
+
+
+def _iter_file(f, chunk_size: int = 64 * 1024):
+    with f:
+        while chunk := f.read(chunk_size):
+            yield chunk
+
+
+@router.post("/tts", summary="Text-to-Speech in Indian language (Sarvam bulbul:v1)")
+async def text_to_speech_endpoint(request: TTSRequest):
+    """
+    Convert text of any length to speech in the target Indian language.
+    Streams audio/wav; repeated prompts are served from the on-disk TTS cache.
+    """
+    # Open before responding so cache eviction can't pull the file out from under us.
+    # It can still be evicted between synthesis and open — then synthesize once more.
+    f = None
+    for _ in range(2):
+        path = await text_to_speech(request.text, request.target_lang, request.speaker, request.pace)
+        if path is None:
+            break
+        try:
+            f = open(path, "rb")
+            break
+        except FileNotFoundError:
+            continue
+    if f is None:
+        raise HTTPException(status_code=503, detail="TTS unavailable. Set SARVAM_API_KEY.")
+    return StreamingResponse(
+        _iter_file(f),
+        media_type="audio/wav",
+        headers={"Content-Length": str(os.fstat(f.fileno()).st_size), "X-Target-Lang": request.target_lang},
+    )
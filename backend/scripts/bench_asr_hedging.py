@@ -0,0 +1,122 @@
+"""
+Benchmark — hedged vs sequential ASR under a degraded Groq
+Groq and Sarvam are replaced by httpx.MockTransports with seeded latency
+profiles. Groq is usually fast, but some calls stall (--groq-slow) or fail
+with a 503 (--groq-fail, retried by the SDK as in production); Sarvam is
+steady. --requests distinct clips are posted to /voice/transcribe/base64
+with ASR_MODE=ab, so hedged and sequential requests interleave under the
+same conditions and provider_router state.
+
+Reports p50/p99 per mode and per-provider win rates from /voice/stats.
+Exits non-zero unless hedging lowers p99.
+
+    cd backend && python scripts/bench_asr_hedging.py --requests 200 --hedge-delay-ms 1500
+"""
+import os
+import sys
+import json
+import base64
+import random
+import asyncio
+import argparse
+from pathlib import Path
+
+_parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+_parser.add_argument("--requests", type=int, default=200)
+_parser.add_argument("--concurrency", type=int, default=20)
+_parser.add_argument("--hedge-delay-ms", type=int, default=1500)
+_parser.add_argument("--groq-slow", type=float, default=0.08, help="share of Groq calls that stall")
+_parser.add_argument("--groq-fail", type=float, default=0.04, help="share of Groq calls answering 503")
+_parser.add_argument("--seed", type=int, default=7)
+args = _parser.parse_args()
+
+# Settings are read at import time
+os.environ["GROQ_API_KEY"] = "benchmark"
+os.environ["SARVAM_API_KEY"] = "benchmark"
+os.environ["BHASHINI_USER_ID"] = os.environ["BHASHINI_API_KEY"] = ""
+os.environ["ASR_MODE"] = "ab"
+os.environ["ASR_HEDGE_DELAY_MS"] = str(args.hedge_delay_ms)
+os.environ["GROQ_MAX_CONCURRENCY"] = str(args.concurrency)
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import httpx
+from fastapi import FastAPI
+from groq import AsyncGroq
+
+from routers import voice
+from services import groq_whisper, sarvam
+
+_TRANSCRIPT = "register my udyam certificate"
+rng = random.Random(args.seed)
+
+
+async def _groq(request: httpx.Request) -> httpx.Response:
+    roll = rng.random()
+    if roll < args.groq_fail:
+        await asyncio.sleep(1.5)
+        return httpx.Response(503, json={"error": {"message": "overloaded"}})
+    if roll < args.groq_fail + args.groq_slow:
+        await asyncio.sleep(rng.uniform(4.0, 6.0))
+    else:
+        await asyncio.sleep(rng.lognormvariate(-0.8, 0.3))        # median ~450 ms
+    return httpx.Response(200, json={"text": _TRANSCRIPT, "language": "en"})
+
+
+async def _sarvam(request: httpx.Request) -> httpx.Response:
+    await asyncio.sleep(rng.uniform(0.7, 1.0))
+    return httpx.Response(200, json={"transcript": _TRANSCRIPT})
+
+
+async def run() -> int:
+    random.seed(args.seed)          # ASR_MODE=ab draws from the global generator
+    groq_whisper._client = AsyncGroq(
+        api_key="benchmark",
+        http_client=httpx.AsyncClient(transport=httpx.MockTransport(_groq)),
+    )
+    sarvam._client = httpx.AsyncClient(base_url=sarvam.SARVAM_BASE_URL, transport=httpx.MockTransport(_sarvam))
+
+    app = FastAPI()
+    app.include_router(voice.router)
+    semaphore = asyncio.Semaphore(args.concurrency)
+
+    async with httpx.AsyncClient(
+        transport=httpx.ASGITransport(app=app), base_url="http://test", timeout=60,
+    ) as client:
+        async def _post() -> None:
+            async with semaphore:
+                clip = base64.b64encode(os.urandom(8 * 1024)).decode()    # distinct clip, no cache hits
+                response = await client.post(
+                    "/voice/transcribe/base64",
+                    json={"audio_base64": clip, "source_lang": "hi", "audio_format": "webm"},
+                )
+                response.raise_for_status()
+
+        await asyncio.gather(*(_post() for _ in range(args.requests)))
+        stats = (await client.get("/voice/stats")).json()
+
+    await groq_whisper.close_client()
+    await sarvam.close_client()
+
+    end_to_end = stats["end_to_end"]
+    report = {
+        "requests": args.requests,
+        "hedge_delay_ms": args.hedge_delay_ms,
+        "groq_slow": args.groq_slow,
+        "groq_fail": args.groq_fail,
+        "end_to_end": end_to_end,
+        "win_rate": {name: p["win_rate"] for name, p in stats["providers"].items()},
+        "cancelled": {name: p["cancelled"] for name, p in stats["providers"].items()},
+    }
+    print(json.dumps(report, indent=2))
+
+    hedged, sequential = end_to_end.get("hedged", {}), end_to_end.get("sequential", {})
+    ok = bool(hedged.get("p99_ms") and sequential.get("p99_ms")) and hedged["p99_ms"] < sequential["p99_ms"]
+    print(
+        f"PASS: p99 {hedged['p99_ms']} ms hedged vs {sequential['p99_ms']} ms sequential"
+        if ok else "FAIL: hedging did not lower p99"
+    )
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(run()))
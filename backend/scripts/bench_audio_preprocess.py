@@ -0,0 +1,154 @@
+"""
+Benchmark — WAV preprocessing: upload bytes and end-to-end latency
+Synthetic browser recordings (stereo 48 kHz PCM16 with silent lead-in and
+tail around voiced, syllable-modulated harmonics) are posted to
+/voice/transcribe/base64 with AUDIO_PREPROCESS off, then on. Groq is an
+httpx.MockTransport whose latency models the upload and the model:
+
+    latency = --rtt + bytes sent / --uplink-kbps + audio seconds × --rtf
+
+so the numbers show what trimming and downsampling save on a mobile uplink.
+Requests run one at a time. Exits non-zero unless bytes drop by half and
+p50 latency goes down.
+
+    cd backend && python scripts/bench_audio_preprocess.py --uplink-kbps 2000
+"""
+import io
+import os
+import sys
+import json
+import wave
+import base64
+import asyncio
+import argparse
+from pathlib import Path
+
+os.environ["GROQ_API_KEY"] = "benchmark"
+os.environ["SARVAM_API_KEY"] = ""
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import httpx
+import numpy as np
+from fastapi import FastAPI
+from groq import AsyncGroq
+
+from routers import voice
+from services import audio_preprocess, groq_whisper, transcription_cache
+
+_RATE = 48000
+# (silent lead-in, speech, silent tail) in seconds — all under ASR_CHUNK_SECONDS
+_CLIPS = ((1.0, 2.0, 1.0), (2.0, 3.0, 2.5), (0.5, 6.0, 1.5), (1.5, 10.0, 3.0), (3.0, 4.0, 4.0))
+
+
+def _recording(lead: float, speech: float, tail: float, rng: np.random.Generator) -> bytes:
+    """Stereo 48 kHz PCM16 WAV: noise floor around a voiced section."""
+    total = int((lead + speech + tail) * _RATE)
+    samples = rng.normal(0, 0.001, (total, 2))                     # ~-60 dB room noise
+    t = np.arange(int(speech * _RATE)) / _RATE
+    pitch = 140 + 30 * np.sin(2 * np.pi * 0.5 * t)
+    phase = 2 * np.pi * np.cumsum(pitch) / _RATE
+    tone = sum(np.sin(k * phase) / k for k in range(1, 6))
+    envelope = 0.5 * (1 + np.sin(2 * np.pi * 4 * t)) ** 2 / 4       # ~4 syllables per second
+    start = int(lead * _RATE)
+    samples[start:start + len(t)] += 0.3 * (tone * envelope)[:, None]
+    pcm = (np.clip(samples, -1, 1) * 32767).astype("<i2")
+    buf = io.BytesIO()
+    with wave.open(buf, "wb") as w:
+        w.setnchannels(2)
+        w.setsampwidth(2)
+        w.setframerate(_RATE)
+        w.writeframes(pcm.tobytes())
+    return buf.getvalue()
+
+
+class MockWhisper:
+    """Answers after the modelled upload + processing time, recording bytes received."""
+
+    def __init__(self, rtt: float, uplink_kbps: float, rtf: float):
+        self.rtt, self.uplink_kbps, self.rtf = rtt, uplink_kbps, rtf
+        self.bytes = 0
+
+    async def __call__(self, request: httpx.Request) -> httpx.Response:
+        body = request.content
+        self.bytes += len(body)
+        with wave.open(io.BytesIO(body[body.find(b"RIFF"):]), "rb") as w:
+            seconds = w.getnframes() / w.getframerate()
+        await asyncio.sleep(self.rtt + len(body) * 8 / (self.uplink_kbps * 1000) + seconds * self.rtf)
+        return httpx.Response(200, json={"text": "register my udyam certificate", "language": "en"})
+
+
+async def _arm(client: httpx.AsyncClient, mock: MockWhisper, clips, enabled: bool) -> dict:
+    audio_preprocess.AUDIO_PREPROCESS = "true" if enabled else "false"
+    transcription_cache._cache.clear()          # the other arm posted the same clips
+    mock.bytes = 0
+    latencies = []
+    loop = asyncio.get_running_loop()
+    for clip in clips:
+        started = loop.time()
+        response = await client.post(
+            "/voice/transcribe/base64",
+            json={"audio_base64": base64.b64encode(clip).decode(), "source_lang": "hi", "audio_format": "wav"},
+        )
+        response.raise_for_status()
+        latencies.append((loop.time() - started) * 1000)
+    latencies.sort()
+    return {
+        "bytes_sent": mock.bytes,
+        "p50_ms": round(latencies[len(latencies) // 2], 1),
+        "mean_ms": round(sum(latencies) / len(latencies), 1),
+    }
+
+
+async def run(rtt: float, uplink_kbps: float, rtf: float, repeat: int) -> int:
+    mock = MockWhisper(rtt, uplink_kbps, rtf)
+    groq_whisper._client = AsyncGroq(
+        api_key="benchmark",
+        http_client=httpx.AsyncClient(transport=httpx.MockTransport(mock)),
+    )
+    rng = np.random.default_rng(0)
+    clips = [_recording(*shape, rng) for _ in range(repeat) for shape in _CLIPS]
+
+    app = FastAPI()
+    app.include_router(voice.router)
+    async with httpx.AsyncClient(
+        transport=httpx.ASGITransport(app=app), base_url="http://test", timeout=120,
+    ) as client:
+        raw = await _arm(client, mock, clips, enabled=False)
+        preprocessed = await _arm(client, mock, clips, enabled=True)
+
+    await groq_whisper.close_client()
+
+    prep_stats = audio_preprocess.stats()
+    reduction = 1 - preprocessed["bytes_sent"] / raw["bytes_sent"]
+    print(json.dumps({
+        "clips": len(clips),
+        "input_bytes": sum(len(c) for c in clips),
+        "model": {"rtt_s": rtt, "uplink_kbps": uplink_kbps, "rtf": rtf},
+        "raw": raw,
+        "preprocessed": preprocessed,
+        "byte_reduction": round(reduction, 3),
+        "seconds_in": prep_stats["seconds_in"],
+        "seconds_out": prep_stats["seconds_out"],
+        "preprocess_avg_ms": prep_stats["avg_ms"],
+    }, indent=2))
+
+    ok = reduction >= 0.5 and preprocessed["p50_ms"] < raw["p50_ms"]
+    print(
+        f"PASS: {reduction:.0%} fewer bytes, p50 {preprocessed['p50_ms']} ms vs {raw['p50_ms']} ms raw"
+        if ok else "FAIL: preprocessing did not cut bytes and latency"
+    )
+    return 0 if ok else 1
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--rtt", type=float, default=0.08, help="request round trip (s)")
+    parser.add_argument("--uplink-kbps", type=float, default=2000, help="client → provider bandwidth")
+    parser.add_argument("--rtf", type=float, default=0.03, help="provider seconds per audio second")
+    parser.add_argument("--repeat", type=int, default=1, help="passes over the clip set")
+    args = parser.parse_args()
+    sys.exit(asyncio.run(run(args.rtt, args.uplink_kbps, args.rtf, args.repeat)))
+
+
+if __name__ == "__main__":
+    main()
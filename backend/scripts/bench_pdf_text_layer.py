@@ -0,0 +1,174 @@
+"""
+Benchmark — embedded text layer vs rasterize + OCR for certificate PDFs
+Builds sample Udyam, GST and PAN certificates twice: as digital PDFs (text
+drawn with a PDF font, like the portals' downloads) and as scanned PDFs (the
+same page as a 200 dpi image). Each is verified with PDF_TEXT_LAYER off —
+every page rasterized and OCRed — and on. Reports p50 time, extraction
+method and fields found per document and arm.
+
+Needs the OCR toolchain of the Docker image (poppler-utils, tesseract-ocr
+with eng+hin); exits 2 if it's missing. Exits 1 unless digital certificates
+get at least as many fields from the text layer, at least 10× faster.
+
+    cd backend && python scripts/bench_pdf_text_layer.py --runs 5
+"""
+import io
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from PIL import Image, ImageDraw, ImageFont
+
+from services import ocr
+
+_PAGE_PT = (595, 842)           # A4
+_SCAN_DPI = 200
+
+CERTIFICATES = {
+    "udyam": [
+        "Government of India",
+        "Ministry of MSME",
+        "UDYAM REGISTRATION CERTIFICATE",
+        "Udyam Registration Number: UDYAM-UP-01-0001234",
+        "Name of Enterprise: Agra Leather Works",
+        "Type of Enterprise: Micro",
+        "Name of Owner: Ramesh Kumar",
+        "Date of Registration: 15/03/2022",
+        "NIC Code: 15201",
+        "Address: 12 Shoe Market, Agra, Uttar Pradesh 282003",
+    ],
+    "gst": [
+        "Government of India",
+        "Form GST REG-06",
+        "Goods and Services Tax Registration Certificate",
+        "GSTIN: 09ABCDE1234F1Z5",
+        "Legal Name: Agra Leather Works",
+        "Constitution of Business: Proprietorship",
+        "Date of Liability: 01/07/2017",
+        "Address of Principal Place of Business: 12 Shoe Market, Agra",
+    ],
+    "pan": [
+        "Income Tax Department",
+        "Government of India",
+        "Permanent Account Number Card",
+        "PAN: ABCDE1234F",
+        "Name: Ramesh Kumar",
+        "Date of Birth: 04/11/1979",
+    ],
+}
+
+
+def _digital_pdf(lines) -> bytes:
+    """One-page PDF with the lines as real text (Helvetica)."""
+    ops = ["BT", "/F1 12 Tf", "16 TL", "60 780 Td"]
+    for line in lines:
+        escaped = line.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+        ops.append(f"({escaped}) Tj T*")
+    ops.append("ET")
+    content = "\n".join(ops).encode("latin-1")
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        b"<< /Type /Pages /Kids [3 0 R] /Count 1 >>",
+        (f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 {_PAGE_PT[0]} {_PAGE_PT[1]}] "
+         f"/Resources << /Font << /F1 4 0 R >> >> /Contents 5 0 R >>").encode(),
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+        b"<< /Length %d >>\nstream\n" % len(content) + content + b"\nendstream",
+    ]
+    out = io.BytesIO()
+    out.write(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(out.tell())
+        out.write(b"%d 0 obj\n" % number + body + b"\nendobj\n")
+    xref = out.tell()
+    out.write(b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1))
+    for offset in offsets:
+        out.write(b"%010d 00000 n \n" % offset)
+    out.write(b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref))
+    return out.getvalue()
+
+
+def _scanned_pdf(lines) -> bytes:
+    """The same page as a 200 dpi greyscale image with no text layer."""
+    scale = _SCAN_DPI / 72
+    img = Image.new("L", (round(_PAGE_PT[0] * scale), round(_PAGE_PT[1] * scale)), 255)
+    draw = ImageDraw.Draw(img)
+    font = ImageFont.load_default(size=round(12 * scale))
+    y = round(62 * scale)
+    for line in lines:
+        draw.text((round(60 * scale), y), line, fill=0, font=font)
+        y += round(16 * scale)
+    out = io.BytesIO()
+    img.save(out, "PDF", resolution=_SCAN_DPI)
+    return out.getvalue()
+
+
+def _missing_tools() -> list:
+    missing = [tool for tool in ("pdftotext", "pdftoppm", "pdfinfo", "tesseract") if not shutil.which(tool)]
+    if not ocr.OCR_AVAILABLE:
+        missing.append("pytesseract")
+    if not ocr.PDF_AVAILABLE:
+        missing.append("pdf2image")
+    return missing
+
+
+def _measure(pdf: bytes, text_layer: bool, runs: int) -> dict:
+    ocr.PDF_TEXT_LAYER = text_layer
+    samples, result = [], {}
+    for _ in range(runs):
+        started = time.perf_counter()
+        result = ocr.verify_document(pdf, "certificate.pdf")
+        samples.append((time.perf_counter() - started) * 1000)
+    samples.sort()
+    return {
+        "p50_ms": round(samples[len(samples) // 2], 1),
+        "extraction": result.get("extraction"),
+        "fields": sorted(result.get("extracted_fields", {})),
+    }
+
+
+def run(runs: int) -> int:
+    missing = _missing_tools()
+    if missing:
+        print(f"SKIP: needs {', '.join(missing)} (install as in backend/Dockerfile)")
+        return 2
+
+    report, ok = {}, True
+    for name, lines in CERTIFICATES.items():
+        for kind, pdf in (("digital", _digital_pdf(lines)), ("scanned", _scanned_pdf(lines))):
+            ocr_only = _measure(pdf, text_layer=False, runs=runs)
+            fast_path = _measure(pdf, text_layer=True, runs=runs)
+            report[f"{name}_{kind}"] = {"ocr_only": ocr_only, "text_layer_first": fast_path}
+            if kind == "digital":
+                ok &= (
+                    fast_path["extraction"] == "text_layer"
+                    and set(ocr_only["fields"]) <= set(fast_path["fields"])
+                    and fast_path["p50_ms"] * 10 <= ocr_only["p50_ms"]
+                )
+    print(json.dumps({"runs": runs, "documents": report}, indent=2))
+
+    digital = [r for key, r in report.items() if key.endswith("_digital")]
+    before = sum(r["ocr_only"]["p50_ms"] for r in digital) / len(digital)
+    after = sum(r["text_layer_first"]["p50_ms"] for r in digital) / len(digital)
+    print(
+        f"PASS: digital certificates {after:.1f} ms vs {before:.1f} ms with OCR"
+        if ok else "FAIL: text layer was not used, lost fields, or wasn't 10x faster"
+    )
+    return 0 if ok else 1
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--runs", type=int, default=5, help="verifications per document and arm")
+    args = parser.parse_args()
+    sys.exit(run(args.runs))
+
+
+if __name__ == "__main__":
+    main()
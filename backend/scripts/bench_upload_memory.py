@@ -0,0 +1,156 @@
+"""
+Memory benchmark — 25 MB multipart upload to POST /voice/transcribe
+Groq is replaced by a mock transport that drains the request body in chunks
+(hashing, never keeping it), so no API key or network is needed. It can't be
+httpx.MockTransport, which reads the whole body before calling its handler.
+The same file is posted to the real route and to a copy of the old one
+(read → b64encode → transcribe_base64 → b64decode). For each, tracemalloc
+reports the peak Python heap growth during the request.
+
+The streaming route should stay at a few MB whatever the upload size. The
+old route held the audio ~3× over (raw + base64 + decoded). Exits non-zero
+if the streaming route peaks above --max-mb or the audio arrives damaged.
+
+    cd backend && python scripts/bench_upload_memory.py --size-mb 25
+"""
+import os
+import sys
+import json
+import base64
+import asyncio
+import hashlib
+import argparse
+import tempfile
+import tracemalloc
+from pathlib import Path
+
+os.environ["GROQ_API_KEY"] = "benchmark"
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import httpx
+from fastapi import FastAPI, UploadFile, File, Form
+from groq import AsyncGroq
+
+from routers import voice
+from services import groq_whisper
+
+_MB = 1024 * 1024
+
+
+class MockWhisper(httpx.AsyncBaseTransport):
+    """
+    Whisper endpoint stand-in. Streams the multipart body, hashing only the
+    file part's content: everything after the file part's headers, minus the
+    closing boundary (httpx writes file parts last).
+    """
+
+    def __init__(self):
+        self.received = 0
+        self.digest = hashlib.sha256()
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        boundary = request.headers["content-type"].split("boundary=", 1)[1].encode()
+        closing = b"\r\n--" + boundary + b"--\r\n"
+        self.received, self.digest = 0, hashlib.sha256()
+        pending, in_file = b"", False
+        async for chunk in request.stream:
+            self.received += len(chunk)
+            pending += chunk
+            if not in_file:
+                start = pending.find(b"\r\n\r\n", max(0, pending.find(b'filename="')))
+                if b'filename="' not in pending or start < 0:
+                    continue
+                pending, in_file = pending[start + 4:], True
+            # Hold back what could be the closing boundary
+            self.digest.update(pending[:-len(closing)])
+            pending = pending[-len(closing):]
+        if pending != closing:
+            return httpx.Response(400, json={"error": {"message": "malformed multipart body"}})
+        return httpx.Response(200, json={"text": "register my udyam certificate", "language": "en"})
+
+
+def _legacy_app() -> FastAPI:
+    """The previous multipart route: whole upload in memory, base64 round-trip."""
+    app = FastAPI()
+
+    @app.post("/voice/transcribe")
+    async def transcribe_voice_file(file: UploadFile = File(...), source_lang: str = Form("auto")):
+        audio_bytes = await file.read()
+        audio_b64 = base64.b64encode(audio_bytes).decode()
+        fmt = (file.filename or "audio.webm").rsplit(".", 1)[-1]
+        return await groq_whisper.transcribe_base64(audio_b64, source_lang, fmt)
+
+    return app
+
+
+def _current_app() -> FastAPI:
+    app = FastAPI()
+    app.include_router(voice.router)
+    return app
+
+
+async def _measure(app: FastAPI, path: Path, mock: MockWhisper) -> dict:
+    async with httpx.AsyncClient(
+        transport=httpx.ASGITransport(app=app), base_url="http://test", timeout=120,
+    ) as client:
+        with open(path, "rb") as f:
+            tracemalloc.reset_peak()
+            baseline = tracemalloc.get_traced_memory()[0]
+            response = await client.post(
+                "/voice/transcribe",
+                files={"file": ("clip.webm", f, "audio/webm")},
+                data={"source_lang": f"auto-{os.urandom(4).hex()}"},   # bypass the transcription cache
+            )
+            peak = tracemalloc.get_traced_memory()[1]
+    response.raise_for_status()
+    result = response.json()
+    if result.get("error"):
+        raise RuntimeError(result["error"])
+    return {"peak_mb": round((peak - baseline) / _MB, 1), "provider_received_mb": round(mock.received / _MB, 1)}
+
+
+async def run(size_mb: int, max_mb: float) -> int:
+    mock = MockWhisper()
+    groq_whisper._client = AsyncGroq(
+        api_key="benchmark",
+        http_client=httpx.AsyncClient(transport=mock),
+    )
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "clip.webm"
+        expected = hashlib.sha256()
+        with open(path, "wb") as f:
+            for _ in range(size_mb):
+                chunk = os.urandom(_MB)
+                expected.update(chunk)
+                f.write(chunk)
+
+        tracemalloc.start()
+        try:
+            current = await _measure(_current_app(), path, mock)
+            intact = mock.digest.digest() == expected.digest()
+            legacy = await _measure(_legacy_app(), path, mock)
+        finally:
+            tracemalloc.stop()
+
+    await groq_whisper.close_client()
+
+    print(json.dumps({"upload_mb": size_mb, "streaming": current, "legacy_base64": legacy}, indent=2))
+    ok = intact and current["peak_mb"] <= max_mb
+    print(
+        f"PASS: streaming peak {current['peak_mb']} MB vs {legacy['peak_mb']} MB before"
+        if ok else f"FAIL: streaming peak {current['peak_mb']} MB (limit {max_mb} MB), intact={intact}"
+    )
+    return 0 if ok else 1
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--size-mb", type=int, default=25)
+    parser.add_argument("--max-mb", type=float, default=8.0, help="allowed peak heap growth for the streaming route")
+    args = parser.parse_args()
+    sys.exit(asyncio.run(run(args.size_mb, args.max_mb)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+"""
+Load test — concurrent POST /voice/transcribe/base64 requests overlap
+Groq is replaced by an httpx.MockTransport that answers every Whisper call
+after --latency seconds, so no API key or network is needed. N distinct clips
+(no transcription-cache hits) are posted at once through the voice router.
+
+With the shared AsyncGroq client the calls overlap, capped by
+GROQ_MAX_CONCURRENCY: wall time ≈ ceil(N / cap) × latency and the mock sees
+min(N, cap) calls in flight. A blocking client would serialize them
+(wall ≈ N × latency, one in flight). Exits non-zero if the calls serialize.
+
+    cd backend && python scripts/load_test_transcribe.py --requests 16 --latency 0.5
+"""
+import os
+import sys
+import json
+import math
+import time
+import base64
+import asyncio
+import argparse
+from pathlib import Path
+
+# Groq only: no Sarvam/Bhashini to hedge to, and no hedge within the test
+os.environ["GROQ_API_KEY"] = "load-test"
+os.environ["SARVAM_API_KEY"] = ""
+os.environ["ASR_HEDGE_DELAY_MS"] = "60000"
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import httpx
+from fastapi import FastAPI
+from groq import AsyncGroq
+
+from routers import voice
+from services import groq_whisper
+
+
+class MockWhisper:
+    """Whisper endpoint stand-in that records how many calls overlap."""
+
+    def __init__(self, latency: float):
+        self.latency = latency
+        self.calls = 0
+        self.in_flight = 0
+        self.peak = 0
+
+    async def __call__(self, request: httpx.Request) -> httpx.Response:
+        await request.aread()
+        self.calls += 1
+        self.in_flight += 1
+        self.peak = max(self.peak, self.in_flight)
+        try:
+            await asyncio.sleep(self.latency)
+        finally:
+            self.in_flight -= 1
+        return httpx.Response(200, json={"text": "register my udyam certificate", "language": "en"})
+
+
+async def run(requests: int, latency: float) -> int:
+    mock = MockWhisper(latency)
+    groq_whisper._client = AsyncGroq(
+        api_key="load-test",
+        http_client=httpx.AsyncClient(transport=httpx.MockTransport(mock)),
+    )
+    app = FastAPI()
+    app.include_router(voice.router)
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+        async def _post(i: int) -> float:
+            clip = base64.b64encode(os.urandom(16 * 1024)).decode()   # distinct clip per request
+            started = time.perf_counter()
+            response = await client.post(
+                "/voice/transcribe/base64",
+                json={"audio_base64": clip, "source_lang": "auto", "audio_format": "webm"},
+            )
+            response.raise_for_status()
+            if response.json().get("provider") != "groq_whisper":
+                raise RuntimeError(f"request {i} was not served by the mock: {response.json()}")
+            return time.perf_counter() - started
+
+        started = time.perf_counter()
+        latencies = await asyncio.gather(*(_post(i) for i in range(requests)))
+        wall = time.perf_counter() - started
+
+    await groq_whisper.close_client()
+
+    cap = groq_whisper.GROQ_MAX_CONCURRENCY
+    expected = math.ceil(requests / cap) * latency
+    report = {
+        "requests": requests,
+        "mock_latency_s": latency,
+        "max_concurrency": cap,
+        "whisper_calls": mock.calls,
+        "peak_in_flight": mock.peak,
+        "wall_s": round(wall, 3),
+        "expected_wall_s": round(expected, 3),
+        "serialized_wall_s": round(requests * latency, 3),
+        "request_p50_s": round(sorted(latencies)[len(latencies) // 2], 3),
+    }
+    print(json.dumps(report, indent=2))
+
+    overlapped = mock.peak == min(requests, cap) and wall < expected + latency
+    print("PASS: requests overlap" if overlapped else "FAIL: requests serialized")
+    return 0 if overlapped else 1
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--requests", type=int, default=16)
+    parser.add_argument("--latency", type=float, default=0.5, help="mocked Whisper latency (s)")
+    args = parser.parse_args()
+    sys.exit(asyncio.run(run(args.requests, args.latency)))
+
+
+if __name__ == "__main__":
+    main()
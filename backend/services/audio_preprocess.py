@@ -0,0 +1,376 @@
+"""
+Audio Preprocessing Service — trims and normalises WAV/PCM before ASR
+Browser clips arrive as stereo 44.1/48 kHz audio with long silent lead-in and
+tail. For WAV (and raw PCM16) input this stage does, with NumPy:
+  1. mono downmix
+  2. resampling to ASR_SAMPLE_RATE (16 kHz — what Whisper and Sarvam use internally)
+  3. energy-based VAD trimming of leading/trailing silence
+and re-encodes 16-bit mono WAV. Compressed formats (webm/ogg/mp3) pass through.
+StreamSegmenter cuts live PCM16 input into VAD-delimited speech segments.
+"""
+import io
+import os
+import time
+import wave
+import random
+from collections import deque
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+AUDIO_PREPROCESS = os.getenv("AUDIO_PREPROCESS", "true").lower()    # true | false | ab (half of WAV clips)
+ASR_SAMPLE_RATE = int(os.getenv("ASR_SAMPLE_RATE", "16000"))
+VAD_THRESHOLD_DB = float(os.getenv("VAD_THRESHOLD_DB", "-35"))   # relative to the loudest frame
+VAD_FRAME_MS = 30
+VAD_PAD_MS = int(os.getenv("VAD_PAD_MS", "200"))
+
+# Streaming VAD (WebSocket input): absolute threshold, since the loudest frame isn't known yet
+STREAM_VAD_THRESHOLD_DB = float(os.getenv("STREAM_VAD_THRESHOLD_DB", "-45"))
+STREAM_SILENCE_MS = int(os.getenv("STREAM_SILENCE_MS", "600"))
+STREAM_MAX_SEGMENT_S = float(os.getenv("STREAM_MAX_SEGMENT_S", "15"))
+STREAM_MIN_SPEECH_MS = 200
+
+PCM_FORMATS = ("pcm", "pcm16", "raw")
+
+_stats = {
+    "clips": 0, "processed": 0, "passthrough": 0, "failed": 0,
+    "bytes_in": 0, "bytes_out": 0, "seconds_in": 0.0, "seconds_out": 0.0, "total_ms": 0.0,
+}
+
+
+def _enabled() -> bool:
+    """Per-clip decision; AUDIO_PREPROCESS=ab leaves half the clips raw to compare both in stats."""
+    if AUDIO_PREPROCESS == "ab":
+        return random.random() < 0.5
+    return AUDIO_PREPROCESS in ("1", "true", "yes")
+
+
+# ─── Decode / encode ────────────────────────────────────────────────────────
+
+def is_wav(data: bytes) -> bool:
+    return data[:4] == b"RIFF" and data[8:12] == b"WAVE"
+
+
+def pcm16_to_float(data: bytes, channels: int = 1) -> np.ndarray:
+    """Little-endian int16 PCM → float32 array of shape (frames, channels) in [-1, 1]."""
+    samples = np.frombuffer(data[: len(data) - len(data) % (2 * channels)], dtype="<i2")
+    return (samples.astype(np.float32) / 32768.0).reshape(-1, channels)
+
+
+def decode_wav(data: bytes) -> Tuple[np.ndarray, int]:
+    """Parse a PCM WAV into float32 (frames, channels) samples and its sample rate."""
+    with wave.open(io.BytesIO(data), "rb") as wav:
+        channels = wav.getnchannels()
+        width = wav.getsampwidth()
+        rate = wav.getframerate()
+        raw = wav.readframes(wav.getnframes())
+
+    if width == 1:
+        samples = (np.frombuffer(raw, dtype=np.uint8).astype(np.float32) - 128.0) / 128.0
+    elif width == 2:
+        samples = np.frombuffer(raw, dtype="<i2").astype(np.float32) / 32768.0
+    elif width == 3:
+        b = np.frombuffer(raw, dtype=np.uint8).reshape(-1, 3).astype(np.int32)
+        ints = b[:, 0] | (b[:, 1] << 8) | (b[:, 2] << 16)
+        ints = np.where(ints >= 1 << 23, ints - (1 << 24), ints)
+        samples = ints.astype(np.float32) / float(1 << 23)
+    elif width == 4:
+        samples = np.frombuffer(raw, dtype="<i4").astype(np.float32) / float(1 << 31)
+    else:
+        raise ValueError(f"Unsupported WAV sample width: {width}")
+    return samples.reshape(-1, channels), rate
+
+
+def encode_wav(samples: np.ndarray, rate: int) -> bytes:
+    """Mono float32 samples → 16-bit PCM WAV bytes."""
+    pcm = (np.clip(samples, -1.0, 1.0) * 32767.0).astype("<i2")
+    buf = io.BytesIO()
+    with wave.open(buf, "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(rate)
+        wav.writeframes(pcm.tobytes())
+    return buf.getvalue()
+
+
+def concat_wav(parts: List[bytes]) -> bytes:
+    """Join PCM WAVs with identical format into one WAV (frames copied, no resampling)."""
+    params = None
+    frames = []
+    for part in parts:
+        with wave.open(io.BytesIO(part), "rb") as wav:
+            p = wav.getparams()
+            if params is None:
+                params = p
+            elif (p.nchannels, p.sampwidth, p.framerate) != (params.nchannels, params.sampwidth, params.framerate):
+                raise ValueError("Cannot concatenate WAVs with different formats")
+            frames.append(wav.readframes(p.nframes))
+    buf = io.BytesIO()
+    with wave.open(buf, "wb") as out:
+        out.setnchannels(params.nchannels)
+        out.setsampwidth(params.sampwidth)
+        out.setframerate(params.framerate)
+        out.writeframes(b"".join(frames))
+    return buf.getvalue()
+
+
+# ─── DSP ────────────────────────────────────────────────────────────────────
+
+def to_mono(samples: np.ndarray) -> np.ndarray:
+    return samples.mean(axis=1) if samples.ndim == 2 else samples
+
+
+def resample(samples: np.ndarray, src_rate: int, dst_rate: int = ASR_SAMPLE_RATE) -> np.ndarray:
+    """
+    Linear-interpolation resampler. When downsampling, a moving-average
+    low-pass (width = rate ratio) is applied first to limit aliasing.
+    """
+    if src_rate == dst_rate or not len(samples):
+        return samples
+    ratio = src_rate / dst_rate
+    if ratio > 1:
+        width = int(round(ratio))
+        if width > 1:
+            samples = np.convolve(samples, np.ones(width, dtype=np.float32) / width, mode="same")
+    n_out = int(len(samples) / ratio)
+    positions = np.arange(n_out, dtype=np.float64) * ratio
+    return np.interp(positions, np.arange(len(samples)), samples).astype(np.float32)
+
+
+def frame_energy_db(samples: np.ndarray, rate: int, frame_ms: int = VAD_FRAME_MS) -> np.ndarray:
+    """RMS energy per frame in dBFS."""
+    frame = max(1, rate * frame_ms // 1000)
+    n_frames = len(samples) // frame
+    if n_frames == 0:
+        return np.empty(0, dtype=np.float32)
+    frames = samples[: n_frames * frame].reshape(n_frames, frame)
+    rms = np.sqrt(np.mean(frames * frames, axis=1))
+    return 20 * np.log10(np.maximum(rms, 1e-10))
+
+
+def voiced_frames(samples: np.ndarray, rate: int, threshold_db: float = VAD_THRESHOLD_DB) -> np.ndarray:
+    """Boolean mask of frames within `threshold_db` of the loudest frame (and above -60 dBFS)."""
+    energy = frame_energy_db(samples, rate)
+    if not len(energy):
+        return np.zeros(0, dtype=bool)
+    return energy >= max(energy.max() + threshold_db, -60.0)
+
+
+def trim_silence(samples: np.ndarray, rate: int) -> np.ndarray:
+    """Drop leading/trailing silence, keeping VAD_PAD_MS of context on each side."""
+    voiced = voiced_frames(samples, rate)
+    if not voiced.any():
+        return samples
+    frame = max(1, rate * VAD_FRAME_MS // 1000)
+    idx = np.flatnonzero(voiced)
+    pad = rate * VAD_PAD_MS // 1000
+    start = max(0, idx[0] * frame - pad)
+    end = min(len(samples), (idx[-1] + 1) * frame + pad)
+    return samples[start:end]
+
+
+def split_at_silence(
+    samples: np.ndarray, rate: int, chunk_s: float, overlap_s: float, search_s: float = 5.0
+) -> List[Tuple[int, int]]:
+    """
+    Split audio into (start, end) sample ranges of at most `chunk_s` seconds.
+    Each cut is placed at the quietest frame in the last `search_s` seconds of
+    the window, and the next chunk starts `overlap_s` before the cut so words
+    straddling a boundary are heard whole by at least one chunk.
+    """
+    total = len(samples)
+    chunk = int(chunk_s * rate)
+    if total <= chunk:
+        return [(0, total)]
+
+    frame = max(1, rate * VAD_FRAME_MS // 1000)
+    energy = frame_energy_db(samples, rate)
+    overlap = int(overlap_s * rate)
+    search = int(min(search_s, chunk_s / 2) * rate)
+
+    ranges = []
+    start = 0
+    while start < total:
+        end = start + chunk
+        if end >= total:
+            ranges.append((start, total))
+            break
+        lo, hi = (end - search) // frame, end // frame
+        window = energy[lo:hi]
+        cut = (lo + int(np.argmin(window))) * frame if len(window) else end
+        ranges.append((start, cut))
+        start = max(cut - overlap, start + 1)
+    return ranges
+
+
+# ─── Streaming VAD ──────────────────────────────────────────────────────────
+
+class StreamSegmenter:
+    """
+    Incremental energy VAD over PCM16 frames as they arrive from a recorder.
+    A segment opens on the first voiced 30 ms frame (with VAD_PAD_MS of
+    pre-roll) and closes after STREAM_SILENCE_MS of silence or
+    STREAM_MAX_SEGMENT_S of audio. feed() returns the segments it closed as
+    (start_s, end_s, mono float32 samples at the input rate).
+    """
+
+    def __init__(self, sample_rate: int, channels: int = 1):
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self._frame = max(1, sample_rate * VAD_FRAME_MS // 1000)
+        self._silence_limit = max(1, STREAM_SILENCE_MS // VAD_FRAME_MS)
+        self._max_frames = int(STREAM_MAX_SEGMENT_S * 1000 // VAD_FRAME_MS)
+        self._min_speech = max(1, STREAM_MIN_SPEECH_MS // VAD_FRAME_MS)
+        self._carry = b""
+        self._pending = np.empty(0, dtype=np.float32)
+        self._preroll: deque = deque(maxlen=max(1, VAD_PAD_MS // VAD_FRAME_MS))
+        self._segment: Optional[List[np.ndarray]] = None
+        self._start = 0
+        self._speech = 0
+        self._silence = 0
+        self._pos = 0              # input samples consumed, in frames × frame size
+
+    def feed(self, pcm: bytes) -> List[Tuple[float, float, np.ndarray]]:
+        data = self._carry + pcm
+        usable = len(data) - len(data) % (2 * self.channels)
+        self._carry = data[usable:]
+        samples = np.concatenate([self._pending, to_mono(pcm16_to_float(data[:usable], self.channels))])
+
+        n = len(samples) // self._frame
+        self._pending = samples[n * self._frame:]
+        if n == 0:
+            return []
+        frames = samples[: n * self._frame].reshape(n, self._frame)
+        energies = 20 * np.log10(np.maximum(np.sqrt(np.mean(frames * frames, axis=1)), 1e-10))
+
+        closed = []
+        for frame, energy in zip(frames, energies):
+            voiced = energy >= STREAM_VAD_THRESHOLD_DB
+            if self._segment is None:
+                if voiced:
+                    self._segment = [*self._preroll, frame]
+                    self._start = self._pos - len(self._preroll) * self._frame
+                    self._preroll.clear()
+                    self._speech, self._silence = 1, 0
+                else:
+                    self._preroll.append(frame)
+            else:
+                self._segment.append(frame)
+                if voiced:
+                    self._speech += 1
+                    self._silence = 0
+                else:
+                    self._silence += 1
+                if self._silence >= self._silence_limit or len(self._segment) >= self._max_frames:
+                    closed.extend(self._close())
+            self._pos += self._frame
+        return closed
+
+    def flush(self) -> List[Tuple[float, float, np.ndarray]]:
+        """Close whatever segment is open (end of stream)."""
+        if self._segment is not None and len(self._pending):
+            self._segment.append(self._pending)
+        self._pending = np.empty(0, dtype=np.float32)
+        return self._close()
+
+    def _close(self) -> List[Tuple[float, float, np.ndarray]]:
+        segment, self._segment = self._segment, None
+        if segment is None or self._speech < self._min_speech:
+            return []
+        samples = np.concatenate(segment)
+        start_s = self._start / self.sample_rate
+        return [(round(start_s, 3), round(start_s + len(samples) / self.sample_rate, 3), samples)]
+
+
+# ─── Public API ─────────────────────────────────────────────────────────────
+
+def preprocess(
+    audio_bytes: bytes,
+    audio_format: str = "wav",
+    sample_rate: Optional[int] = None,
+    channels: int = 1,
+) -> Tuple[bytes, str, dict]:
+    """
+    Downmix, resample and trim WAV/PCM16 audio for ASR.
+    Returns (audio_bytes, audio_format, info); anything that isn't WAV/PCM — or
+    fails to decode — is returned unchanged with info["applied"] = False.
+    info["input"] is "preprocessed", "raw" (WAV/PCM left as is) or "compressed".
+    Raw PCM needs `sample_rate` (and `channels` if not mono).
+    """
+    started = time.monotonic()
+    _stats["clips"] += 1
+    fmt = audio_format.lower()
+    info = {"applied": False, "input": "raw", "bytes_in": len(audio_bytes), "bytes_out": len(audio_bytes)}
+
+    is_pcm = fmt in PCM_FORMATS and sample_rate
+    if not (is_pcm or is_wav(audio_bytes)):
+        info["input"] = "compressed"
+    if info["input"] == "compressed" or not _enabled():
+        _stats["passthrough"] += 1
+        return audio_bytes, audio_format, info
+
+    try:
+        if is_pcm:
+            samples, rate = pcm16_to_float(audio_bytes, channels), sample_rate
+        else:
+            samples, rate = decode_wav(audio_bytes)
+        mono = to_mono(samples)
+        seconds_in = len(mono) / rate
+        mono = trim_silence(resample(mono, rate), ASR_SAMPLE_RATE)
+        out = encode_wav(mono, ASR_SAMPLE_RATE)
+    except (wave.Error, ValueError, EOFError):
+        _stats["failed"] += 1
+        return audio_bytes, audio_format, info
+
+    elapsed_ms = (time.monotonic() - started) * 1000
+    info.update({
+        "applied": True,
+        "input": "preprocessed",
+        "bytes_out": len(out),
+        "sample_rate_in": rate,
+        "channels_in": samples.shape[1],
+        "seconds_in": round(seconds_in, 3),
+        "seconds_out": round(len(mono) / ASR_SAMPLE_RATE, 3),
+        "ms": round(elapsed_ms, 2),
+    })
+    _stats["processed"] += 1
+    _stats["bytes_in"] += len(audio_bytes)
+    _stats["bytes_out"] += len(out)
+    _stats["seconds_in"] += info["seconds_in"]
+    _stats["seconds_out"] += info["seconds_out"]
+    _stats["total_ms"] += elapsed_ms
+    return out, "wav", info
+
+
+def stats() -> dict:
+    """Byte / duration reduction and processing cost across preprocessed clips."""
+    processed = _stats["processed"]
+    return {
+        "mode": AUDIO_PREPROCESS,
+        "target_sample_rate": ASR_SAMPLE_RATE,
+        **{k: round(v, 2) if isinstance(v, float) else v for k, v in _stats.items()},
+        "byte_reduction": round(1 - _stats["bytes_out"] / _stats["bytes_in"], 3) if _stats["bytes_in"] else None,
+        "avg_ms": round(_stats["total_ms"] / processed, 2) if processed else None,
+    }
+
+
+def split_wav(wav_bytes: bytes, chunk_s: float, overlap_s: float) -> List[Tuple[float, float, bytes]]:
+    """
+    Split a WAV at silence into overlapping chunks of at most `chunk_s` seconds.
+    Returns [(start_s, end_s, chunk_wav_bytes)] — a single entry (the original
+    bytes) when the clip is short enough or isn't a decodable WAV.
+    """
+    if not is_wav(wav_bytes):
+        return [(0.0, 0.0, wav_bytes)]
+    try:
+        samples, rate = decode_wav(wav_bytes)
+    except (wave.Error, ValueError, EOFError):
+        return [(0.0, 0.0, wav_bytes)]
+    mono = to_mono(samples)
+    ranges = split_at_silence(mono, rate, chunk_s, overlap_s)
+    if len(ranges) == 1:
+        return [(0.0, round(len(mono) / rate, 3), wav_bytes)]
+    return [
+        (round(start / rate, 3), round(end / rate, 3), encode_wav(mono[start:end], rate))
+        for start, end in ranges
+    ]
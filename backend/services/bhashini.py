@@ -2,11 +2,16 @@
 Bhashini ULCA Integration Service
 Handles Speech-to-Text (ASR) + Machine Translation (NMT) pipeline.
 Reference: https://bhashini.gov.in/ulca
+Async: one pooled httpx client, and the getModelsPipeline config is cached per
+(source, target) pair for BHASHINI_CONFIG_TTL seconds — refreshed early if the
+inference endpoint rejects its key — so a call normally costs one round-trip.
 """
 import os
-import requests
+import time
+import asyncio
+import httpx
 from dotenv import load_dotenv
-from typing import Optional
+from typing import Dict, Optional, Tuple
 
 load_dotenv()
 
@@ -16,6 +21,8 @@ BHASHINI_PIPELINE_ID = os.getenv("BHASHINI_PIPELINE_ID", "64392f96daac500b55c543
 
 PIPELINE_CONFIG_URL = "https://meity-auth.ulcacontrib.org/ulca/apis/v0/model/getModelsPipeline"
 INFERENCE_URL = "https://dhruva-api.bhashini.gov.in/services/inference/pipeline"
+BHASHINI_CONFIG_TTL = int(os.getenv("BHASHINI_CONFIG_TTL", "3600"))
+BHASHINI_MAX_CONNECTIONS = int(os.getenv("BHASHINI_MAX_CONNECTIONS", "20"))
 
 # Supported language codes (ISO 639-1 / Bhashini codes)
 SUPPORTED_LANGUAGES = {
@@ -29,13 +36,40 @@ SUPPORTED_LANGUAGES = {
 }
 
 
-def _is_configured() -> bool:
+def is_configured() -> bool:
     return bool(BHASHINI_USER_ID and BHASHINI_API_KEY
                 and BHASHINI_USER_ID != "your_bhashini_user_id"
                 and BHASHINI_API_KEY != "your_bhashini_ulca_api_key")
 
 
-def _get_pipeline_config(source_lang: str, target_lang: str = "en") -> Optional[dict]:
+_client: Optional[httpx.AsyncClient] = None
+_configs: Dict[Tuple[str, str], Tuple[dict, float]] = {}     # (src, tgt) → (config, expires_at)
+_config_locks: Dict[Tuple[str, str], asyncio.Lock] = {}
+_stats = {"config_hits": 0, "config_fetches": 0, "config_refreshes_on_auth": 0, "inference_calls": 0}
+
+
+def _get_client() -> httpx.AsyncClient:
+    """Shared, pooled HTTP client for config and inference calls."""
+    global _client
+    if _client is None or _client.is_closed:
+        _client = httpx.AsyncClient(
+            timeout=httpx.Timeout(30.0, connect=10.0),
+            limits=httpx.Limits(
+                max_connections=BHASHINI_MAX_CONNECTIONS,
+                max_keepalive_connections=BHASHINI_MAX_CONNECTIONS,
+            ),
+        )
+    return _client
+
+
+async def close_client() -> None:
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+
+async def _fetch_pipeline_config(source_lang: str, target_lang: str) -> Optional[dict]:
     """Fetch dynamic pipeline config from Bhashini ULCA."""
     payload = {
         "pipelineTasks": [
@@ -52,15 +86,53 @@ def _get_pipeline_config(source_lang: str, target_lang: str = "en") -> Optional[
         "ulcaApiKey": BHASHINI_API_KEY
     }
     try:
-        resp = requests.post(PIPELINE_CONFIG_URL, json=payload, headers=headers, timeout=15)
+        resp = await _get_client().post(PIPELINE_CONFIG_URL, json=payload, headers=headers, timeout=15)
         resp.raise_for_status()
         return resp.json()
-    except Exception as e:
+    except Exception:
         return None
 
 
-def _run_inference(config_response: dict, audio_base64: str) -> Optional[dict]:
-    """Run the actual ASR + NMT inference via Bhashini."""
+async def _get_pipeline_config(
+    source_lang: str, target_lang: str = "en", stale: Optional[dict] = None
+) -> Optional[dict]:
+    """
+    Cached pipeline config for a language pair. Concurrent misses for the same
+    pair share one fetch. Passing the config that just failed auth as `stale`
+    forces a refetch — unless another request already replaced it.
+    """
+    key = (source_lang, target_lang)
+
+    def _fresh() -> Optional[dict]:
+        cached = _configs.get(key)
+        if cached and cached[1] > time.monotonic() and cached[0] is not stale:
+            _stats["config_hits"] += 1
+            return cached[0]
+        return None
+
+    config = _fresh()
+    if config is not None:
+        return config
+
+    lock = _config_locks.setdefault(key, asyncio.Lock())
+    async with lock:
+        config = _fresh()
+        if config is not None:
+            return config
+        _stats["config_fetches"] += 1
+        config = await _fetch_pipeline_config(source_lang, target_lang)
+        if config is not None:
+            _configs[key] = (config, time.monotonic() + BHASHINI_CONFIG_TTL)
+        else:
+            _configs.pop(key, None)
+        return config
+
+
+async def _run_inference(config_response: dict, audio_base64: str) -> Optional[dict]:
+    """
+    Run the actual ASR + NMT inference via Bhashini.
+    Raises httpx.HTTPStatusError on 401/403 so the caller can refresh the config.
+    """
     try:
         endpoint = config_response["pipelineInferenceAPIEndPoint"]
         callback_url = endpoint["callbackUrl"]
@@ -79,13 +151,37 @@ def _run_inference(config_response: dict, audio_base64: str) -> Optional[dict]:
         }
 
         headers = {key_name: key_val, "Content-Type": "application/json"}
-        result = requests.post(callback_url, json=compute_payload, headers=headers, timeout=30)
+        _stats["inference_calls"] += 1
+        result = await _get_client().post(callback_url, json=compute_payload, headers=headers, timeout=30)
         result.raise_for_status()
         return result.json()
-    except Exception as e:
+    except httpx.HTTPStatusError as e:
+        if e.response.status_code in (401, 403):
+            raise
+        return None
+    except Exception:
         return None
 
 
+async def _infer(source_lang: str, target_lang: str, audio_base64: str) -> Tuple[Optional[dict], Optional[str]]:
+    """Config (cached) + inference, refreshing the config once on an auth failure."""
+    config = await _get_pipeline_config(source_lang, target_lang)
+    if config is None:
+        return None, "Failed to fetch Bhashini pipeline config"
+    try:
+        return await _run_inference(config, audio_base64), "Bhashini inference failed"
+    except httpx.HTTPStatusError:
+        # Inference key rotated / expired — fetch a fresh config and retry once
+        _stats["config_refreshes_on_auth"] += 1
+        config = await _get_pipeline_config(source_lang, target_lang, stale=config)
+        if config is None:
+            return None, "Failed to fetch Bhashini pipeline config"
+        try:
+            return await _run_inference(config, audio_base64), "Bhashini inference failed"
+        except httpx.HTTPStatusError as e:
+            return None, f"Bhashini inference unauthorized ({e.response.status_code})"
+
+
 def _extract_results(inference_result: dict) -> tuple[str, str]:
     """Extract transcript and translation from Bhashini pipeline response."""
     transcript = ""
@@ -124,7 +220,7 @@ def _mock_transcription(source_lang: str) -> tuple[str, str]:
     ))
 
 
-def transcribe_and_translate(audio_base64: str, source_lang: str) -> dict:
+async def transcribe_and_translate(audio_base64: str, source_lang: str) -> dict:
     """
     Main entry point. Transcribes audio and translates to English.
     Uses Bhashini if configured, otherwise returns mock demo data.
@@ -148,7 +244,7 @@ def transcribe_and_translate(audio_base64: str, source_lang: str) -> dict:
             "source_lang": source_lang
         }
 
-    if not _is_configured():
+    if not is_configured():
         transcript, translation = _mock_transcription(source_lang)
         return {
             "success": True,
@@ -159,15 +255,10 @@ def transcribe_and_translate(audio_base64: str, source_lang: str) -> dict:
         }
 
     # Live Bhashini pipeline
-    config = _get_pipeline_config(source_lang)
-    if config is None:
-        return {"success": False, "original_transcript": "", "english_translation": "",
-                "source_lang": source_lang, "error": "Failed to fetch Bhashini pipeline config"}
-
-    result = _run_inference(config, audio_base64)
+    result, error = await _infer(source_lang, "en", audio_base64)
     if result is None:
         return {"success": False, "original_transcript": "", "english_translation": "",
-                "source_lang": source_lang, "error": "Bhashini inference failed"}
+                "source_lang": source_lang, "error": error}
 
     transcript, translation = _extract_results(result)
     return {
@@ -176,3 +267,13 @@ def transcribe_and_translate(audio_base64: str, source_lang: str) -> dict:
         "english_translation": translation,
         "source_lang": source_lang
     }
+
+
+def stats() -> dict:
+    """Pipeline-config cache effectiveness and inference volume."""
+    now = time.monotonic()
+    return {
+        **_stats,
+        "cached_pairs": sum(1 for _, expires_at in _configs.values() if expires_at > now),
+        "config_ttl_seconds": BHASHINI_CONFIG_TTL,
+    }
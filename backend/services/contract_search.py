@@ -3,14 +3,14 @@ MSME Live Contract Search Service
 Fetches live tenders and opportunities from 10+ Indian MSME/government portals.
 Sorts results by TF-IDF relevance to user's product + location query.
 """
-import httpx
+import os
+import json
+import time
+import base64
 import asyncio
-from typing import List, Optional
+from typing import AsyncIterator, Dict, List, Optional, Tuple
 from datetime import datetime, timedelta
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
-import numpy as np
-import xml.etree.ElementTree as ET
+from services import feed_registry, opportunity_index, percolator, tender_store
 
 # ─── Curated Evergreen MSME Opportunities ────────────────────────────────────
 # These are always included as baseline results (stable government schemes)
@@ -182,94 +182,202 @@ CURATED_OPPORTUNITIES = [
     },
 ]
 
-# ─── Live RSS Feeds (best-effort, timeout=5s) ────────────────────────────────
-RSS_FEEDS = [
-    {
-        "name": "CPPP Tenders",
-        "url": "https://eprocure.gov.in/cppp/tendersearch/EPRFilteredTenderNotices/rss",
-        "portal": "CPPP (eprocure.gov.in)",
-        "type": "tender",
-    },
-    {
-        "name": "NIC Tenders RSS",
-        "url": "https://www.tendersinfo.com/rss/rss.php?feed=top_tenders",
-        "portal": "NIC Tender Portal",
-        "type": "tender",
-    },
+# ─── Live RSS Feeds (config-driven, see data/feeds.json) ─────────────────────
+RSS_FEEDS = feed_registry.load_feeds()
+
+PORTALS_SEARCHED = [
+    "GeM", "NSIC", "SIDBI", "KVIC", "ONDC", "DC MSME",
+    "TradeIndia", "IndiaMart", "SC/ST Hub", "ZED", "TReDS",
+    "CPPP (Live)", "NIC Tenders (Live)",
 ]
 
+# Live feed results are reused for this many seconds before re-polling
+LIVE_CACHE_TTL = int(os.getenv("CONTRACT_FEED_TTL", "300"))
+
+# Upper bound on stored tenders loaded into the ranking index
+MAX_INDEXED_TENDERS = int(os.getenv("MAX_INDEXED_TENDERS", "50000"))
+
+_live_cache = {"polled": 0, "new": 0, "snapshot_key": None, "fetched_at": float("-inf")}
+_live_lock = asyncio.Lock()
+# The poll in progress, shared by every request; streams follow it through their own queues
+_poll_task: Optional[asyncio.Task] = None
+_poll_listeners: List[asyncio.Queue] = []
+
 
-async def _fetch_rss(feed: dict) -> List[dict]:
-    """Fetch and parse an RSS feed, returning list of opportunities."""
+async def _fetch_rss(feed: dict) -> Tuple[List[dict], str]:
+    """Fetch an RSS feed via the registry, returning (opportunities, status)."""
+    entries, status = await feed_registry.fetch_feed(feed)
+    items = []
+    for entry in entries:
+        title = entry["title"]
+        link = entry["link"]
+        desc = entry["description"]
+        pub = entry["published"]
+        if title:
+            items.append({
+                "id": tender_store.tender_id(title, link, desc, pub),
+                "title": title,
+                "portal": feed["portal"],
+                "portal_url": link,
+                "category": "Government Tender",
+                "description": desc[:300] if desc else title,
+                "sectors": ["all sectors"],
+                "regions": ["all india"],
+                "deadline": pub or "See portal",
+                "published": pub,
+                "type": feed["type"],
+                "value_range": "Tender-based",
+                "eligibility": "Registered MSMEs",
+                "link": link,
+            })
+    return items, status
+
+
+async def _poll_feeds() -> AsyncIterator[tuple]:
+    """
+    Poll RSS_FEEDS concurrently and merge each feed into the tender store as
+    soon as it completes. Yields (feed, status, new_items) in completion order.
+    Caller must hold `_live_lock` (see _run_poll).
+    """
+    polled = 0
+    new_total = 0
+
+    async def _fetch(feed: dict) -> tuple:
+        items, status = await _fetch_rss(feed)
+        return feed, items, status
+
+    tasks = [asyncio.create_task(_fetch(feed)) for feed in RSS_FEEDS]
     try:
-        async with httpx.AsyncClient(timeout=5.0) as client:
-            res = await client.get(feed["url"], follow_redirects=True)
-            if res.status_code != 200:
-                return []
-            root = ET.fromstring(res.text)
-            items = []
-            for item in root.findall(".//item")[:10]:
-                title = (item.findtext("title") or "").strip()
-                link = (item.findtext("link") or "").strip()
-                desc = (item.findtext("description") or "").strip()
-                pub = (item.findtext("pubDate") or "").strip()
-                if title:
-                    items.append({
-                        "id": f"rss-{hash(title) % 100000}",
-                        "title": title,
-                        "portal": feed["portal"],
-                        "portal_url": link,
-                        "category": "Government Tender",
-                        "description": desc[:300] if desc else title,
-                        "sectors": ["all sectors"],
-                        "regions": ["all india"],
-                        "deadline": pub or "See portal",
-                        "type": feed["type"],
-                        "value_range": "Tender-based",
-                        "eligibility": "Registered MSMEs",
-                        "link": link,
-                    })
-            return items
-    except Exception:
-        return []
+        for next_done in asyncio.as_completed(tasks):
+            feed, items, status = await next_done
+            new_items = await asyncio.to_thread(_store_feed_items, items)
+            polled += len(items)
+            new_total += len(new_items)
+            yield feed, status, new_items
+    finally:
+        for task in tasks:
+            task.cancel()
+
+    await asyncio.to_thread(tender_store.expire)
+    _live_cache.update({
+        "polled": polled,
+        "new": new_total,
+        "snapshot_key": await asyncio.to_thread(tender_store.revision),
+        "fetched_at": time.monotonic(),
+    })
+
+
+def _store_feed_items(items: List[dict]) -> List[dict]:
+    """Merge polled items into the tender store and percolate the new ones."""
+    new_items = tender_store.upsert_many(items)
+    percolator.percolate(new_items)
+    return new_items
+
+
+def _live_cache_fresh() -> bool:
+    return time.monotonic() - _live_cache["fetched_at"] < LIVE_CACHE_TTL
+
+
+async def _run_poll() -> None:
+    """
+    One live poll, run as its own task so no client holds `_live_lock` while it
+    reads results. Each completed feed is posted to every listener queue as
+    (feed, status, new_items); None marks the end of the poll.
+    """
+    try:
+        async with _live_lock:
+            if not _live_cache_fresh():
+                async for feed, status, new_items in _poll_feeds():
+                    if new_items:
+                        await _refresh_index(await asyncio.to_thread(tender_store.revision))
+                    for listener in list(_poll_listeners):
+                        listener.put_nowait((feed, status, new_items))
+                # Expiry at the end of the poll may have removed tenders
+                await _refresh_index(_live_cache["snapshot_key"])
+    finally:
+        for listener in list(_poll_listeners):
+            listener.put_nowait(None)
+
+
+def _start_poll() -> asyncio.Task:
+    """The running poll task, starting one if none is in progress."""
+    global _poll_task
+    if _poll_task is None or _poll_task.done():
+        _poll_task = asyncio.create_task(_run_poll())
+    return _poll_task
+
+
+async def _get_live_opportunities() -> dict:
+    """
+    Re-poll RSS_FEEDS once the cache is stale and merge the results into the
+    tender store. Returns the poll summary with the store's snapshot key.
+    """
+    if not _live_cache_fresh():
+        # Shielded: a client that gives up doesn't cancel the poll for the others
+        await asyncio.shield(_start_poll())
+    return _live_cache
+
+
+def _load_indexed_opportunities() -> List[dict]:
+    return tender_store.active_tenders(limit=MAX_INDEXED_TENDERS) + CURATED_OPPORTUNITIES
+
+
+async def _refresh_index(snapshot_key: str) -> None:
+    """Refit the opportunity index off the event loop if the snapshot changed."""
+    if opportunity_index.snapshot_key() == snapshot_key:
+        return
+    await asyncio.to_thread(
+        opportunity_index.refresh,
+        snapshot_key,
+        _load_indexed_opportunities,
+    )
 
 
 def _score_and_sort(
-    opportunities: List[dict],
     product_desc: str,
     location: Optional[str],
     state: Optional[str],
     top_k: int,
 ) -> List[dict]:
-    """Score opportunities by TF-IDF relevance to user query."""
+    """Score opportunities by TF-IDF relevance to user query using the prefitted index."""
     query = f"{product_desc} {location or ''} {state or ''}"
+    return opportunity_index.rank(query, top_k)
 
-    corpus = []
-    for opp in opportunities:
-        text = (
-            f"{opp['title']} {opp['description']} "
-            f"{' '.join(opp.get('sectors', []))} "
-            f"{' '.join(opp.get('regions', []))}"
-        )
-        corpus.append(text)
 
-    if not corpus:
-        return []
+class StaleCursorError(ValueError):
+    """The cursor was issued against an index snapshot that has since been replaced."""
 
-    try:
-        vec = TfidfVectorizer(stop_words="english", ngram_range=(1, 2))
-        matrix = vec.fit_transform(corpus + [query])
-        scores = cosine_similarity(matrix[-1], matrix[:-1]).flatten()
-    except Exception:
-        scores = np.zeros(len(corpus))
 
-    # Attach scores and sort
-    ranked = []
-    for i, opp in enumerate(opportunities):
-        ranked.append({**opp, "match_score": round(float(scores[i]), 3)})
+def encode_cursor(params: dict) -> str:
+    raw = json.dumps(params, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
 
-    ranked.sort(key=lambda x: x["match_score"], reverse=True)
-    return ranked[:top_k]
+
+def decode_cursor(cursor: str) -> dict:
+    """Inverse of `encode_cursor`. Raises ValueError on a malformed cursor."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        params = json.loads(raw)
+    except Exception as e:
+        raise ValueError("Invalid cursor") from e
+    if not isinstance(params, dict):
+        raise ValueError("Invalid cursor")
+    product_desc = params.get("product_desc")
+    filters = params.get("filters") or {}
+    valid = (
+        isinstance(product_desc, str) and product_desc.strip()
+        and all(params.get(k) is None or isinstance(params[k], str) for k in ("location", "state", "snapshot"))
+        and all(type(params.get(k, 0)) is int and params.get(k, 0) >= 0 for k in ("top_k", "offset"))
+        and isinstance(filters, dict)
+        and all(
+            field in opportunity_index.FACET_FIELDS
+            and isinstance(values, list) and all(isinstance(v, str) for v in values)
+            for field, values in filters.items()
+        )
+    )
+    if not valid:
+        raise ValueError("Invalid cursor")
+    return params
 
 
 async def search_contracts(
@@ -277,40 +385,118 @@ async def search_contracts(
     location: Optional[str] = None,
     state: Optional[str] = None,
     top_k: int = 10,
+    filters: Optional[Dict[str, List[str]]] = None,
+    offset: int = 0,
+    snapshot: Optional[str] = None,
 ) -> dict:
     """
     Main contract search function.
     Combines live RSS + curated evergreen opportunities, sorted by relevance.
+    `filters` narrows by facet (portal, type, category, region, deadline) and
+    `offset` pages through the cached ranking; `next_cursor` encodes the next page
+    together with the index snapshot it belongs to. Paging on with `snapshot`
+    after a feed poll has replaced the index raises StaleCursorError, since the
+    offsets no longer line up.
     """
-    # Fetch live feeds concurrently (best-effort)
-    rss_tasks = [_fetch_rss(feed) for feed in RSS_FEEDS]
-    rss_results = await asyncio.gather(*rss_tasks, return_exceptions=True)
+    # Stored live tenders + curated, indexed once per store snapshot
+    live = await _get_live_opportunities()
+    await _refresh_index(live["snapshot_key"])
+    if snapshot is not None and snapshot != opportunity_index.snapshot_key():
+        raise StaleCursorError("Results changed since this cursor was issued")
 
-    live_opportunities = []
-    for result in rss_results:
-        if isinstance(result, list):
-            live_opportunities.extend(result)
+    # Score (cached per query), filter and page
+    query_text = f"{product_desc} {location or ''} {state or ''}"
+    page = opportunity_index.search(query_text, filters=filters, offset=offset, limit=top_k)
+    sorted_opps = page["results"]
 
-    # Merge: live + curated
-    all_opps = live_opportunities + CURATED_OPPORTUNITIES
-
-    # Score and sort
-    sorted_opps = _score_and_sort(all_opps, product_desc, location, state, top_k)
+    next_cursor = None
+    if page["next_offset"] is not None:
+        next_cursor = encode_cursor({
+            "product_desc": product_desc,
+            "location": location,
+            "state": state,
+            "top_k": top_k,
+            "filters": filters or {},
+            "offset": page["next_offset"],
+            "snapshot": opportunity_index.snapshot_key(),
+        })
 
     return {
         "query": {
             "product_desc": product_desc,
             "location": location,
             "state": state,
+            "filters": filters or {},
         },
-        "total_found": len(all_opps),
-        "live_count": len(live_opportunities),
+        "total_found": opportunity_index.size(),
+        "total_filtered": page["total"],
+        "total_matching": page["total_matching"],
+        "offset": offset,
+        "next_cursor": next_cursor,
+        "facets": page["facets"],
+        "live_count": opportunity_index.size() - len(CURATED_OPPORTUNITIES),
+        "new_live_count": live["new"],
         "curated_count": len(CURATED_OPPORTUNITIES),
         "results": sorted_opps,
-        "portals_searched": [
-            "GeM", "NSIC", "SIDBI", "KVIC", "ONDC", "DC MSME",
-            "TradeIndia", "IndiaMart", "SC/ST Hub", "ZED", "TReDS",
-            "CPPP (Live)", "NIC Tenders (Live)",
-        ],
+        "portals_searched": PORTALS_SEARCHED,
+        "fetched_at": datetime.utcnow().isoformat(),
+    }
+
+
+async def stream_contracts(
+    product_desc: str,
+    location: Optional[str] = None,
+    state: Optional[str] = None,
+    top_k: int = 10,
+) -> AsyncIterator[tuple]:
+    """
+    Streaming variant of `search_contracts`. Yields (event, payload) pairs:
+    - "results": ranking over curated + already-stored tenders, sent immediately
+    - "update":  re-ranked results after each live feed completes or times out
+    - "done":    final summary once every feed has reported
+    """
+    query = {"product_desc": product_desc, "location": location, "state": state}
+
+    await _refresh_index(_live_cache["snapshot_key"] or await asyncio.to_thread(tender_store.revision))
+    pending = [] if _live_cache_fresh() else [feed["name"] for feed in RSS_FEEDS]
+    yield "results", {
+        "query": query,
+        "total_found": opportunity_index.size(),
+        "results": _score_and_sort(product_desc, location, state, top_k),
+        "feeds_pending": pending,
+    }
+
+    new_total = 0
+    if pending:
+        listener: asyncio.Queue = asyncio.Queue()
+        _poll_listeners.append(listener)
+        try:
+            task = _start_poll()
+            # A poll already under way may have finished some feeds before we joined
+            while (progress := await listener.get()) is not None:
+                feed, status, new_items = progress
+                if feed["name"] in pending:
+                    pending.remove(feed["name"])
+                new_total += len(new_items)
+                yield "update", {
+                    "feed": feed["name"],
+                    "status": status,
+                    "new_count": len(new_items),
+                    "total_found": opportunity_index.size(),
+                    "results": _score_and_sort(product_desc, location, state, top_k),
+                    "feeds_pending": list(pending),
+                }
+            await asyncio.shield(task)
+        finally:
+            _poll_listeners.remove(listener)
+
+    yield "done", {
+        "query": query,
+        "total_found": opportunity_index.size(),
+        "live_count": opportunity_index.size() - len(CURATED_OPPORTUNITIES),
+        "new_live_count": new_total,
+        "curated_count": len(CURATED_OPPORTUNITIES),
+        "results": _score_and_sort(product_desc, location, state, top_k),
+        "portals_searched": PORTALS_SEARCHED,
         "fetched_at": datetime.utcnow().isoformat(),
     }
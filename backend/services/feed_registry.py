@@ -0,0 +1,291 @@
+"""
+Feed Registry Service
+Config-driven registry of live tender feeds (data/feeds.json).
+All feeds share one pooled httpx client and are fetched with conditional GETs
+(ETag / If-Modified-Since), per-feed concurrency limits, timeouts and
+exponential backoff. Per-feed latency and size statistics are kept in memory.
+Bodies are parsed incrementally as they stream in (RSS 2.0 and Atom), so a
+multi-megabyte aggregator feed costs no more than its first `max_items` entries.
+"""
+import os
+import json
+import time
+import asyncio
+import xml.etree.ElementTree as ET
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import httpx
+
+FEEDS_CONFIG = Path(os.getenv(
+    "FEEDS_CONFIG", Path(__file__).parent.parent / "data" / "feeds.json"
+))
+FEED_MAX_CONNECTIONS = int(os.getenv("FEED_MAX_CONNECTIONS", "50"))
+FEED_BUDGET_SECONDS = float(os.getenv("CONTRACT_FEED_TIMEOUT", "8"))
+
+_DEFAULTS = {
+    "type": "tender",
+    "enabled": True,
+    "timeout": 5.0,
+    "budget": FEED_BUDGET_SECONDS,
+    "max_items": 10,
+    "max_bytes": 5 * 1024 * 1024,
+    "max_concurrency": 1,
+    "backoff_base": 30,
+    "backoff_max": 1800,
+}
+
+# ─── In-memory registry ─────────────────────────────────────────────────────
+
+_feeds: List[dict] = []
+_state: Dict[str, dict] = {}
+_client: Optional[httpx.AsyncClient] = None
+
+
+def load_feeds() -> List[dict]:
+    """Load (once) and return the enabled feeds, with defaults applied."""
+    global _feeds
+    if _feeds:
+        return _feeds
+
+    with open(FEEDS_CONFIG, "r", encoding="utf-8") as f:
+        config = json.load(f)
+
+    defaults = {**_DEFAULTS, **config.get("defaults", {})}
+    _feeds = [
+        {**defaults, **feed}
+        for feed in config.get("feeds", [])
+        if feed.get("enabled", defaults["enabled"])
+    ]
+    return _feeds
+
+
+def _get_state(feed: dict) -> dict:
+    state = _state.get(feed["name"])
+    if state is None:
+        state = {
+            "semaphore": asyncio.Semaphore(feed["max_concurrency"]),
+            "etag": None,
+            "last_modified": None,
+            "entries": [],
+            "failures": 0,
+            "retry_at": 0.0,
+            "stats": {
+                "requests": 0, "ok": 0, "not_modified": 0, "truncated": 0, "errors": 0,
+                "timeouts": 0, "skipped_backoff": 0,
+                "last_status": None, "last_latency_ms": None, "avg_latency_ms": None,
+                "last_bytes": 0, "total_bytes": 0, "last_items": 0, "last_fetched_at": None,
+            },
+        }
+        _state[feed["name"]] = state
+    return state
+
+
+def get_client() -> httpx.AsyncClient:
+    """Shared, pooled HTTP client for every feed."""
+    global _client
+    if _client is None or _client.is_closed:
+        _client = httpx.AsyncClient(
+            follow_redirects=True,
+            limits=httpx.Limits(
+                max_connections=FEED_MAX_CONNECTIONS,
+                max_keepalive_connections=FEED_MAX_CONNECTIONS,
+            ),
+            headers={"User-Agent": "mse-mapper-feed-poller/1.0"},
+        )
+    return _client
+
+
+async def close_client() -> None:
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+
+# ─── Parsing ────────────────────────────────────────────────────────────────
+
+_ENTRY_TAGS = ("item", "entry")  # RSS 2.0 <item>, Atom <entry>
+
+
+def _local(tag: str) -> str:
+    """Strip the XML namespace: '{http://www.w3.org/2005/Atom}entry' → 'entry'."""
+    return tag.rsplit("}", 1)[-1]
+
+
+def _child_text(elem: ET.Element, *names: str) -> str:
+    for name in names:
+        for child in elem:
+            if _local(child.tag) == name:
+                text = "".join(child.itertext()).strip()
+                if text:
+                    return text
+    return ""
+
+
+def _entry_link(elem: ET.Element) -> str:
+    """RSS puts the URL in <link> text; Atom puts it in <link rel="alternate" href>."""
+    fallback = ""
+    for child in elem:
+        if _local(child.tag) != "link":
+            continue
+        href = child.get("href")
+        if href is None:
+            return (child.text or "").strip()
+        if child.get("rel", "alternate") == "alternate":
+            return href.strip()
+        fallback = fallback or href.strip()
+    return fallback
+
+
+def _entry_from_element(elem: ET.Element) -> dict:
+    return {
+        "title": _child_text(elem, "title"),
+        "link": _entry_link(elem),
+        "description": _child_text(elem, "description", "summary", "content"),
+        "published": _child_text(elem, "pubDate", "published", "updated", "date"),
+    }
+
+
+async def _parse_stream(res: httpx.Response, max_items: int, max_bytes: int) -> Tuple[List[dict], str, int]:
+    """
+    Incrementally parse an RSS/Atom body as it streams in. Stops after
+    `max_items` entries or `max_bytes` of body, and detaches each parsed entry
+    from the tree so memory stays bounded. Returns (entries, status, bytes_read).
+    """
+    parser = ET.XMLPullParser(events=("start", "end"))
+    stack: List[ET.Element] = []
+    entries: List[dict] = []
+    size = 0
+    status = "ok"
+
+    try:
+        async for chunk in res.aiter_bytes():
+            size += len(chunk)
+            if size > max_bytes:
+                status = "truncated"
+                break
+            parser.feed(chunk)
+            for event, elem in parser.read_events():
+                if event == "start":
+                    stack.append(elem)
+                    continue
+                stack.pop()
+                if _local(elem.tag) not in _ENTRY_TAGS:
+                    continue
+                entries.append(_entry_from_element(elem))
+                if stack:
+                    stack[-1].remove(elem)
+                elem.clear()
+                if len(entries) >= max_items:
+                    break
+            if len(entries) >= max_items:
+                break
+    except ET.ParseError:
+        # Malformed tail — keep whatever parsed cleanly before it
+        if not entries:
+            raise
+        status = "truncated"
+
+    return entries, status, size
+
+
+# ─── Fetching ───────────────────────────────────────────────────────────────
+
+def _record(state: dict, status: str, started: float, size: int = 0, items: int = 0) -> None:
+    stats = state["stats"]
+    latency_ms = round((time.monotonic() - started) * 1000, 1)
+    stats["last_status"] = status
+    stats["last_latency_ms"] = latency_ms
+    prev = stats["avg_latency_ms"]
+    stats["avg_latency_ms"] = latency_ms if prev is None else round(0.8 * prev + 0.2 * latency_ms, 1)
+    stats["last_bytes"] = size
+    stats["total_bytes"] += size
+    stats["last_items"] = items
+    stats["last_fetched_at"] = time.time()
+
+
+def _fail(feed: dict, state: dict) -> None:
+    state["failures"] += 1
+    delay = min(feed["backoff_base"] * 2 ** (state["failures"] - 1), feed["backoff_max"])
+    state["retry_at"] = time.monotonic() + delay
+
+
+async def _get(feed: dict, state: dict) -> Tuple[List[dict], str, int]:
+    headers = {}
+    if state["etag"]:
+        headers["If-None-Match"] = state["etag"]
+    if state["last_modified"]:
+        headers["If-Modified-Since"] = state["last_modified"]
+
+    request = get_client().stream("GET", feed["url"], headers=headers, timeout=feed["timeout"])
+    async with request as res:
+        if res.status_code == 304:
+            return state["entries"], "not_modified", 0
+        if res.status_code != 200:
+            return [], f"http_{res.status_code}", 0
+
+        entries, status, size = await _parse_stream(res, feed["max_items"], feed["max_bytes"])
+        state["etag"] = res.headers.get("ETag")
+        state["last_modified"] = res.headers.get("Last-Modified")
+        state["entries"] = entries
+        return entries, status, size
+
+
+async def fetch_feed(feed: dict) -> Tuple[List[dict], str]:
+    """
+    Fetch one feed within its budget. Returns (entries, status) where status is
+    ok | not_modified | truncated | backoff | timeout | error | http_<code>.
+    A 304 returns the entries parsed on the last successful fetch.
+    """
+    state = _get_state(feed)
+    stats = state["stats"]
+
+    if time.monotonic() < state["retry_at"]:
+        stats["skipped_backoff"] += 1
+        return [], "backoff"
+
+    async def _limited_get():
+        async with state["semaphore"]:
+            stats["requests"] += 1
+            return await _get(feed, state)
+
+    started = time.monotonic()
+    try:
+        entries, status, size = await asyncio.wait_for(_limited_get(), feed["budget"])
+    except (asyncio.TimeoutError, httpx.TimeoutException):
+        stats["timeouts"] += 1
+        _record(state, "timeout", started)
+        _fail(feed, state)
+        return [], "timeout"
+    except Exception:
+        stats["errors"] += 1
+        _record(state, "error", started)
+        _fail(feed, state)
+        return [], "error"
+
+    if status in ("ok", "not_modified", "truncated"):
+        stats[status] += 1
+        state["failures"] = 0
+        state["retry_at"] = 0.0
+    else:
+        stats["errors"] += 1
+        _fail(feed, state)
+    _record(state, status, started, size, len(entries))
+    return entries, status
+
+
+def feed_stats() -> List[dict]:
+    """Per-feed health, latency and size statistics for monitoring."""
+    stats = []
+    for feed in load_feeds():
+        state = _state.get(feed["name"])
+        stats.append({
+            "name": feed["name"],
+            "portal": feed["portal"],
+            "url": feed["url"],
+            "consecutive_failures": state["failures"] if state else 0,
+            "backoff_remaining_s": round(max(0.0, state["retry_at"] - time.monotonic()), 1) if state else 0.0,
+            **(state["stats"] if state else {}),
+        })
+    return stats
@@ -2,14 +2,19 @@
 Groq Whisper Service — Primary Regional Language STT
 Uses whisper-large-v3-turbo via Groq API for ultra-fast transcription.
 Supports 13 Indian languages + auto-detection.
+One long-lived AsyncGroq client (opened/closed with the app lifecycle) is shared
+by every request, so connections are reused and transcription never blocks the
+event loop. GROQ_MAX_CONCURRENCY caps in-flight Whisper calls.
 """
 import os
-import io
 import base64
-from typing import Optional
-from groq import Groq
+import asyncio
+from typing import BinaryIO, Optional, Union
+import httpx
+from groq import AsyncGroq
 
 GROQ_API_KEY = os.getenv("GROQ_API_KEY", "")
+GROQ_MAX_CONCURRENCY = int(os.getenv("GROQ_MAX_CONCURRENCY", "8"))
 
 # Whisper language codes for Indian languages
 WHISPER_LANG_MAP = {
@@ -37,19 +42,49 @@ LANGUAGE_NAMES = {
 }
 
 
-def _get_client() -> Optional[Groq]:
+_client: Optional[AsyncGroq] = None
+_semaphore = asyncio.Semaphore(GROQ_MAX_CONCURRENCY)
+
+
+def _get_client() -> Optional[AsyncGroq]:
+    global _client
     if not GROQ_API_KEY:
         return None
-    return Groq(api_key=GROQ_API_KEY)
+    if _client is None or _client.is_closed():
+        _client = AsyncGroq(
+            api_key=GROQ_API_KEY,
+            http_client=httpx.AsyncClient(
+                timeout=httpx.Timeout(60.0, connect=10.0),
+                limits=httpx.Limits(
+                    max_connections=GROQ_MAX_CONCURRENCY,
+                    max_keepalive_connections=GROQ_MAX_CONCURRENCY,
+                ),
+            ),
+        )
+    return _client
 
 
-async def transcribe_bytes(
-    audio_bytes: bytes,
+async def init_client() -> None:
+    """Open the shared Groq client at startup (no-op without GROQ_API_KEY)."""
+    _get_client()
+
+
+async def close_client() -> None:
+    global _client
+    if _client is not None:
+        await _client.close()
+        _client = None
+
+
+async def transcribe_file(
+    audio: Union[bytes, BinaryIO],
     source_lang: str = "auto",
     audio_format: str = "webm",
 ) -> dict:
     """
-    Transcribe audio bytes using Groq Whisper.
+    Transcribe audio using Groq Whisper. `audio` is raw bytes or a binary file
+    object (e.g. an upload's spooled temp file), streamed into the multipart
+    request without copying or re-encoding.
     source_lang='auto'  → Whisper auto-detects the language.
     source_lang='hi'    → Force Hindi mode.
     """
@@ -69,13 +104,14 @@ async def transcribe_bytes(
         filename = f"audio.{audio_format}"
         mime = f"audio/{audio_format}"
 
-        transcription = client.audio.transcriptions.create(
-            file=(filename, io.BytesIO(audio_bytes), mime),
-            model="whisper-large-v3-turbo",
-            language=whisper_lang,          # None triggers auto-detection
-            response_format="verbose_json", # gives language field back
-            temperature=0.0,
-        )
+        async with _semaphore:
+            transcription = await client.audio.transcriptions.create(
+                file=(filename, audio, mime),
+                model="whisper-large-v3-turbo",
+                language=whisper_lang,          # None triggers auto-detection
+                response_format="verbose_json", # gives language field back
+                temperature=0.0,
+            )
 
         detected_lang = getattr(transcription, "language", source_lang) or source_lang
         transcript = transcription.text or ""
@@ -99,6 +135,15 @@ async def transcribe_bytes(
         }
 
 
+async def transcribe_bytes(
+    audio_bytes: bytes,
+    source_lang: str = "auto",
+    audio_format: str = "webm",
+) -> dict:
+    """Transcribe raw audio bytes using Groq Whisper."""
+    return await transcribe_file(audio_bytes, source_lang, audio_format)
+
+
 async def transcribe_base64(
     audio_base64: str,
     source_lang: str = "auto",
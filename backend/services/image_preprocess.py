@@ -0,0 +1,189 @@
+"""
+Image Preprocessing Service — cleans up document images before OCR
+Phone photos of certificates arrive at 12+ MP, slightly rotated, unevenly lit
+and framed by the table they were shot on. With NumPy (PIL only to resize and
+rotate) each page image is:
+  1. downscaled to OCR_TARGET_DPI effective resolution (a photo's DPI tag is
+     meaningless, so the short side is assumed to be an A4 page width) —
+     Tesseract's time grows with the pixel count
+  2. cropped to the page: rows/columns, and blocks, much darker than the paper
+     are background
+  3. binarized with an adaptive (Bradley) threshold against the local mean, so
+     shadows and glare don't wash out half the page like a global threshold
+  4. deskewed: the angle within ±OCR_DESKEW_MAX_DEG whose horizontal projection
+     profile is sharpest (text lines collapse into narrow peaks)
+  5. trimmed of blank margins
+This runs inside the OCR worker processes, so it keeps no global stats; every
+call returns an info dict and services.ocr aggregates them.
+"""
+import os
+import time
+import random
+from typing import Optional, Tuple
+
+import numpy as np
+from PIL import Image
+
+OCR_PREPROCESS = os.getenv("OCR_PREPROCESS", "true").lower()    # true | false | ab (half of documents)
+OCR_TARGET_DPI = int(os.getenv("OCR_TARGET_DPI", "300"))
+OCR_DESKEW_MAX_DEG = float(os.getenv("OCR_DESKEW_MAX_DEG", "5"))
+
+_A4_WIDTH_IN = 8.27
+_BINARIZE_T = 0.15            # ink = more than 15% darker than the local mean
+_DESKEW_STEP_DEG = 0.25
+_DESKEW_SAMPLE_WIDTH = 800    # skew is estimated on a subsampled ink mask
+_BACKGROUND_RATIO = 0.6       # rows/cols below 60% of the page brightness are background
+_MARGIN_PAD = 12
+
+
+def should_preprocess() -> bool:
+    """Per-document decision; OCR_PREPROCESS=ab splits traffic to compare both arms in stats."""
+    if OCR_PREPROCESS == "ab":
+        return random.random() < 0.5
+    return OCR_PREPROCESS in ("1", "true", "yes")
+
+
+# ─── Steps ──────────────────────────────────────────────────────────────────
+
+def downscale(img: Image.Image, dpi: Optional[float] = None) -> Tuple[Image.Image, float]:
+    """Shrink to OCR_TARGET_DPI (never enlarge). Returns (image, effective dpi of the input)."""
+    dpi = dpi or min(img.size) / _A4_WIDTH_IN
+    scale = OCR_TARGET_DPI / dpi
+    if scale >= 1:
+        return img, dpi
+    size = (max(1, round(img.width * scale)), max(1, round(img.height * scale)))
+    return img.resize(size, Image.LANCZOS), dpi
+
+
+def _bounds(keep: np.ndarray, pad: int) -> slice:
+    idx = np.flatnonzero(keep)
+    if not len(idx):
+        return slice(0, len(keep))
+    return slice(max(0, idx[0] - pad), min(len(keep), idx[-1] + pad + 1))
+
+
+def paper_level(gray: np.ndarray) -> float:
+    """Brightness of the paper: a high percentile, since text and background are darker."""
+    return float(np.percentile(gray[::4, ::4], 90))
+
+
+def page_bounds(gray: np.ndarray, paper: float) -> Tuple[slice, slice]:
+    """Rows/columns of the page itself, dropping dark background at the edges."""
+    rows = gray.mean(axis=1) >= paper * _BACKGROUND_RATIO
+    cols = gray.mean(axis=0) >= paper * _BACKGROUND_RATIO
+    return _bounds(rows, 0), _bounds(cols, 0)
+
+
+def background_mask(gray: np.ndarray, paper: float, block: int) -> np.ndarray:
+    """
+    Background left inside the page's bounding box (corners of a tilted page).
+    Blocks whose mean is far below the paper are background — text strokes are
+    too thin to darken a whole block — grown by one block so the page edge,
+    which the adaptive threshold would turn into a thick frame, is covered too.
+    """
+    h, w = gray.shape
+    hh, ww = -(-h // block), -(-w // block)
+    padded = np.pad(gray, ((0, hh * block - h), (0, ww * block - w)), mode="edge").astype(np.float32)
+    dark = padded.reshape(hh, block, ww, block).mean(axis=(1, 3)) < paper * _BACKGROUND_RATIO
+    grown = np.pad(dark, 1)
+    dark = np.logical_or.reduce([
+        grown[1 + dy:1 + dy + hh, 1 + dx:1 + dx + ww] for dy in (-1, 0, 1) for dx in (-1, 0, 1)
+    ])
+    return np.repeat(np.repeat(dark, block, axis=0), block, axis=1)[:h, :w]
+
+
+def local_mean(gray: np.ndarray, window: int) -> np.ndarray:
+    """
+    Box-filtered mean over `window`×`window` pixels via an integral image.
+    Computed on f×f block means (f = window / 8) and repeated back up, which
+    keeps the integral image small on 300 dpi pages.
+    """
+    h, w = gray.shape
+    f = max(1, window // 8)
+    hh, ww = -(-h // f), -(-w // f)
+    padded = np.pad(gray, ((0, hh * f - h), (0, ww * f - w)), mode="edge").astype(np.float32)
+    small = padded.reshape(hh, f, ww, f).mean(axis=(1, 3))
+
+    r = max(1, window // (2 * f))
+    integral = np.pad(small.astype(np.float64).cumsum(0).cumsum(1), ((1, 0), (1, 0)))
+    ys, xs = np.arange(hh), np.arange(ww)
+    y0, y1 = np.clip(ys - r, 0, hh), np.clip(ys + r + 1, 0, hh)
+    x0, x1 = np.clip(xs - r, 0, ww), np.clip(xs + r + 1, 0, ww)
+    sums = integral[y1][:, x1] - integral[y0][:, x1] - integral[y1][:, x0] + integral[y0][:, x0]
+    mean = (sums / ((y1 - y0)[:, None] * (x1 - x0)[None, :])).astype(np.float32)
+    return np.repeat(np.repeat(mean, f, axis=0), f, axis=1)[:h, :w]
+
+
+def _window(gray: np.ndarray) -> int:
+    return max(15, min(gray.shape) // 16)
+
+
+def binarize(gray: np.ndarray) -> np.ndarray:
+    """Bradley adaptive threshold. Returns a boolean ink mask."""
+    return gray < local_mean(gray, _window(gray)) * (1 - _BINARIZE_T)
+
+
+def estimate_skew(ink: np.ndarray) -> float:
+    """
+    Degrees to rotate (counter-clockwise) to level the text lines. For each
+    candidate angle the ink pixels are sheared onto rows; the angle with the
+    most concentrated row histogram (largest sum of squares) wins.
+    """
+    step = max(1, ink.shape[1] // _DESKEW_SAMPLE_WIDTH)
+    ys, xs = np.nonzero(ink[::step, ::step])
+    if len(ys) < 100:
+        return 0.0
+    ys = ys.astype(np.float64)
+    best_angle, best_score = 0.0, -1.0
+    for angle in np.arange(-OCR_DESKEW_MAX_DEG, OCR_DESKEW_MAX_DEG + _DESKEW_STEP_DEG / 2, _DESKEW_STEP_DEG):
+        rows = ys - xs * np.tan(np.radians(angle))
+        profile = np.bincount(np.round(rows - rows.min()).astype(np.int64))
+        score = float(np.dot(profile, profile))
+        if score > best_score:
+            best_angle, best_score = float(angle), score
+    return round(best_angle, 2)
+
+
+def rotate(ink: np.ndarray, angle: float) -> np.ndarray:
+    """Rotate an ink mask counter-clockwise by `angle` degrees, padding with paper."""
+    img = Image.fromarray(np.where(ink, 0, 255).astype(np.uint8))
+    rotated = img.rotate(angle, resample=Image.BICUBIC, expand=True, fillcolor=255)
+    return np.asarray(rotated) < 128
+
+
+def trim_margins(ink: np.ndarray) -> np.ndarray:
+    rows = _bounds(ink.any(axis=1), _MARGIN_PAD)
+    cols = _bounds(ink.any(axis=0), _MARGIN_PAD)
+    return ink[rows, cols]
+
+
+# ─── Public API ─────────────────────────────────────────────────────────────
+
+def preprocess(img: Image.Image, dpi: Optional[float] = None) -> Tuple[Image.Image, dict]:
+    """
+    Downscale, crop, binarize, deskew and trim a page image for Tesseract.
+    `dpi` is the known rasterization DPI (PDF pages); photos are estimated.
+    Returns (black-on-white "L" image, info).
+    """
+    started = time.perf_counter()
+    size_in = img.size
+    small, dpi_in = downscale(img.convert("L"), dpi)
+    gray = np.asarray(small)
+    paper = paper_level(gray)
+    rows, cols = page_bounds(gray, paper)
+    gray = gray[rows, cols]
+    ink = binarize(gray) & ~background_mask(gray, paper, max(1, _window(gray) // 2))
+
+    angle = estimate_skew(ink)
+    if abs(angle) >= _DESKEW_STEP_DEG:
+        ink = rotate(ink, angle)
+    ink = trim_margins(ink)
+
+    out = Image.fromarray(np.where(ink, 0, 255).astype(np.uint8))
+    return out, {
+        "dpi_in": round(dpi_in),
+        "size_in": list(size_in),
+        "size_out": list(out.size),
+        "skew_deg": angle,
+        "ms": round((time.perf_counter() - started) * 1000, 1),
+    }
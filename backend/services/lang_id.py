@@ -0,0 +1,240 @@
+"""
+Language Identification Service — local, script-first
+Decides which of the 13 SUPPORTED_LANGUAGES a transcript is in, without a
+network call:
+  1. Unicode-block histogram of the letters picks the script. Most Indian
+     scripts belong to exactly one supported language (Tamil → ta, ...).
+  2. Scripts shared by several languages (Devanagari: hi/mr, Bengali: bn/as,
+     Latin: English/romanised Hindi) are resolved with character n-gram
+     profiles built from small seed texts (cosine similarity).
+Latin-script text — English or Hinglish — never needs Sarvam translation.
+"""
+import re
+import unicodedata
+from collections import Counter
+from typing import Dict, Optional
+
+from services import sarvam       # module import: sarvam imports this module too
+
+# ─── Scripts ────────────────────────────────────────────────────────────────
+
+_SCRIPT_RANGES = (
+    (0x0900, 0x097F, "devanagari"),
+    (0x0980, 0x09FF, "bengali"),
+    (0x0A00, 0x0A7F, "gurmukhi"),
+    (0x0A80, 0x0AFF, "gujarati"),
+    (0x0B00, 0x0B7F, "oriya"),
+    (0x0B80, 0x0BFF, "tamil"),
+    (0x0C00, 0x0C7F, "telugu"),
+    (0x0C80, 0x0CFF, "kannada"),
+    (0x0D00, 0x0D7F, "malayalam"),
+    (0x0600, 0x06FF, "arabic"),
+    (0x0750, 0x077F, "arabic"),
+    (0xFB50, 0xFDFF, "arabic"),
+    (0xFE70, 0xFEFF, "arabic"),
+    (0x0041, 0x024F, "latin"),
+)
+
+# Script → candidate languages (first one is the default when profiles can't tell)
+_SCRIPT_LANGUAGES = {
+    "devanagari": ("hi", "mr"),
+    "bengali": ("bn", "as"),
+    "gurmukhi": ("pa",),
+    "gujarati": ("gu",),
+    "oriya": ("or",),
+    "tamil": ("ta",),
+    "telugu": ("te",),
+    "kannada": ("kn",),
+    "malayalam": ("ml",),
+    "arabic": ("ur",),
+    "latin": ("en", "hinglish"),
+}
+
+# ─── Seed texts for the n-gram profiles ─────────────────────────────────────
+
+_SEED_TEXT = {
+    "hi": (
+        "मेरा व्यवसाय हस्तनिर्मित चमड़े के उत्पाद बनाता है। हम आगरा से हैं और हमारे उत्पाद पूरे "
+        "भारत में बिकते हैं। मैं अपने परिवार के साथ यह काम करता हूं। हमें सरकारी खरीद और ऑनलाइन "
+        "बिक्री में मदद चाहिए। यह हमारा पुश्तैनी काम है जो कई पीढ़ियों से चल रहा है। क्या आप हमें "
+        "नए ग्राहक ढूंढने में सहायता कर सकते हैं? हमारे पास दस कारीगर काम करते हैं और हर महीने "
+        "लगभग पांच सौ जोड़ी जूते बनते हैं। मैं हस्तनिर्मित चमड़े की चप्पल बनाता हूं।"
+    ),
+    "mr": (
+        "आम्ही हाताने विणलेल्या रेशीम साड्या बनवतो. आमचा व्यवसाय पुण्यात आहे. माझ्या कुटुंबातील "
+        "सर्व लोक हे काम करतात. आम्हाला सरकारी खरेदी आणि ऑनलाइन विक्रीसाठी मदत हवी आहे. हा आमचा "
+        "पारंपरिक व्यवसाय आहे जो अनेक पिढ्यांपासून चालू आहे. तुम्ही आम्हाला नवीन ग्राहक शोधण्यात "
+        "मदत करू शकाल का? आमच्याकडे दहा कारागीर काम करतात आणि दर महिन्याला सुमारे पाचशे साड्या "
+        "तयार होतात. मी शेतीमाल आणि कडधान्ये विकतो, त्याची गुणवत्ता चांगली आहे. मी हाताने "
+        "विणलेल्या रेशमी साड्या बनवतो."
+    ),
+    "bn": (
+        "আমরা হাতে বোনা মসলিন কাপড় তৈরি করি। আমাদের ব্যবসা মুর্শিদাবাদে। আমার পরিবারের সবাই এই "
+        "কাজ করে। আমাদের সরকারি ক্রয় এবং অনলাইন বিক্রির জন্য সাহায্য দরকার। এটি আমাদের পারিবারিক "
+        "ব্যবসা যা অনেক প্রজন্ম ধরে চলছে। আপনি কি আমাদের নতুন ক্রেতা খুঁজে পেতে সাহায্য করতে "
+        "পারবেন? আমাদের দশজন কারিগর কাজ করেন এবং প্রতি মাসে প্রায় পাঁচশো শাড়ি তৈরি হয়। আমি "
+        "হাতে তৈরি মাটির পাত্র বানাই।"
+    ),
+    "as": (
+        "আমি হাতেৰে বোৱা মুগা কাপোৰ তৈয়াৰ কৰোঁ। আমাৰ ব্যৱসায় শিৱসাগৰত অৱস্থিত। মোৰ পৰিয়ালৰ "
+        "সকলোৱে এই কাম কৰে। আমাক চৰকাৰী ক্ৰয় আৰু অনলাইন বিক্ৰীৰ বাবে সহায় লাগে। এইটো আমাৰ "
+        "পৰম্পৰাগত ব্যৱসায় যি বহু প্ৰজন্মৰ পৰা চলি আছে। আপুনি আমাক নতুন গ্ৰাহক বিচাৰি উলিওৱাত "
+        "সহায় কৰিব পাৰিবনে? আমাৰ দহজন শিল্পীয়ে কাম কৰে আৰু প্ৰতি মাহে প্ৰায় পাঁচশ খন চাদৰ "
+        "তৈয়াৰ হয়।"
+    ),
+    "en": (
+        "We manufacture handmade leather sandals and accessories. Our business is based in Agra, "
+        "Uttar Pradesh. My whole family works in this trade and we sell across India. We need help "
+        "with government procurement and online sales. This is our traditional business that has "
+        "been running for many generations. Can you help us find new customers? We have ten "
+        "artisans and every month we make about five hundred pairs of shoes."
+    ),
+    "hinglish": (
+        "Mera business handmade leather products banata hai. Hum Agra se hain aur hamare products "
+        "poore India mein bikte hain. Main apne parivar ke saath yeh kaam karta hoon. Humein "
+        "sarkari kharid aur online selling mein madad chahiye. Yeh hamara khandani kaam hai jo kai "
+        "peedhiyon se chal raha hai. Kya aap hume naye customer dhundhne mein help kar sakte ho? "
+        "Hamare paas das karigar kaam karte hain aur har mahine lagbhag paanch sau jodi joote "
+        "bante hain. Main haath se bani chappal banata hoon, hamara kaam accha chalta hai."
+    ),
+}
+
+_NGRAM_SIZES = (1, 2, 3)
+_WORD = re.compile(r"[\w\u0600-\u06FF\u0900-\u0D7F]+")    # keep Indic vowel signs inside words
+_HINT_MARGIN = 0.2         # relative n-gram score gap below which a matching hint wins
+_INDIC_MIN_SHARE = 0.25    # code-mixed text counts as Indic once a quarter of its words are
+
+_profiles: Dict[str, Dict[str, float]] = {}
+_stats = {"identified": Counter(), "translation_skipped": 0, "translation_needed": 0}
+
+
+def _ngrams(text: str) -> Counter:
+    counts: Counter = Counter()
+    for word in _WORD.findall(text.lower()):
+        padded = f" {word} "
+        for n in _NGRAM_SIZES:
+            for i in range(len(padded) - n + 1):
+                gram = padded[i:i + n]
+                if gram.strip():
+                    counts[gram] += 1
+    return counts
+
+
+def _normalize(counts: Counter) -> Dict[str, float]:
+    norm = sum(v * v for v in counts.values()) ** 0.5 or 1.0
+    return {g: v / norm for g, v in counts.items()}
+
+
+def _load() -> None:
+    if not _profiles:
+        for lang, text in _SEED_TEXT.items():
+            _profiles[lang] = _normalize(_ngrams(unicodedata.normalize("NFC", text)))
+
+
+def _script_of(ch: str) -> Optional[str]:
+    cp = ord(ch)
+    for lo, hi, script in _SCRIPT_RANGES:
+        if lo <= cp <= hi:
+            return script
+    return None
+
+
+def script_histogram(text: str) -> Counter:
+    """Words per script — each word counts for the script most of its letters are in."""
+    histogram: Counter = Counter()
+    for word in _WORD.findall(text):
+        scripts = Counter(s for s in map(_script_of, word) if s)
+        if scripts:
+            histogram[scripts.most_common(1)[0][0]] += 1
+    return histogram
+
+
+def _hint_code(hint: Optional[str]) -> str:
+    """'hi', 'hi-IN' or Whisper's 'hindi' → 'hi'."""
+    hint = (hint or "").strip().lower()
+    for code, name in sarvam.SUPPORTED_LANGUAGES.items():
+        if hint == name.split()[0].lower():
+            return code
+    return hint.split("-")[0]
+
+
+# ─── Public API ─────────────────────────────────────────────────────────────
+
+def identify(text: str, hint: Optional[str] = None) -> dict:
+    """
+    Identify the language of `text`. `hint` (e.g. the provider's detected or
+    requested language) breaks ties inside a shared script. Returns
+    {language, script, confidence, romanized, needs_translation, sarvam_code}.
+    `language` is None when the text has no letters.
+    """
+    text = unicodedata.normalize("NFC", text or "")
+    histogram = script_histogram(text)
+    if not histogram:
+        return {"language": None, "script": None, "confidence": 0.0, "romanized": False,
+                "needs_translation": False, "sarvam_code": None}
+
+    total = sum(histogram.values())
+    indic = [(s, c) for s, c in histogram.most_common() if s != "latin"]
+    if indic and indic[0][1] / total >= _INDIC_MIN_SHARE:
+        script, script_count = indic[0]
+    else:
+        script, script_count = "latin", histogram["latin"]
+    script_share = script_count / total
+    candidates = _SCRIPT_LANGUAGES[script]
+    hint = _hint_code(hint)
+
+    if len(candidates) == 1:
+        language, confidence = candidates[0], script_share
+    else:
+        _load()
+        grams = _normalize(_ngrams(text))
+        scores = {
+            lang: sum(w * _profiles[lang].get(g, 0.0) for g, w in grams.items())
+            for lang in candidates
+        }
+        ranked = sorted(scores, key=scores.get, reverse=True)
+        best, runner_up = scores[ranked[0]], scores[ranked[1]]
+        margin = (best - runner_up) / best if best else 0.0
+        language = ranked[0]
+        # Not a clear call — trust the hint if it names a candidate, else the script's default
+        if margin < _HINT_MARGIN and hint in candidates:
+            language = hint
+        elif margin < 0.05:
+            language = candidates[0]
+        confidence = script_share * min(1.0, 0.5 + margin * 5)
+
+    romanized = language == "hinglish"
+    if romanized:
+        language = "hi"
+    needs_translation = script != "latin" and language != "en"
+    return {
+        "language": language,
+        "script": script,
+        "confidence": round(confidence, 3),
+        "romanized": romanized,
+        "needs_translation": needs_translation,
+        "sarvam_code": sarvam.SARVAM_LANG_MAP.get(language, "hi-IN"),
+    }
+
+
+def resolve_translation(text: str, hint: Optional[str] = None) -> Optional[str]:
+    """
+    Language code to translate `text` from, or None when no translation is
+    needed (English / Hinglish / no letters).
+    """
+    result = identify(text, hint)
+    if result["language"]:
+        _stats["identified"]["hinglish" if result["romanized"] else result["language"]] += 1
+    if not result["needs_translation"] or result["language"] not in sarvam.SUPPORTED_LANGUAGES:
+        _stats["translation_skipped"] += 1
+        return None
+    _stats["translation_needed"] += 1
+    return result["language"]
+
+
+def stats() -> dict:
+    return {
+        "identified": dict(_stats["identified"]),
+        "translation_skipped": _stats["translation_skipped"],
+        "translation_needed": _stats["translation_needed"],
+    }
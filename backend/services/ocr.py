@@ -2,27 +2,68 @@
 OCR Document Verification Service
 Extracts structured data from Udyam Registration Certificates and GSTIN documents.
 Uses pytesseract. Tesseract OCR must be installed on the system.
+PDFs are read from their embedded text layer (pdftotext) where they have one;
+async callers go through verify_document_async(), backed by a process pool.
 """
 import re
 import io
+import os
+import math
+import time
+import shutil
+import asyncio
+import tempfile
+import subprocess
+import multiprocessing
+from collections import defaultdict, deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
 from pathlib import Path
-from typing import Optional
+from typing import Deque, Dict, List, Optional, Tuple
 
 try:
     import pytesseract
     from PIL import Image
-    # Set Tesseract path for Windows
-    pytesseract.pytesseract.tesseract_cmd = r"C:\Program Files\Tesseract-OCR\tesseract.exe"
+    from services import image_preprocess
+    # Set Tesseract path for Windows (elsewhere it's found on PATH)
+    if os.name == "nt":
+        pytesseract.pytesseract.tesseract_cmd = r"C:\Program Files\Tesseract-OCR\tesseract.exe"
     OCR_AVAILABLE = True
 except (ImportError, Exception):
     OCR_AVAILABLE = False
 
 try:
-    from pdf2image import convert_from_bytes
+    from pdf2image import convert_from_path, pdfinfo_from_path
     PDF_AVAILABLE = True
 except ImportError:
     PDF_AVAILABLE = False
 
+PDFTOTEXT_AVAILABLE = shutil.which("pdftotext") is not None
+
+
+OCR_WORKERS = int(os.getenv("OCR_WORKERS", str(min(4, os.cpu_count() or 1))))
+OCR_MAX_QUEUE = int(os.getenv("OCR_MAX_QUEUE", str(max(1, OCR_WORKERS) * 2)))
+OCR_RETRY_AFTER = int(os.getenv("OCR_RETRY_AFTER", "5"))    # seconds, used until latency is known
+PDF_TEXT_LAYER = os.getenv("PDF_TEXT_LAYER", "true").lower() == "true"
+PDF_TEXT_MIN_CHARS = int(os.getenv("PDF_TEXT_MIN_CHARS", "40"))     # fewer letters/digits → scanned page
+PDF_TEXT_TIMEOUT = float(os.getenv("PDF_TEXT_TIMEOUT", "10"))
+OCR_PAGE_PARALLELISM = int(os.getenv("OCR_PAGE_PARALLELISM", "2"))   # pages OCRed at once per document
+OCR_CASCADE = os.getenv("OCR_CASCADE", "true").lower() == "true"
+OCR_HEADER_FRACTION = float(os.getenv("OCR_HEADER_FRACTION", "0.4"))
+
+_PDF_MAX_PAGES = 3
+
+_SAMPLE_WINDOW = 500
+_STAGES = ("text_layer_ms", "rasterize_ms", "preprocess_ms", "ocr_ms", "parse_ms", "queue_ms", "total_ms")
+
+
+class OCRBusy(Exception):
+    """Too many documents already waiting for an OCR worker."""
+
+    def __init__(self, retry_after: int):
+        super().__init__(f"OCR queue full, retry after {retry_after}s")
+        self.retry_after = retry_after
+
 
 # ─── Regex Patterns ────────────────────────────────────────────────────────
 
@@ -36,29 +77,197 @@ OWNER_NAME_PATTERN = re.compile(r"(?:Owner Name|Name of Owner|Proprietor)[:\s]+(
 NIC_PATTERN = re.compile(r"NIC Code[:\s]*(\d{5})", re.IGNORECASE)
 
 
-def _extract_text_from_image(image_bytes: bytes) -> str:
+def _elapsed_ms(start: float) -> float:
+    return round((time.perf_counter() - start) * 1000, 1)
+
+
+# Everything _parse_document can fill for each document type; the header pass
+# only stands in for the full page when it found all of them.
+_CASCADE_FIELDS = {
+    "udyam_certificate": ("udyam_number", "enterprise_name", "owner_name", "registration_date", "nic_activity_code"),
+    "gst_certificate": ("gstin", "pan", "registration_date"),
+    "pan_card": ("pan", "registration_date"),
+}
+
+
+def _header_sufficient(text: str) -> bool:
+    doc_type = _detect_doc_type(text)
+    required = _CASCADE_FIELDS.get(doc_type)
+    if not required:
+        return False
+    extracted = _parse_document(text, doc_type)
+    return all(f in extracted for f in required)
+
+
+def _ocr_image(img, context: str = "") -> Tuple[str, str]:
+    """
+    OCR one page image, returning (text, tier). The identifiers are Latin
+    script and printed at the top, so with OCR_CASCADE the cheap pass comes
+    first and the result never has fewer fields than a full-page pass would.
+    Tier "header": English-only
+    OCR of the header strip (together with `context`, text already known from
+    other pages) found every field of the document type. Tier "full":
+    full-page eng+hin OCR, after an insufficient header pass or with
+    OCR_CASCADE off.
+    """
+    if OCR_CASCADE:
+        width, height = img.size
+        header = img.crop((0, 0, width, max(1, int(height * OCR_HEADER_FRACTION))))
+        text = pytesseract.image_to_string(header, lang="eng", config="--psm 6")
+        if _header_sufficient(f"{context}\n{text}"):
+            return text, "header"
+    return pytesseract.image_to_string(img, lang="eng+hin", config="--psm 6"), "full"
+
+
+def _preprocess(img, dpi: Optional[float] = None) -> Tuple["Image.Image", float]:
+    """image_preprocess.preprocess, falling back to the untouched image if it fails."""
+    try:
+        img, info = image_preprocess.preprocess(img, dpi)
+        return img, info["ms"]
+    except Exception:
+        return img, 0.0
+
+
+def _extract_text_from_image(image_bytes: bytes, timings: dict, pages: dict, preprocess: bool) -> str:
     if not OCR_AVAILABLE:
         return ""
+    start = time.perf_counter()
     img = Image.open(io.BytesIO(image_bytes))
     # Enhance for OCR
     img = img.convert("L")  # Grayscale
-    text = pytesseract.image_to_string(img, lang="eng+hin", config="--psm 6")
+    timings["rasterize_ms"] = _elapsed_ms(start)
+    if preprocess:
+        img, timings["preprocess_ms"] = _preprocess(img)
+        pages["preprocessed"] += 1
+    start = time.perf_counter()
+    text, tier = _ocr_image(img)
+    timings["ocr_ms"] = _elapsed_ms(start)
+    pages["ocr"] += 1
+    pages[f"ocr_{tier}"] += 1
     return text
 
 
-def _extract_text_from_pdf(pdf_bytes: bytes) -> str:
-    if not PDF_AVAILABLE:
-        return ""
+def _pdf_text_layer(pdf_bytes: bytes) -> List[str]:
+    """Embedded text of the first pages, one string per page; [] if pdftotext can't be used."""
+    if not (PDF_TEXT_LAYER and PDFTOTEXT_AVAILABLE):
+        return []
     try:
-        pages = convert_from_bytes(pdf_bytes, dpi=200)
-        texts = []
-        for page in pages[:3]:  # Only first 3 pages
-            if OCR_AVAILABLE:
-                text = pytesseract.image_to_string(page, lang="eng+hin", config="--psm 6")
-                texts.append(text)
-        return "\n".join(texts)
-    except Exception:
-        return ""
+        proc = subprocess.run(
+            ["pdftotext", "-layout", "-enc", "UTF-8", "-f", "1", "-l", str(_PDF_MAX_PAGES), "-", "-"],
+            input=pdf_bytes, capture_output=True, timeout=PDF_TEXT_TIMEOUT, check=True,
+        )
+    except (OSError, subprocess.SubprocessError):
+        return []
+    text = proc.stdout.decode("utf-8", errors="replace")
+    pages = text.split("\f")          # pdftotext ends every page with a form feed
+    return pages[:-1] if text.endswith("\f") else pages
+
+
+def _has_text(page_text: str) -> bool:
+    return sum(ch.isalnum() for ch in page_text) >= PDF_TEXT_MIN_CHARS
+
+
+def _key_fields_found(text: str) -> bool:
+    """True once `text` holds every field _calculate_confidence wants for its document type."""
+    doc_type = _detect_doc_type(text)
+    return _calculate_confidence(_parse_document(text, doc_type), doc_type) >= 1.0
+
+
+def _ocr_pdf_page(
+    pdf_path: str, page_no: int, context: str, preprocess: bool,
+) -> Tuple[str, str, float, float, float]:
+    """
+    Rasterize, preprocess and OCR one page; its image is dropped as soon as
+    Tesseract is done. Returns (text, tier, rasterize_ms, preprocess_ms, ocr_ms).
+    """
+    start = time.perf_counter()
+    images = convert_from_path(pdf_path, dpi=200, first_page=page_no, last_page=page_no)
+    rasterize_ms = _elapsed_ms(start)
+    if not images:
+        return "", "", rasterize_ms, 0.0, 0.0
+    img, preprocess_ms = images[0], 0.0
+    if preprocess:
+        img, preprocess_ms = _preprocess(img, dpi=200)
+    start = time.perf_counter()
+    text, tier = _ocr_image(img, context)
+    return text, tier, rasterize_ms, preprocess_ms, _elapsed_ms(start)
+
+
+def _ocr_scanned_pages(
+    pdf_bytes: bytes, scanned: List[int], texts: List[str], timings: dict, pages: dict, preprocess: bool,
+) -> None:
+    """
+    OCR the `scanned` page indexes into `texts`, OCR_PAGE_PARALLELISM pages at
+    a time (Tesseract runs as a subprocess, so the threads use separate cores),
+    each rasterized only when its turn comes. Returns as soon as the
+    key fields are found. Timings are summed across pages.
+    """
+    # A page still in Tesseract at early exit finishes in the background;
+    # on Windows its open PDF may block removing the temp dir, hence ignore errors.
+    with tempfile.TemporaryDirectory(ignore_cleanup_errors=True) as tmp:
+        pdf_path = os.path.join(tmp, "document.pdf")
+        with open(pdf_path, "wb") as f:
+            f.write(pdf_bytes)
+        try:
+            page_count = int(pdfinfo_from_path(pdf_path)["Pages"])
+        except Exception:
+            page_count = _PDF_MAX_PAGES
+        todo = [i for i in scanned if i < page_count]
+
+        pool = ThreadPoolExecutor(max_workers=max(1, OCR_PAGE_PARALLELISM))
+        try:
+            context = "\n".join(texts)      # text-layer pages, if any
+            futures = {pool.submit(_ocr_pdf_page, pdf_path, i + 1, context, preprocess): i for i in todo}
+            for future in as_completed(futures):
+                try:
+                    text, tier, rasterize_ms, preprocess_ms, ocr_ms = future.result()
+                except Exception:
+                    continue
+                if tier:
+                    pages[f"ocr_{tier}"] += 1
+                timings["rasterize_ms"] = round(timings["rasterize_ms"] + rasterize_ms, 1)
+                timings["preprocess_ms"] = round(timings["preprocess_ms"] + preprocess_ms, 1)
+                if preprocess and tier:
+                    pages["preprocessed"] += 1
+                timings["ocr_ms"] = round(timings["ocr_ms"] + ocr_ms, 1)
+                texts[futures[future]] = text
+                pages["ocr"] += 1
+                if _key_fields_found("\n".join(texts)):
+                    pages["skipped"] = sum(1 for f in futures if not f.done())
+                    break
+        finally:
+            # Don't wait for pages that are no longer needed
+            pool.shutdown(wait=False, cancel_futures=True)
+
+
+def _extract_text_from_pdf(pdf_bytes: bytes, timings: dict, pages: dict, preprocess: bool) -> str:
+    """
+    Text of the first 3 pages: the embedded text layer where a page has one,
+    OCR for the rest (skipped once the text already has the key fields).
+    Certificates downloaded from the Udyam / GST portals are digital, so they
+    verify in milliseconds without Tesseract.
+    `pages` counts how each page was read.
+    """
+    start = time.perf_counter()
+    texts = _pdf_text_layer(pdf_bytes)
+    timings["text_layer_ms"] = _elapsed_ms(start)
+    if texts:
+        texts = texts[:_PDF_MAX_PAGES]
+        scanned = [i for i, t in enumerate(texts) if not _has_text(t)]
+    else:
+        scanned = list(range(_PDF_MAX_PAGES))
+        texts = [""] * _PDF_MAX_PAGES
+    pages["text_layer"] = sum(1 for t in texts if _has_text(t))
+
+    if scanned and PDF_AVAILABLE and OCR_AVAILABLE:
+        if _key_fields_found("\n".join(texts)):
+            pages["skipped"] = len(scanned)
+        else:
+            try:
+                _ocr_scanned_pages(pdf_bytes, scanned, texts, timings, pages, preprocess)
+            except Exception:
+                pass
+    return "\n".join(t for t in texts if t.strip())
 
 
 def _detect_doc_type(text: str) -> str:
@@ -142,14 +351,20 @@ def verify_document(file_bytes: bytes, filename: str) -> dict:
     Main entry point. Accepts PDF or image bytes.
     Returns extracted fields and verification status.
     """
-    if not OCR_AVAILABLE:
+    filename_lower = filename.lower()
+    is_pdf = filename_lower.endswith(".pdf")
+    # Digital PDFs only need pdftotext; everything else needs Tesseract
+    if not OCR_AVAILABLE and not (is_pdf and PDF_TEXT_LAYER and PDFTOTEXT_AVAILABLE):
         return _mock_udyam_result()
 
-    filename_lower = filename.lower()
-    if filename_lower.endswith(".pdf"):
-        text = _extract_text_from_pdf(file_bytes)
+    timings = {"text_layer_ms": 0.0, "rasterize_ms": 0.0, "preprocess_ms": 0.0, "ocr_ms": 0.0, "parse_ms": 0.0}
+    pages = {"text_layer": 0, "ocr": 0, "ocr_header": 0, "ocr_full": 0, "skipped": 0, "preprocessed": 0}
+    # OCR_PREPROCESS=ab skips cleanup for half the documents; /verify/stats compares the arms
+    preprocess = OCR_AVAILABLE and image_preprocess.should_preprocess()
+    if is_pdf:
+        text = _extract_text_from_pdf(file_bytes, timings, pages, preprocess)
     elif filename_lower.endswith((".jpg", ".jpeg", ".png", ".tiff", ".bmp")):
-        text = _extract_text_from_image(file_bytes)
+        text = _extract_text_from_image(file_bytes, timings, pages, preprocess)
     else:
         return {
             "document_type": "unsupported",
@@ -165,12 +380,17 @@ def verify_document(file_bytes: bytes, filename: str) -> dict:
             "extracted_fields": {},
             "verification_status": "unreadable",
             "confidence": 0.0,
-            "raw_text_preview": "Could not extract text from document."
+            "raw_text_preview": "Could not extract text from document.",
+            "timings": timings,
+            "extraction": _extraction_method(pages),
+            "pages": pages,
         }
 
+    start = time.perf_counter()
     doc_type = _detect_doc_type(text)
     extracted = _parse_document(text, doc_type)
     confidence = _calculate_confidence(extracted, doc_type)
+    timings["parse_ms"] = _elapsed_ms(start)
 
     status = "verified" if confidence >= 0.5 else ("partial" if extracted else "not_verified")
 
@@ -179,5 +399,211 @@ def verify_document(file_bytes: bytes, filename: str) -> dict:
         "extracted_fields": extracted,
         "verification_status": status,
         "confidence": confidence,
-        "raw_text_preview": text[:500].strip()
+        "raw_text_preview": text[:500].strip(),
+        "timings": timings,
+        "extraction": _extraction_method(pages),
+        "pages": pages,
+    }
+
+
+def _extraction_method(pages: dict) -> str:
+    """'text_layer' (no OCR needed), 'ocr', 'mixed', or 'none' when nothing was read."""
+    if pages["text_layer"] and pages["ocr"]:
+        return "mixed"
+    if pages["text_layer"]:
+        return "text_layer"
+    return "ocr" if pages["ocr"] else "none"
+
+
+# ─── Worker pool ────────────────────────────────────────────────────────────
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pending = 0
+_stage_latency: Dict[str, Deque[float]] = defaultdict(lambda: deque(maxlen=_SAMPLE_WINDOW))
+_counters = {"completed": 0, "rejected": 0, "failed": 0, "pool_restarts": 0}
+_page_counts = {"text_layer": 0, "ocr": 0, "ocr_header": 0, "ocr_full": 0, "skipped": 0, "preprocessed": 0}
+_preprocess_arms: Dict[str, dict] = defaultdict(lambda: {
+    "documents": 0, "key_fields": 0, "ms": deque(maxlen=_SAMPLE_WINDOW),
+})
+_tier_latency: Dict[str, Deque[float]] = defaultdict(lambda: deque(maxlen=_SAMPLE_WINDOW))
+_extraction_latency: Dict[str, Deque[float]] = defaultdict(lambda: deque(maxlen=_SAMPLE_WINDOW))
+
+
+def _init_worker() -> None:
+    # Workers × parallel pages already fill the cores; Tesseract's own OpenMP
+    # threads on top of that only oversubscribe them.
+    os.environ.setdefault("OMP_THREAD_LIMIT", "1")
+
+
+def _verify_in_worker(file_bytes: bytes, filename: str) -> dict:
+    """
+    verify_document() as run by a pool worker. Any failure becomes an "error"
+    result: some exceptions (pytesseract's TesseractNotFoundError) can't be
+    unpickled, and one that fails to cross back breaks the whole pool.
+    """
+    try:
+        return verify_document(file_bytes, filename)
+    except Exception as e:
+        return {
+            "document_type": "unknown_document",
+            "extracted_fields": {},
+            "verification_status": "error",
+            "confidence": 0.0,
+            "raw_text_preview": f"OCR failed: {type(e).__name__}: {e}",
+            "extraction": "failed",
+        }
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        # The server is multi-threaded by now; forking it could copy held locks
+        methods = multiprocessing.get_all_start_methods()
+        context = multiprocessing.get_context("forkserver" if "forkserver" in methods else "spawn")
+        _pool = ProcessPoolExecutor(max_workers=OCR_WORKERS, mp_context=context, initializer=_init_worker)
+    return _pool
+
+
+def shutdown_pool() -> None:
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+
+def _retry_after() -> int:
+    """Seconds until a slot is likely free: queued documents × typical job time / workers."""
+    samples = _stage_latency["total_ms"]
+    if not samples:
+        return OCR_RETRY_AFTER
+    typical_s = sorted(samples)[len(samples) // 2] / 1000
+    return max(1, math.ceil(typical_s * (_pending - max(1, OCR_WORKERS) + 1) / max(1, OCR_WORKERS)))
+
+
+async def verify_document_async(file_bytes: bytes, filename: str) -> dict:
+    """
+    verify_document() off the event loop — rasterization and Tesseract are
+    CPU-bound and take seconds — in OCR_WORKERS processes (0 = a worker
+    thread). Results carry per-stage timings. Raises OCRBusy when OCR_MAX_QUEUE
+    documents are already waiting behind the busy workers, and BrokenProcessPool
+    when a worker died mid-document (the pool is replaced for the next request).
+    """
+    global _pending, _pool
+    if _pending >= max(1, OCR_WORKERS) + OCR_MAX_QUEUE:
+        _counters["rejected"] += 1
+        raise OCRBusy(_retry_after())
+
+    _pending += 1
+    start = time.perf_counter()
+    try:
+        if OCR_WORKERS > 0:
+            loop = asyncio.get_running_loop()
+            result = await loop.run_in_executor(_get_pool(), _verify_in_worker, file_bytes, filename)
+        else:
+            result = await asyncio.to_thread(_verify_in_worker, file_bytes, filename)
+    except BrokenProcessPool:
+        # A worker died (OOM on a huge scan, segfault in a native lib) — start a fresh pool
+        _counters["failed"] += 1
+        _counters["pool_restarts"] += 1
+        _pool = None
+        raise
+    except Exception:
+        _counters["failed"] += 1
+        raise
+    finally:
+        _pending -= 1
+
+    timings = result.setdefault("timings", {})
+    total_ms = _elapsed_ms(start)
+    worker_ms = sum(timings.values())
+    timings["queue_ms"] = round(max(0.0, total_ms - worker_ms), 1)
+    timings["total_ms"] = total_ms
+    if result.get("extraction") == "failed":
+        _counters["failed"] += 1
+    else:
+        _counters["completed"] += 1
+    for stage in _STAGES:
+        if stage in timings:
+            _stage_latency[stage].append(timings[stage])
+    pages = result.get("pages") or {}
+    for kind, n in pages.items():
+        _page_counts[kind] = _page_counts.get(kind, 0) + n
+    if pages.get("ocr"):
+        # "full_page" if any page needed the full eng+hin pass (escalated, or cascade off)
+        tier = "full_page" if pages.get("ocr_full") else "header_only"
+        _tier_latency[tier].append(timings.get("ocr_ms", 0.0))
+        # Preprocessing A/B: image-to-text time and share of documents with all key fields
+        arm = _preprocess_arms["preprocessed" if pages.get("preprocessed") else "raw"]
+        arm["documents"] += 1
+        arm["key_fields"] += result.get("confidence", 0.0) >= 1.0
+        arm["ms"].append(round(timings.get("preprocess_ms", 0.0) + timings.get("ocr_ms", 0.0), 1))
+    if result.get("extraction"):
+        _extraction_latency[result["extraction"]].append(total_ms)
+    return result
+
+
+def _percentile(samples, q: float) -> Optional[float]:
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    return round(ordered[min(len(ordered) - 1, int(q * len(ordered)))], 1)
+
+
+def stats() -> dict:
+    """Pool size, queue depth, rejections, p50/p95 per OCR stage and per extraction method."""
+    return {
+        "ocr_available": OCR_AVAILABLE,
+        "pdf_available": PDF_AVAILABLE,
+        "text_layer_enabled": PDF_TEXT_LAYER and PDFTOTEXT_AVAILABLE,
+        "mode": "process" if OCR_WORKERS > 0 else "thread",
+        "workers": OCR_WORKERS,
+        "max_queue": OCR_MAX_QUEUE,
+        "in_flight": _pending,
+        **_counters,
+        "page_parallelism": OCR_PAGE_PARALLELISM,
+        "pages": dict(_page_counts),
+        "stages": {
+            stage: {
+                "p50_ms": _percentile(_stage_latency[stage], 0.50),
+                "p95_ms": _percentile(_stage_latency[stage], 0.95),
+            }
+            for stage in _STAGES
+        },
+        "cascade": {
+            "enabled": OCR_CASCADE,
+            "header_fraction": OCR_HEADER_FRACTION,
+            "escalation_rate": round(_page_counts["ocr_full"] / _page_counts["ocr"], 3)
+            if OCR_CASCADE and _page_counts["ocr"] else None,
+            # OCR-stage ms per document, header pass only vs full-page eng+hin
+            "ocr_ms": {
+                tier: {
+                    "documents": len(samples),
+                    "p50_ms": _percentile(samples, 0.50),
+                    "p95_ms": _percentile(samples, 0.95),
+                }
+                for tier, samples in _tier_latency.items()
+            },
+        },
+        "preprocessing": {
+            "mode": image_preprocess.OCR_PREPROCESS if OCR_AVAILABLE else None,
+            "target_dpi": image_preprocess.OCR_TARGET_DPI if OCR_AVAILABLE else None,
+            "arms": {
+                name: {
+                    "documents": arm["documents"],
+                    "key_field_rate": round(arm["key_fields"] / arm["documents"], 3),
+                    "p50_ms": _percentile(arm["ms"], 0.50),
+                    "p95_ms": _percentile(arm["ms"], 0.95),
+                }
+                for name, arm in _preprocess_arms.items()
+            },
+        },
+        # text_layer vs ocr: the fast path's saving on real traffic
+        "by_extraction": {
+            method: {
+                "documents": len(samples),
+                "p50_ms": _percentile(samples, 0.50),
+                "p95_ms": _percentile(samples, 0.95),
+            }
+            for method, samples in _extraction_latency.items()
+        },
     }
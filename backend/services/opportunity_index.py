@@ -0,0 +1,284 @@
+"""
+Opportunity Index Service
+Keeps a fitted TF-IDF vectorizer + matrix over curated and live opportunities.
+The index is rebuilt only when the feed snapshot changes, so a query costs a
+transform, one sparse dot product and a top-k selection.
+Facet masks (portal, type, category, region) are precomputed at build time;
+deadline buckets are derived per query from stored timestamps, so they move
+with the clock. Per-query rankings are cached so that paging and filter
+changes rarely re-score the corpus.
+"""
+import os
+import time
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+from sklearn.feature_extraction.text import TfidfVectorizer
+
+from services.tender_store import parse_date
+
+RANKING_CACHE_SIZE = int(os.getenv("RANKING_CACHE_SIZE", "256"))
+RANKING_TOP_K = int(os.getenv("RANKING_TOP_K", "500"))      # ranked docs kept per cached query
+
+FACET_FIELDS = ("portal", "type", "category", "region", "deadline")
+
+# ─── In-memory index ────────────────────────────────────────────────────────
+
+_lock = threading.Lock()
+# (snapshot_key, docs, vectorizer, matrix, facets, deadlines) — replaced as a whole on rebuild
+_index: Tuple[Optional[str], List[dict], Optional[TfidfVectorizer], object, dict, tuple] = (
+    None, [], None, None, {}, (np.empty(0), np.empty(0, dtype=bool)),
+)
+
+# (snapshot_key, query) → (top RANKING_TOP_K indices best first, their scores,
+# packed bitmap of every doc with score > 0, count of those docs)
+_rankings: "OrderedDict[tuple, Tuple[np.ndarray, np.ndarray, np.ndarray, int]]" = OrderedDict()
+_ranking_lock = threading.Lock()
+
+
+def _doc_text(opp: dict) -> str:
+    return (
+        f"{opp['title']} {opp['description']} "
+        f"{' '.join(opp.get('sectors', []))} "
+        f"{' '.join(opp.get('regions', []))}"
+    )
+
+
+def _deadline_ts(opp: dict) -> float:
+    """Deadline as a timestamp; NaN if ongoing, unspecified or unparseable."""
+    deadline = (opp.get("deadline") or "").strip()
+    if not deadline or deadline.lower() == "ongoing" or deadline == opp.get("published"):
+        return np.nan
+    ts = parse_date(deadline)
+    return np.nan if ts is None else ts
+
+
+def _build_deadlines(docs: List[dict]) -> Tuple[np.ndarray, np.ndarray]:
+    """(deadline timestamps, mask of "ongoing" docs) — bucketed per query by _deadline_masks."""
+    ongoing = np.array([(d.get("deadline") or "").strip().lower() == "ongoing" for d in docs], dtype=bool)
+    return np.array([_deadline_ts(d) for d in docs], dtype=float), ongoing
+
+
+def _deadline_masks(deadlines: Tuple[np.ndarray, np.ndarray], now: float) -> Dict[str, np.ndarray]:
+    """Deadline bucket → mask, relative to `now` (NaN compares False everywhere)."""
+    timestamps, ongoing = deadlines
+    days = (timestamps - now) / 86400
+    return {
+        "ongoing": ongoing,
+        "unspecified": np.isnan(timestamps) & ~ongoing,
+        "closed": days < 0,
+        "closing_7d": (days >= 0) & (days <= 7),
+        "closing_30d": (days > 7) & (days <= 30),
+        "later": days > 30,
+    }
+
+
+def _facet_values(opp: dict, field: str) -> List[str]:
+    if field == "region":
+        return [r.lower() for r in opp.get("regions", [])] or ["unspecified"]
+    return [opp.get(field) or "unspecified"]
+
+
+def _build_facets(docs: List[dict]) -> Dict[str, Dict[str, np.ndarray]]:
+    """field → value → boolean mask over docs, for every field but deadline."""
+    facets: Dict[str, Dict[str, np.ndarray]] = {}
+    for field in FACET_FIELDS:
+        if field == "deadline":
+            continue
+        masks: Dict[str, np.ndarray] = {}
+        for i, opp in enumerate(docs):
+            for value in _facet_values(opp, field):
+                mask = masks.get(value)
+                if mask is None:
+                    mask = masks[value] = np.zeros(len(docs), dtype=bool)
+                mask[i] = True
+        facets[field] = masks
+    return facets
+
+
+def refresh(snapshot_key: str, load_opportunities: Callable[[], List[dict]]) -> bool:
+    """
+    Rebuild the index if `snapshot_key` differs from the one it was built for.
+    `load_opportunities` is only called when a rebuild is needed.
+    Returns True if the index was rebuilt.
+    """
+    global _index
+    if snapshot_key == _index[0]:
+        return False
+
+    with _lock:
+        if snapshot_key == _index[0]:
+            return False
+
+        docs = list(load_opportunities())
+        vectorizer = None
+        matrix = None
+        if docs:
+            try:
+                vectorizer = TfidfVectorizer(stop_words="english", ngram_range=(1, 2))
+                # Rows are L2-normalised, so a dot product is the cosine similarity
+                matrix = vectorizer.fit_transform([_doc_text(d) for d in docs]).tocsr()
+            except ValueError:
+                # Empty vocabulary (e.g. only stop words) — every score is 0
+                vectorizer, matrix = None, None
+
+        # Swap in one go so concurrent readers never see a half-built index
+        _index = (snapshot_key, docs, vectorizer, matrix, _build_facets(docs), _build_deadlines(docs))
+        with _ranking_lock:
+            _rankings.clear()
+        return True
+
+
+def _scores(index: tuple, query: str) -> np.ndarray:
+    _, docs, vectorizer, matrix, _, _ = index
+    if vectorizer is None or matrix is None:
+        return np.zeros(len(docs))
+    query_vec = vectorizer.transform([query])
+    return (matrix @ query_vec.T).toarray().ravel()
+
+
+def top_k_indices(doc_scores: np.ndarray, top_k: int) -> np.ndarray:
+    """Indices of the `top_k` best scores, best first; ties keep index order."""
+    n = len(doc_scores)
+    if n == 0 or top_k <= 0:
+        return np.empty(0, dtype=int)
+    if top_k < n:
+        candidates = np.argpartition(-doc_scores, top_k - 1)[:top_k]
+    else:
+        candidates = np.arange(n)
+    order = np.lexsort((candidates, -doc_scores[candidates]))
+    return candidates[order]
+
+
+def rank(query: str, top_k: int) -> List[dict]:
+    """Return the top-k opportunities for `query` with a `match_score` attached."""
+    index = _index
+    docs = index[1]
+    doc_scores = _scores(index, query)
+    return [
+        {**docs[i], "match_score": round(float(doc_scores[i]), 3)}
+        for i in top_k_indices(doc_scores, top_k)
+    ]
+
+
+def _full_ranking(doc_scores: np.ndarray) -> np.ndarray:
+    """Indices of every doc with a positive score, best first; ties keep index order."""
+    positive = np.flatnonzero(doc_scores > 0)
+    return positive[np.lexsort((positive, -doc_scores[positive]))].astype(np.int32)
+
+
+def _ranking(index: tuple, query: str) -> Tuple[np.ndarray, np.ndarray, np.ndarray, int]:
+    """
+    Cached (top doc indices best first, their scores, is-match bitmap, match
+    count) for `query` on `index`. Only the head of the ranking is kept, so an
+    entry costs O(RANKING_TOP_K + n/8) bytes rather than a score per doc.
+    """
+    key = (index[0], " ".join(query.lower().split()))
+    with _ranking_lock:
+        cached = _rankings.get(key)
+        if cached is not None:
+            _rankings.move_to_end(key)
+            return cached
+
+    doc_scores = _scores(index, query)
+    order = _full_ranking(doc_scores)
+    top = order[:RANKING_TOP_K]
+    is_match = np.zeros(len(doc_scores), dtype=bool)
+    is_match[order] = True
+    entry = (top, doc_scores[top], np.packbits(is_match), len(order))
+    with _ranking_lock:
+        _rankings[key] = entry
+        while len(_rankings) > RANKING_CACHE_SIZE:
+            _rankings.popitem(last=False)
+    return entry
+
+
+def _filter_mask(facets: dict, filters: Dict[str, List[str]], n: int, skip: Optional[str] = None) -> Optional[np.ndarray]:
+    """AND across fields, OR within a field. `skip` leaves one field out (for its own counts)."""
+    mask = None
+    for field, values in filters.items():
+        if field == skip or not values:
+            continue
+        field_masks = facets.get(field, {})
+        field_mask = np.zeros(n, dtype=bool)
+        for value in values:
+            value_mask = field_masks.get(value if field != "region" else value.lower())
+            if value_mask is not None:
+                field_mask |= value_mask
+        mask = field_mask if mask is None else mask & field_mask
+    return mask
+
+
+def search(
+    query: str,
+    filters: Optional[Dict[str, List[str]]] = None,
+    offset: int = 0,
+    limit: int = 10,
+) -> dict:
+    """
+    One page of the ranking for `query`, restricted by facet `filters`.
+    Docs with a positive score come first (best first); the rest follow in index
+    order. Facet counts cover the docs that match the query — every doc if none
+    does — with each field's counts ignoring that field's own filter.
+    """
+    index = _index
+    _, docs, _, _, facets, deadlines = index
+    n = len(docs)
+    facets = {**facets, "deadline": _deadline_masks(deadlines, time.time())}
+    filters = {f: v for f, v in (filters or {}).items() if f in FACET_FIELDS and v}
+
+    top, top_scores, packed, matches = _ranking(index, query)
+    is_match = np.unpackbits(packed, count=n).astype(bool)
+
+    mask = _filter_mask(facets, filters, n)
+    keep = slice(None) if mask is None else mask[top]
+    ranked, ranked_scores = top[keep], top_scores[keep]
+    total_matching = matches if mask is None else int(np.count_nonzero(is_match & mask))
+    if len(ranked) < min(total_matching, offset + limit):
+        # Paging past the cached head: re-score for this request only
+        doc_scores = _scores(index, query)
+        ranked = _full_ranking(doc_scores)
+        if mask is not None:
+            ranked = ranked[mask[ranked]]
+        ranked_scores = doc_scores[ranked]
+    rest = np.flatnonzero(~is_match if mask is None else (~is_match & mask))
+    total = total_matching + len(rest)
+
+    results = []
+    for position in range(offset, min(offset + limit, total)):
+        if position < total_matching:
+            results.append({**docs[ranked[position]], "match_score": round(float(ranked_scores[position]), 3)})
+        else:
+            results.append({**docs[rest[position - total_matching]], "match_score": 0.0})
+
+    base = is_match if matches else np.ones(n, dtype=bool)
+    facet_counts = {}
+    for field in FACET_FIELDS:
+        field_mask = _filter_mask(facets, filters, n, skip=field)
+        scope = base if field_mask is None else base & field_mask
+        counts = (
+            {"value": value, "count": int(np.count_nonzero(value_mask & scope))}
+            for value, value_mask in facets.get(field, {}).items()
+        )
+        facet_counts[field] = sorted(
+            (c for c in counts if c["count"]), key=lambda c: (-c["count"], c["value"])
+        )
+
+    return {
+        "results": results,
+        "total": total,
+        "total_matching": total_matching,
+        "offset": offset,
+        "next_offset": offset + limit if offset + limit < total else None,
+        "facets": facet_counts,
+    }
+
+
+def size() -> int:
+    return len(_index[1])
+
+
+def snapshot_key() -> Optional[str]:
+    return _index[0]
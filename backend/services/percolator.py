@@ -0,0 +1,297 @@
+"""
+Saved-Search Percolator Service
+Every onboarded MSE gets a saved search derived from its product description,
+ONDC category and state. Saved searches live in a reverse index, so each newly
+polled tender is matched against all of them at once instead of re-scoring
+every MSE. Matches are appended to a per-MSE feed in the local tender DB.
+
+A saved search with n terms matches a tender sharing at least
+m = ceil(n × PERCOLATOR_MIN_MATCH) of them. It is indexed only under its
+n − m + 1 rarest terms: any tender sharing m terms must hit one of those, so
+candidate generation touches short posting lists and stays exact.
+"""
+import os
+import re
+import json
+import math
+import time
+import sqlite3
+import threading
+from collections import defaultdict
+from typing import Dict, List, Optional
+
+from sklearn.feature_extraction.text import ENGLISH_STOP_WORDS
+
+from services.tender_store import TENDER_DB_PATH
+from services import tender_store
+
+PERCOLATOR_MIN_MATCH = float(os.getenv("PERCOLATOR_MIN_MATCH", "0.4"))
+
+# Words that appear in almost every tender / MSE description and carry no signal
+_DOMAIN_STOP_WORDS = {
+    "supply", "supplier", "tender", "item", "work", "product", "business",
+    "india", "indian", "government", "make", "based",
+}
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS saved_searches (
+    mse_id              INTEGER PRIMARY KEY,
+    business_name       TEXT,
+    product_description TEXT NOT NULL,
+    state               TEXT,
+    category            TEXT,
+    terms               TEXT NOT NULL,   -- JSON list
+    created_at          REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS mse_feed (
+    mse_id        INTEGER NOT NULL,
+    tender_id     TEXT NOT NULL,
+    score         REAL NOT NULL,
+    matched_terms TEXT NOT NULL,         -- JSON list
+    matched_at    REAL NOT NULL,
+    PRIMARY KEY (mse_id, tender_id)
+);
+CREATE INDEX IF NOT EXISTS ix_mse_feed_matched_at ON mse_feed(mse_id, matched_at);
+"""
+
+# ─── In-memory reverse index ────────────────────────────────────────────────
+
+_conn: Optional[sqlite3.Connection] = None
+_lock = threading.Lock()
+_loaded = False
+_searches: List[dict] = []                  # slot → saved search
+_slot_by_mse: Dict[int, int] = {}
+_postings: Dict[str, List[int]] = defaultdict(list)
+_stats = {"tenders_percolated": 0, "candidates_checked": 0, "matches": 0, "last_batch_ms": None}
+
+
+def _get_conn() -> sqlite3.Connection:
+    global _conn
+    if _conn is None:
+        conn = sqlite3.connect(TENDER_DB_PATH, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        conn.executescript(_SCHEMA)
+        _conn = conn
+    return _conn
+
+
+def _normalize_term(word: str) -> str:
+    if word.endswith("ies") and len(word) > 4:
+        return word[:-3] + "y"
+    if word.endswith("s") and not word.endswith("ss") and len(word) > 3:
+        return word[:-1]
+    return word
+
+
+def tokenize(text: str) -> set:
+    words = re.findall(r"[a-z][a-z0-9]+", (text or "").lower())
+    terms = {_normalize_term(w) for w in words if len(w) > 2 and w not in ENGLISH_STOP_WORDS}
+    return terms - _DOMAIN_STOP_WORDS
+
+
+def _index_search(search: dict) -> None:
+    """Add a saved search to the reverse index under its rarest terms, replacing the MSE's old one."""
+    slot = _slot_by_mse.get(search["mse_id"])
+    if slot is None:
+        slot = len(_searches)
+        _searches.append(search)
+        _slot_by_mse[search["mse_id"]] = slot
+    else:
+        # Drop the old postings, or tenders would keep reaching it through terms it no longer has
+        for term in _searches[slot]["indexed"]:
+            postings = _postings[term]
+            postings.remove(slot)
+            if not postings:
+                del _postings[term]
+        _searches[slot] = search
+
+    terms = search["terms"]
+    prefix_len = len(terms) - search["min_match"] + 1
+    search["indexed"] = sorted(terms, key=lambda t: (len(_postings.get(t, ())), t))[:prefix_len]
+    for term in search["indexed"]:
+        _postings[term].append(slot)
+
+
+def _make_search(row: dict) -> Optional[dict]:
+    terms = sorted(set(row["terms"]))
+    if not terms:
+        return None
+    return {
+        "mse_id": row["mse_id"],
+        "terms": terms,
+        "term_set": frozenset(terms),
+        "min_match": max(1, math.ceil(len(terms) * PERCOLATOR_MIN_MATCH)),
+        "state": (row.get("state") or "").strip().lower(),
+    }
+
+
+def _load() -> None:
+    global _loaded
+    if _loaded:
+        return
+    rows = _get_conn().execute("SELECT mse_id, state, terms FROM saved_searches").fetchall()
+    for row in rows:
+        search = _make_search({"mse_id": row["mse_id"], "state": row["state"], "terms": json.loads(row["terms"])})
+        if search:
+            _index_search(search)
+    _loaded = True
+
+
+def _region_ok(search: dict, tender: dict) -> bool:
+    if not search["state"]:
+        return True
+    regions = [r.lower() for r in tender.get("regions", [])]
+    return not regions or "all india" in regions or any(search["state"] in r for r in regions)
+
+
+def _tender_terms(tender: dict) -> set:
+    return tokenize(
+        f"{tender.get('title', '')} {tender.get('description', '')} {' '.join(tender.get('sectors', []))}"
+    )
+
+
+def _matched_terms(search: dict, tender: dict, tender_terms: set) -> Optional[List[str]]:
+    """The shared terms if the tender satisfies the saved search, else None."""
+    matched = search["term_set"] & tender_terms
+    if len(matched) >= search["min_match"] and _region_ok(search, tender):
+        return sorted(matched)
+    return None
+
+
+def _match(tender: dict) -> List[tuple]:
+    """Return (search, matched_terms) for every saved search the tender satisfies."""
+    tender_terms = _tender_terms(tender)
+    candidates = set()
+    for term in tender_terms:
+        candidates.update(_postings.get(term, ()))
+    _stats["candidates_checked"] += len(candidates)
+
+    matches = []
+    for slot in candidates:
+        search = _searches[slot]
+        matched = _matched_terms(search, tender, tender_terms)
+        if matched is not None:
+            matches.append((search, matched))
+    return matches
+
+
+# ─── Public API ─────────────────────────────────────────────────────────────
+
+def register_mse(
+    mse_id: int,
+    product_description: str,
+    state: Optional[str] = None,
+    category: Optional[str] = None,
+    business_name: Optional[str] = None,
+) -> Optional[dict]:
+    """
+    Create or replace the saved search for an MSE, then backfill its feed from
+    tenders already in the store. Returns the saved search (None if it has no terms).
+    """
+    terms = tokenize(f"{product_description} {category or ''}")
+    with _lock:
+        _load()
+        search = _make_search({"mse_id": mse_id, "state": state, "terms": terms})
+        if search is None:
+            return None
+        conn = _get_conn()
+        with conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO saved_searches "
+                "(mse_id, business_name, product_description, state, category, terms, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (mse_id, business_name, product_description, state, category,
+                 json.dumps(search["terms"]), time.time()),
+            )
+        _index_search(search)
+
+    # Backfill: FTS narrows the stored tenders, then each is checked against
+    # this search alone rather than percolated through every saved search
+    existing = tender_store.search(" ".join(search["terms"]), limit=200)
+    backfill = []
+    for tender in existing:
+        matched = _matched_terms(search, tender, _tender_terms(tender))
+        if matched is not None:
+            backfill.append((tender, search, matched))
+    with _lock:
+        _record_matches(backfill)
+    return {k: search[k] for k in ("mse_id", "terms", "min_match", "state")}
+
+
+def _record_matches(matches: List[tuple]) -> int:
+    """Append (tender, search, matched_terms) triples to the per-MSE feeds."""
+    if not matches:
+        return 0
+    now = time.time()
+    inserted = 0
+    conn = _get_conn()
+    with conn:
+        for tender, search, matched in matches:
+            score = round(len(matched) / len(search["terms"]), 3)
+            inserted += conn.execute(
+                "INSERT OR IGNORE INTO mse_feed (mse_id, tender_id, score, matched_terms, matched_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (search["mse_id"], tender["id"], score, json.dumps(matched), now),
+            ).rowcount
+    _stats["matches"] += inserted
+    return inserted
+
+
+def percolate(tenders: List[dict]) -> int:
+    """Match newly stored tenders against every saved search. Returns feed entries added."""
+    if not tenders:
+        return 0
+    started = time.monotonic()
+    with _lock:
+        _load()
+        matches = [
+            (tender, search, matched)
+            for tender in tenders
+            for search, matched in _match(tender)
+        ]
+        inserted = _record_matches(matches)
+        _stats["tenders_percolated"] += len(tenders)
+        _stats["last_batch_ms"] = round((time.monotonic() - started) * 1000, 2)
+    return inserted
+
+
+def get_feed(mse_id: int, limit: int = 20, since: Optional[float] = None) -> List[dict]:
+    """Newest-first tender matches for an MSE (only tenders that have not expired)."""
+    with _lock:
+        rows = _get_conn().execute(
+            "SELECT tender_id, score, matched_terms, matched_at FROM mse_feed "
+            "WHERE mse_id = ? AND matched_at > ? ORDER BY matched_at DESC, score DESC LIMIT ?",
+            (mse_id, since or 0.0, limit),
+        ).fetchall()
+    tenders = {t["id"]: t for t in tender_store.get_many([r["tender_id"] for r in rows])}
+    return [
+        {
+            **tenders[r["tender_id"]],
+            "match_score": r["score"],
+            "matched_terms": json.loads(r["matched_terms"]),
+            "matched_at": r["matched_at"],
+        }
+        for r in rows
+        if r["tender_id"] in tenders
+    ]
+
+
+def get_saved_search(mse_id: int) -> Optional[dict]:
+    with _lock:
+        _load()
+        slot = _slot_by_mse.get(mse_id)
+        search = _searches[slot] if slot is not None else None
+    if search is None:
+        return None
+    return {k: search[k] for k in ("mse_id", "terms", "min_match", "state")}
+
+
+def stats() -> dict:
+    with _lock:
+        _load()
+        return {
+            "saved_searches": len(_slot_by_mse),
+            "indexed_terms": len(_postings),
+            "postings": sum(len(p) for p in _postings.values()),
+            **_stats,
+        }
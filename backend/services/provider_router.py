@@ -0,0 +1,198 @@
+"""
+Provider Router Service — picks the speech backend for each request
+Tracks, per ASR provider (groq_whisper, sarvam, bhashini):
+  - rolling latency (EWMA, overall and per language) and error rate
+  - per-language quality: share of answered calls with a usable transcript
+  - a circuit breaker: closed → open after PROVIDER_BREAKER_FAILURES consecutive
+    errors (or a >50% error rate over the window); after the cooldown one
+    half-open probe is let through — success closes it, failure re-opens it
+    with a doubled cooldown (capped at PROVIDER_BREAKER_MAX_COOLDOWN).
+order(lang) ranks the healthy providers fastest-first for that language,
+with latency inflated by poor quality and by the recent error rate. Providers
+with at least one successful call come first; untried ones follow in static
+preference order (so new backends still get tried as hedges), and providers
+that have only ever errored go last.
+"""
+import os
+import time
+from collections import defaultdict, deque
+from typing import Callable, Deque, Dict, List, Optional, Tuple
+
+PROVIDER_WINDOW = int(os.getenv("PROVIDER_WINDOW", "50"))
+PROVIDER_BREAKER_FAILURES = int(os.getenv("PROVIDER_BREAKER_FAILURES", "3"))
+PROVIDER_BREAKER_COOLDOWN = float(os.getenv("PROVIDER_BREAKER_COOLDOWN", "30"))
+PROVIDER_BREAKER_MAX_COOLDOWN = float(os.getenv("PROVIDER_BREAKER_MAX_COOLDOWN", "300"))
+
+_EWMA_ALPHA = 0.2
+_MIN_LANG_SAMPLES = 3
+_QUALITY_PENALTY = 2.0     # a provider with 0% usable transcripts looks 3× slower
+_ERROR_PENALTY = 2.0       # ... and one failing every call looks another 3× slower
+
+# ─── In-memory state ────────────────────────────────────────────────────────
+
+_providers: Dict[str, dict] = {}
+_decisions: Deque[dict] = deque(maxlen=100)
+_decision_counts: Dict[str, int] = defaultdict(int)
+
+
+def register(
+    name: str,
+    configured: Callable[[], bool],
+    supports: Callable[[str], bool] = lambda lang: True,
+) -> None:
+    """Add a provider. Registration order is the static preference order."""
+    _providers[name] = {
+        "name": name,
+        "rank": len(_providers),
+        "configured": configured,
+        "supports": supports,
+        "state": "closed",
+        "opened_at": 0.0,
+        "cooldown": PROVIDER_BREAKER_COOLDOWN,
+        "probe_in_flight": False,
+        "consecutive_failures": 0,
+        "outcomes": deque(maxlen=PROVIDER_WINDOW),       # True = no error
+        "latency_ms": None,
+        "by_lang": defaultdict(lambda: {"calls": 0, "latency_ms": None, "usable": deque(maxlen=PROVIDER_WINDOW)}),
+        "calls": 0,
+        "errors": 0,
+    }
+
+
+def _ewma(prev: Optional[float], value: float) -> float:
+    return value if prev is None else (1 - _EWMA_ALPHA) * prev + _EWMA_ALPHA * value
+
+
+def _available(p: dict, now: float) -> bool:
+    if p["state"] == "closed":
+        return True
+    if p["state"] == "open" and now - p["opened_at"] >= p["cooldown"]:
+        p["state"] = "half_open"
+    return p["state"] == "half_open" and not p["probe_in_flight"]
+
+
+def _quality(p: dict, lang: str) -> Optional[float]:
+    usable = p["by_lang"][lang]["usable"] if lang in p["by_lang"] else ()
+    return sum(usable) / len(usable) if usable else None
+
+
+def _score(p: dict, lang: str) -> Tuple[int, float]:
+    """(tier, penalised latency): tier 0 = has successful calls, 1 = untried, 2 = only errors."""
+    if p["latency_ms"] is None:
+        return (1, 0.0) if not p["calls"] else (2, 0.0)
+    stats = p["by_lang"].get(lang)
+    latency = stats["latency_ms"] if stats and stats["latency_ms"] is not None and stats["calls"] >= _MIN_LANG_SAMPLES \
+        else p["latency_ms"]
+    quality = _quality(p, lang)
+    if quality is not None:
+        latency *= 1 + _QUALITY_PENALTY * (1 - quality)
+    window = p["outcomes"]
+    if window:
+        latency *= 1 + _ERROR_PENALTY * window.count(False) / len(window)
+    return 0, latency
+
+
+# ─── Public API ─────────────────────────────────────────────────────────────
+
+def order(lang: str) -> List[str]:
+    """
+    Healthy, configured providers that support `lang`, best first. If none is
+    configured the static order is returned so demo fallbacks keep working;
+    if every breaker is open, they're all tried anyway (best-effort).
+    """
+    now = time.monotonic()
+    candidates = [p for p in _providers.values() if p["supports"](lang)]
+    configured = [p for p in candidates if p["configured"]()]
+    if not configured:
+        ranked = sorted(candidates, key=lambda p: p["rank"])
+        reason = "unconfigured"
+    else:
+        healthy = [p for p in configured if _available(p, now)]
+        reason = "healthy" if healthy else "all_open"
+        ranked = sorted(healthy or configured, key=lambda p: (*_score(p, lang), p["rank"]))
+
+    names = [p["name"] for p in ranked]
+    if names:
+        _decision_counts[names[0]] += 1
+    _decisions.append({"at": time.time(), "lang": lang, "order": names, "reason": reason})
+    return names
+
+
+def begin(name: str) -> None:
+    """A call is about to start; a half-open provider admits it as its single probe."""
+    p = _providers[name]
+    if p["state"] == "half_open":
+        p["probe_in_flight"] = True
+
+
+def record(name: str, lang: str, latency_ms: float, ok: bool, usable: bool) -> None:
+    """Feed back one completed call: `ok` = no transport/API error, `usable` = non-empty transcript."""
+    p = _providers[name]
+    p["calls"] += 1
+    p["outcomes"].append(ok)
+    by_lang = p["by_lang"][lang]
+    by_lang["calls"] += 1
+
+    if ok:
+        by_lang["usable"].append(usable)       # quality is judged on answered calls only
+        p["latency_ms"] = _ewma(p["latency_ms"], latency_ms)
+        by_lang["latency_ms"] = _ewma(by_lang["latency_ms"], latency_ms)
+        p["consecutive_failures"] = 0
+        if p["state"] != "closed":
+            p["state"] = "closed"
+            p["cooldown"] = PROVIDER_BREAKER_COOLDOWN
+        p["probe_in_flight"] = False
+        return
+
+    p["errors"] += 1
+    p["consecutive_failures"] += 1
+    window = p["outcomes"]
+    error_rate = window.count(False) / len(window)
+    if p["state"] == "half_open":
+        p["cooldown"] = min(p["cooldown"] * 2, PROVIDER_BREAKER_MAX_COOLDOWN)
+        _open(p)
+    elif p["state"] == "closed" and (
+        p["consecutive_failures"] >= PROVIDER_BREAKER_FAILURES
+        or (len(window) >= 10 and error_rate > 0.5)
+    ):
+        _open(p)
+
+
+def release(name: str) -> None:
+    """A call was cancelled before finishing — free a half-open probe slot without judging it."""
+    _providers[name]["probe_in_flight"] = False
+
+
+def _open(p: dict) -> None:
+    p["state"] = "open"
+    p["opened_at"] = time.monotonic()
+    p["probe_in_flight"] = False
+
+
+def stats() -> dict:
+    """Breaker states, rolling health, per-language quality and recent routing decisions."""
+    now = time.monotonic()
+    providers = {}
+    for p in _providers.values():
+        window = p["outcomes"]
+        providers[p["name"]] = {
+            "configured": p["configured"](),
+            "state": p["state"],
+            "cooldown_remaining_s": round(max(0.0, p["cooldown"] - (now - p["opened_at"])), 1)
+            if p["state"] == "open" else 0.0,
+            "consecutive_failures": p["consecutive_failures"],
+            "calls": p["calls"],
+            "errors": p["errors"],
+            "error_rate": round(window.count(False) / len(window), 3) if window else None,
+            "latency_ms": round(p["latency_ms"], 1) if p["latency_ms"] is not None else None,
+            "languages": {
+                lang: {
+                    "calls": s["calls"],
+                    "latency_ms": round(s["latency_ms"], 1) if s["latency_ms"] is not None else None,
+                    "quality": round(_quality(p, lang), 3) if s["usable"] else None,
+                }
+                for lang, s in p["by_lang"].items()
+            },
+            "routed_first": _decision_counts.get(p["name"], 0),
+        }
+    return {"providers": providers, "recent_decisions": list(_decisions)[-20:]}
@@ -3,15 +3,30 @@ Sarvam AI Service — Primary Voice Layer
 Speech-to-Text + Translation using Sarvam AI APIs (https://api.sarvam.ai)
 Supports all major Indian languages with high accuracy.
 Docs: https://docs.sarvam.ai
+All calls share one pooled httpx client (closed with the app lifecycle).
 """
 import os
-import io
+import re
 import base64
+import asyncio
+import hashlib
+import tempfile
+from pathlib import Path
 import httpx
-from typing import Optional
+from typing import BinaryIO, Dict, List, Optional, Union
+from services import audio_preprocess, lang_id, translation_cache
 
 SARVAM_API_KEY = os.getenv("SARVAM_API_KEY", "")
 SARVAM_BASE_URL = "https://api.sarvam.ai"
+SARVAM_TRANSLATE_MODEL = "mayura:v1"
+SARVAM_TTS_MODEL = "bulbul:v1"
+SARVAM_MAX_CONNECTIONS = int(os.getenv("SARVAM_MAX_CONNECTIONS", "20"))
+SARVAM_TRANSLATE_CONCURRENCY = int(os.getenv("SARVAM_TRANSLATE_CONCURRENCY", "4"))
+TTS_MAX_CHARS = 500                     # Sarvam limit per input
+TTS_MAX_TEXT_CHARS = int(os.getenv("TTS_MAX_TEXT_CHARS", "5000"))   # per request, split into TTS_MAX_CHARS chunks
+TTS_MAX_CONCURRENCY = int(os.getenv("TTS_MAX_CONCURRENCY", "4"))
+TTS_CACHE_DIR = Path(os.getenv("TTS_CACHE_DIR", "./tts_cache"))
+TTS_CACHE_MAX_MB = int(os.getenv("TTS_CACHE_MAX_MB", "200"))
 
 # Language code mapping: our ISO codes → Sarvam language codes
 SARVAM_LANG_MAP = {
@@ -68,13 +83,41 @@ DEMO_TRANSCRIPTIONS = {
 }
 
 
+_client: Optional[httpx.AsyncClient] = None
+_translate_semaphore = asyncio.Semaphore(SARVAM_TRANSLATE_CONCURRENCY)
+
+
+def _get_client() -> httpx.AsyncClient:
+    """Shared, pooled HTTP client for every Sarvam call."""
+    global _client
+    if _client is None or _client.is_closed:
+        _client = httpx.AsyncClient(
+            base_url=SARVAM_BASE_URL,
+            timeout=httpx.Timeout(30.0, connect=10.0),
+            limits=httpx.Limits(
+                max_connections=SARVAM_MAX_CONNECTIONS,
+                max_keepalive_connections=SARVAM_MAX_CONNECTIONS,
+            ),
+            headers={"api-subscription-key": SARVAM_API_KEY},
+        )
+    return _client
+
+
+async def close_client() -> None:
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+
 async def transcribe_audio(
-    audio_bytes: bytes,
+    audio: Union[bytes, BinaryIO],
     source_lang: str = "hi",
     audio_format: str = "wav",
 ) -> dict:
     """
     Convert spoken audio in an Indian language to text using Sarvam Speech-to-Text API.
+    `audio` is raw bytes or a binary file object, streamed into the upload as-is.
     Falls back to demo response if API key not set.
     """
     if not SARVAM_API_KEY:
@@ -83,44 +126,35 @@ async def transcribe_audio(
     sarvam_lang = SARVAM_LANG_MAP.get(source_lang, "hi-IN")
 
     try:
-        async with httpx.AsyncClient(timeout=30.0) as client:
-            # Sarvam expects multipart/form-data with the audio file
-            files = {
-                "file": (f"audio.{audio_format}", io.BytesIO(audio_bytes), f"audio/{audio_format}"),
-            }
-            data = {
-                "language_code": sarvam_lang,
-                "model": "saarika:v2",          # Sarvam's latest ASR model
-                "with_timestamps": "false",
-                "with_disfluencies": "false",
-            }
-            headers = {"api-subscription-key": SARVAM_API_KEY}
-
-            response = await client.post(
-                f"{SARVAM_BASE_URL}/speech-to-text",
-                files=files,
-                data=data,
-                headers=headers,
-            )
-            response.raise_for_status()
-            result = response.json()
-
-            transcript = result.get("transcript", "")
-
-            # If source is not English, also translate to English
-            english_text = transcript
-            if source_lang != "en" and transcript:
-                english_text = await translate_to_english(transcript, source_lang)
-
-            return {
-                "transcript": transcript,
-                "english_translation": english_text,
-                "language": source_lang,
-                "language_name": SUPPORTED_LANGUAGES.get(source_lang, source_lang),
-                "confidence": result.get("confidence", 0.95),
-                "provider": "sarvam",
-                "model": "saarika:v2",
-            }
+        # Sarvam expects multipart/form-data with the audio file
+        files = {
+            "file": (f"audio.{audio_format}", audio, f"audio/{audio_format}"),
+        }
+        data = {
+            "language_code": sarvam_lang,
+            "model": "saarika:v2",          # Sarvam's latest ASR model
+            "with_timestamps": "false",
+            "with_disfluencies": "false",
+        }
+
+        response = await _get_client().post("/speech-to-text", files=files, data=data)
+        response.raise_for_status()
+        result = response.json()
+
+        transcript = result.get("transcript", "")
+
+        # Translate to English unless the transcript is already English / Hinglish
+        english_text = await translate_to_english(transcript, source_lang) if transcript else transcript
+
+        return {
+            "transcript": transcript,
+            "english_translation": english_text,
+            "language": source_lang,
+            "language_name": SUPPORTED_LANGUAGES.get(source_lang, source_lang),
+            "confidence": result.get("confidence", 0.95),
+            "provider": "sarvam",
+            "model": "saarika:v2",
+        }
 
     except httpx.HTTPStatusError as e:
         return {
@@ -148,78 +182,220 @@ async def transcribe_base64(
     return await transcribe_audio(audio_bytes, source_lang, audio_format)
 
 
+async def _translate_remote(text: str, sarvam_lang: str) -> Optional[str]:
+    """One Sarvam Translate call. Returns None on any error."""
+    try:
+        payload = {
+            "input": text,
+            "source_language_code": sarvam_lang,
+            "target_language_code": "en-IN",
+            "speaker_gender": "Male",
+            "mode": "formal",
+            "model": SARVAM_TRANSLATE_MODEL,
+            "enable_preprocessing": True,
+        }
+        response = await _get_client().post("/translate", json=payload, timeout=20.0)
+        response.raise_for_status()
+        result = response.json()
+        return result.get("translated_text")
+
+    except Exception:
+        return None
+
+
 async def translate_to_english(text: str, source_lang: str) -> str:
-    """Translate Indian language text to English using Sarvam Translate API."""
-    if not SARVAM_API_KEY or source_lang == "en":
-        return text
+    """
+    Translate Indian language text to English using Sarvam Translate API.
+    The language is identified locally from the text's script (`source_lang`
+    only breaks ties); English and romanised Hindi are returned as-is.
+    Successful translations are cached (memory LRU + SQLite with TTL).
+    """
+    return (await translate_many([text], source_lang))[0]
 
-    sarvam_lang = SARVAM_LANG_MAP.get(source_lang, "hi-IN")
 
+async def translate_many(texts: List[str], source_lang: str) -> List[str]:
+    """
+    Translate several texts at once, results in input order. Duplicates (also
+    ones differing only in spacing) are translated once, cache hits are resolved with one lookup per language, and
+    the remaining texts go to Sarvam concurrently (at most
+    SARVAM_TRANSLATE_CONCURRENCY in flight) over the pooled client.
+    Texts that fail to translate come back unchanged.
+    """
+    if not SARVAM_API_KEY:
+        return list(texts)
+
+    # Unique phrases keyed like the cache (NFC, collapsed whitespace), so
+    # spacing variants of one phrase are translated once; grouped by Sarvam language code
+    by_lang: Dict[str, List[str]] = {}
+    for phrase in dict.fromkeys(translation_cache.normalize(text) for text in texts):
+        if not phrase:
+            continue
+        language = lang_id.resolve_translation(phrase, source_lang)
+        if language is not None:
+            by_lang.setdefault(SARVAM_LANG_MAP.get(language, "hi-IN"), []).append(phrase)
+
+    translated: Dict[str, str] = {}
+    misses = []
+    for sarvam_lang, group in by_lang.items():
+        # SQLite lookups / fsync'd commits stay off the event loop
+        cached = await asyncio.to_thread(translation_cache.get_many, group, sarvam_lang, SARVAM_TRANSLATE_MODEL)
+        translated.update(cached)
+        misses.extend((phrase, sarvam_lang) for phrase in group if phrase not in cached)
+
+    async def _one(phrase: str, sarvam_lang: str) -> Optional[str]:
+        async with _translate_semaphore:
+            return await _translate_remote(phrase, sarvam_lang)
+
+    remote = await asyncio.gather(*(_one(phrase, lang) for phrase, lang in misses))
+    fresh: Dict[str, Dict[str, str]] = {}
+    for (phrase, sarvam_lang), english in zip(misses, remote):
+        if english is not None:                 # errors keep the original and aren't cached
+            translated[phrase] = english
+            fresh.setdefault(sarvam_lang, {})[phrase] = english
+    for sarvam_lang, pairs in fresh.items():
+        await asyncio.to_thread(translation_cache.put_many, pairs, sarvam_lang, SARVAM_TRANSLATE_MODEL)
+
+    return [translated.get(translation_cache.normalize(text), text) for text in texts]
+
+
+# ─── Text-to-Speech ─────────────────────────────────────────────────────────
+
+_SENTENCE_END = re.compile(r"(?<=[.!?।॥])\s+|\n+")
+_tts_semaphore = asyncio.Semaphore(TTS_MAX_CONCURRENCY)
+_tts_inflight: Dict[Path, asyncio.Task] = {}
+
+
+def split_sentences(text: str, max_chars: int = TTS_MAX_CHARS) -> List[str]:
+    """
+    Split text at sentence boundaries into chunks of at most `max_chars`,
+    packing short sentences together. Over-long sentences break at spaces.
+    """
+    chunks: List[str] = []
+    current = ""
+    for sentence in _SENTENCE_END.split(text.strip()):
+        sentence = sentence.strip()
+        while len(sentence) > max_chars:
+            cut = sentence.rfind(" ", 0, max_chars)
+            cut = cut if cut > 0 else max_chars
+            if current:
+                chunks.append(current)
+                current = ""
+            chunks.append(sentence[:cut].strip())
+            sentence = sentence[cut:].strip()
+        if not sentence:
+            continue
+        if current and len(current) + 1 + len(sentence) > max_chars:
+            chunks.append(current)
+            current = sentence
+        else:
+            current = f"{current} {sentence}" if current else sentence
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def _tts_cache_path(text: str, voice: dict) -> Path:
+    raw = "\x1f".join([translation_cache.normalize(text), *(f"{k}={voice[k]}" for k in sorted(voice))])
+    return TTS_CACHE_DIR / f"{hashlib.sha256(raw.encode('utf-8')).hexdigest()}.wav"
+
+
+def _tts_cache_store(path: Path, audio: bytes) -> None:
+    """Atomic write, then evict least-recently-used files beyond TTS_CACHE_MAX_MB."""
+    TTS_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    # Unique temp name: other workers may be storing the same key right now
+    fd, tmp = tempfile.mkstemp(dir=TTS_CACHE_DIR, suffix=".tmp")
     try:
-        async with httpx.AsyncClient(timeout=20.0) as client:
-            headers = {
-                "api-subscription-key": SARVAM_API_KEY,
-                "Content-Type": "application/json",
-            }
-            payload = {
-                "input": text,
-                "source_language_code": sarvam_lang,
-                "target_language_code": "en-IN",
-                "speaker_gender": "Male",
-                "mode": "formal",
-                "model": "mayura:v1",
-                "enable_preprocessing": True,
-            }
-            response = await client.post(
-                f"{SARVAM_BASE_URL}/translate",
-                json=payload,
-                headers=headers,
-            )
-            response.raise_for_status()
-            result = response.json()
-            return result.get("translated_text", text)
+        with os.fdopen(fd, "wb") as f:
+            f.write(audio)
+        os.replace(tmp, path)
+    except BaseException:
+        Path(tmp).unlink(missing_ok=True)
+        raise
 
-    except Exception:
-        return text  # Return original on error
+    entries = []
+    for f in TTS_CACHE_DIR.glob("*.wav"):
+        try:
+            st = f.stat()
+        except FileNotFoundError:       # evicted by a concurrent store
+            continue
+        entries.append((st.st_mtime, st.st_size, f))
+    budget = TTS_CACHE_MAX_MB * 1024 * 1024
+    for _, size, f in sorted(entries, key=lambda e: e[0], reverse=True):
+        budget -= size
+        if budget < 0:
+            f.unlink(missing_ok=True)
 
 
-async def text_to_speech(text: str, target_lang: str = "hi") -> Optional[bytes]:
-    """Convert text to speech in target Indian language using Sarvam TTS."""
-    if not SARVAM_API_KEY:
+async def _synthesize(text: str, voice: dict) -> Optional[bytes]:
+    """One Sarvam TTS call for ≤ TTS_MAX_CHARS of text. Returns WAV bytes or None."""
+    payload = {
+        "inputs": [text],
+        "target_language_code": voice["lang"],
+        "speaker": voice["speaker"],
+        "pitch": voice["pitch"],
+        "pace": voice["pace"],
+        "loudness": voice["loudness"],
+        "speech_sample_rate": voice["sample_rate"],
+        "enable_preprocessing": True,
+        "model": voice["model"],
+    }
+    try:
+        async with _tts_semaphore:
+            response = await _get_client().post("/text-to-speech", json=payload)
+        response.raise_for_status()
+        audios = response.json().get("audios", [])
+        return base64.b64decode(audios[0]) if audios else None
+    except Exception:
         return None
 
-    sarvam_lang = SARVAM_LANG_MAP.get(target_lang, "hi-IN")
 
+async def text_to_speech(
+    text: str,
+    target_lang: str = "hi",
+    speaker: str = "meera",
+    pace: float = 1.0,
+) -> Optional[Path]:
+    """
+    Convert text of any length to speech using Sarvam TTS. The text is split
+    at sentence boundaries, chunks are synthesized concurrently and the WAVs
+    concatenated. Results are cached on disk by (text, language, voice params);
+    returns the path of the cached WAV, or None if synthesis failed.
+    """
+    if not SARVAM_API_KEY or not text.strip():
+        return None
+
+    voice = {
+        "lang": SARVAM_LANG_MAP.get(target_lang, "hi-IN"),
+        "speaker": speaker,                 # Sarvam's Hindi/multilingual speaker
+        "pitch": 0,
+        "pace": pace,
+        "loudness": 1.5,
+        "sample_rate": 8000,
+        "model": SARVAM_TTS_MODEL,
+    }
+    path = _tts_cache_path(text, voice)
     try:
-        async with httpx.AsyncClient(timeout=30.0) as client:
-            headers = {
-                "api-subscription-key": SARVAM_API_KEY,
-                "Content-Type": "application/json",
-            }
-            payload = {
-                "inputs": [text[:500]],          # Max 500 chars per request
-                "target_language_code": sarvam_lang,
-                "speaker": "meera",              # Sarvam's Hindi/multilingual speaker
-                "pitch": 0,
-                "pace": 1.0,
-                "loudness": 1.5,
-                "speech_sample_rate": 8000,
-                "enable_preprocessing": True,
-                "model": "bulbul:v1",
-            }
-            response = await client.post(
-                f"{SARVAM_BASE_URL}/text-to-speech",
-                json=payload,
-                headers=headers,
-            )
-            response.raise_for_status()
-            result = response.json()
-            audios = result.get("audios", [])
-            if audios:
-                return base64.b64decode(audios[0])
-            return None
-    except Exception:
+        os.utime(path)          # cache hit: refresh its LRU position
+        return path
+    except FileNotFoundError:
+        pass
+
+    # Single-flight: identical prompts requested together share one synthesis
+    task = _tts_inflight.get(path)
+    if task is None:
+        task = asyncio.create_task(_synthesize_to_cache(text, voice, path))
+        _tts_inflight[path] = task
+        task.add_done_callback(lambda _: _tts_inflight.pop(path, None))
+    return await asyncio.shield(task)
+
+
+async def _synthesize_to_cache(text: str, voice: dict, path: Path) -> Optional[Path]:
+    parts = await asyncio.gather(*(_synthesize(chunk, voice) for chunk in split_sentences(text)))
+    if not parts or any(p is None for p in parts):
         return None
+    audio = audio_preprocess.concat_wav(parts) if len(parts) > 1 else parts[0]
+    await asyncio.to_thread(_tts_cache_store, path, audio)
+    return path
 
 
 def get_supported_languages() -> dict:
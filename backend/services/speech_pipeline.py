@@ -0,0 +1,346 @@
+"""
+Speech Pipeline Service — ASR provider orchestration
+Runs Groq Whisper, Sarvam and Bhashini for a clip, in the order chosen per
+language by services.provider_router (fastest healthy provider first).
+
+ASR_MODE=hedged (default): the first provider starts immediately; if it has
+not returned an acceptable transcript within ASR_HEDGE_DELAY_MS (or fails
+sooner), the next one is started too. The first acceptable transcript wins and
+the others are cancelled, so a degraded provider costs at most the hedge delay.
+ASR_MODE=sequential: the next provider only starts after the previous one fails.
+ASR_MODE=ab: each request picks one of the two at random, so /voice/stats
+compares their p50/p99 under the same traffic.
+
+WAV/PCM clips are first downmixed, resampled and silence-trimmed
+(services.audio_preprocess). Long WAV recordings are split at silence into
+overlapping chunks, transcribed concurrently (ASR_CHUNK_CONCURRENCY) and
+stitched with overlap dedup. Per-provider latency, win rates and end-to-end
+p50/p99 per mode and per input kind (preprocessed / raw WAV / compressed) are
+kept in memory.
+"""
+import os
+import time
+import base64
+import random
+import asyncio
+from collections import defaultdict, deque
+from typing import BinaryIO, Deque, Dict, List, Optional, Tuple, Union
+
+from services import (
+    audio_preprocess, bhashini, groq_whisper, lang_id, provider_router, sarvam, transcription_cache,
+)
+from services.groq_whisper import transcribe_file as groq_transcribe_file
+from services.sarvam import transcribe_audio as sarvam_transcribe_audio
+
+ASR_MODE = os.getenv("ASR_MODE", "hedged")
+ASR_HEDGE_DELAY_MS = int(os.getenv("ASR_HEDGE_DELAY_MS", "1500"))
+ASR_CHUNK_SECONDS = float(os.getenv("ASR_CHUNK_SECONDS", "30"))
+ASR_CHUNK_OVERLAP_SECONDS = float(os.getenv("ASR_CHUNK_OVERLAP_SECONDS", "1.0"))
+ASR_CHUNK_CONCURRENCY = int(os.getenv("ASR_CHUNK_CONCURRENCY", "4"))
+ASR_STITCH_MAX_WORDS = 12
+
+_SAMPLE_WINDOW = 1000
+
+_provider_latency: Dict[str, Deque[float]] = defaultdict(lambda: deque(maxlen=_SAMPLE_WINDOW))
+_mode_latency: Dict[str, Deque[float]] = defaultdict(lambda: deque(maxlen=_SAMPLE_WINDOW))
+_input_latency: Dict[str, Deque[float]] = defaultdict(lambda: deque(maxlen=_SAMPLE_WINDOW))
+_counters: Dict[str, Dict[str, int]] = defaultdict(lambda: {"calls": 0, "acceptable": 0, "wins": 0, "cancelled": 0})
+_mode_counters: Dict[str, Dict[str, int]] = defaultdict(lambda: {
+    "requests": 0, "backup_started": 0, "no_transcript": 0, "chunked": 0, "chunks": 0,
+})
+
+
+def _acceptable(result: dict) -> bool:
+    return not result.get("error") and bool((result.get("transcript") or "").strip())
+
+
+# ─── Providers ──────────────────────────────────────────────────────────────
+
+# `audio` is bytes, or for uploads a binary file object streamed to the provider
+
+async def _groq(audio: Union[bytes, BinaryIO], source_lang: str, audio_format: str) -> dict:
+    return await groq_transcribe_file(audio, source_lang, audio_format)
+
+
+async def _sarvam(audio: Union[bytes, BinaryIO], source_lang: str, audio_format: str) -> dict:
+    lang = source_lang if source_lang != "auto" else "hi"
+    return await sarvam_transcribe_audio(audio, lang, audio_format)
+
+
+async def _bhashini(audio: Union[bytes, BinaryIO], source_lang: str, audio_format: str) -> dict:
+    # Bhashini takes base64 inside a JSON body, so a file has to be read in full
+    audio_bytes = audio if isinstance(audio, bytes) else await asyncio.to_thread(audio.read)
+    result = await bhashini.transcribe_and_translate(base64.b64encode(audio_bytes).decode(), source_lang)
+    return {
+        "transcript": result.get("original_transcript", ""),
+        "english_translation": result.get("english_translation", ""),
+        "detected_language": source_lang,
+        "language": source_lang,
+        "provider": "bhashini",
+        **({"error": result["error"]} if result.get("error") else {}),
+    }
+
+
+_PROVIDERS = {"groq_whisper": _groq, "sarvam": _sarvam, "bhashini": _bhashini}
+
+provider_router.register("groq_whisper", lambda: bool(groq_whisper.GROQ_API_KEY))
+provider_router.register("sarvam", lambda: bool(sarvam.SARVAM_API_KEY))
+# Bhashini needs an explicit non-English language (its pipeline is ASR + NMT to English)
+provider_router.register(
+    "bhashini",
+    bhashini.is_configured,
+    lambda lang: lang in bhashini.SUPPORTED_LANGUAGES and lang != "en",
+)
+
+
+async def _call(
+    provider: str, audio: Union[bytes, BinaryIO], source_lang: str, audio_format: str
+) -> Tuple[str, dict]:
+    """Run one provider, recording its latency and outcome here and in the provider router."""
+    if not isinstance(audio, bytes):
+        audio.seek(0)       # a file may have been read by the provider tried before
+    started = time.monotonic()
+    _counters[provider]["calls"] += 1
+    provider_router.begin(provider)
+    try:
+        result = await _PROVIDERS[provider](audio, source_lang, audio_format)
+    except asyncio.CancelledError:
+        _counters[provider]["cancelled"] += 1
+        provider_router.release(provider)
+        raise
+    except Exception as e:
+        result = {"transcript": "", "provider": provider, "error": str(e)}
+    latency_ms = (time.monotonic() - started) * 1000
+    _provider_latency[provider].append(latency_ms)
+    usable = _acceptable(result)
+    if usable:
+        _counters[provider]["acceptable"] += 1
+    provider_router.record(provider, source_lang, latency_ms, ok=not result.get("error"), usable=usable)
+    return provider, result
+
+
+async def _sequential(
+    audio: Union[bytes, BinaryIO], source_lang: str, audio_format: str, providers: List[str]
+) -> Tuple[str, dict, bool]:
+    first: Optional[Tuple[str, dict]] = None
+    for attempt, name in enumerate(providers):
+        provider, result = await _call(name, audio, source_lang, audio_format)
+        if _acceptable(result):
+            return provider, result, attempt > 0
+        first = first or (provider, result)
+    return first[0], first[1], len(providers) > 1
+
+
+async def _hedged(
+    audio_bytes: bytes, source_lang: str, audio_format: str, providers: List[str], delay_s: float
+) -> Tuple[str, dict, bool]:
+    """
+    Start providers[0]; each time `delay_s` passes without a usable answer — or
+    everything in flight has failed — start the next one. First usable wins.
+    """
+    pending = set()
+    launched = 0
+    first: Optional[Tuple[str, dict]] = None
+
+    def _launch() -> None:
+        nonlocal launched
+        pending.add(asyncio.create_task(_call(providers[launched], audio_bytes, source_lang, audio_format)))
+        launched += 1
+
+    _launch()
+    try:
+        while pending:
+            more = launched < len(providers)
+            done, pending = await asyncio.wait(
+                pending, timeout=delay_s if more else None, return_when=asyncio.FIRST_COMPLETED
+            )
+            for task in done:
+                provider, result = task.result()
+                if _acceptable(result):
+                    return provider, result, launched > 1
+                first = first or (provider, result)
+            if more and (not done or not pending):
+                _launch()
+    finally:
+        for task in pending:
+            task.cancel()
+    return first[0], first[1], launched > 1
+
+
+async def _transcribe_one(
+    audio_bytes: bytes, source_lang: str, audio_format: str, mode: str
+) -> Tuple[str, dict]:
+    """Run one clip (or chunk) through the routed providers and record the outcome."""
+    providers = provider_router.order(source_lang)
+    if mode == "sequential":
+        provider, result, backup_started = await _sequential(audio_bytes, source_lang, audio_format, providers)
+    else:
+        provider, result, backup_started = await _hedged(
+            audio_bytes, source_lang, audio_format, providers, ASR_HEDGE_DELAY_MS / 1000
+        )
+    if backup_started:
+        _mode_counters[mode]["backup_started"] += 1
+    if _acceptable(result):
+        _counters[provider]["wins"] += 1
+    return provider, result
+
+
+# ─── Long recordings ────────────────────────────────────────────────────────
+
+def _words(text: str) -> list:
+    return [w.strip(".,!?;:।\"'()").lower() for w in text.split()]
+
+
+def _stitch(previous: str, current: str) -> str:
+    """
+    Drop the words at the start of `current` that repeat the end of `previous`
+    (both chunks heard the overlap). Longest suffix/prefix match wins.
+    """
+    prev_words, cur_words = _words(previous), _words(current)
+    limit = min(len(prev_words), len(cur_words), ASR_STITCH_MAX_WORDS)
+    for n in range(limit, 0, -1):
+        if prev_words[-n:] == cur_words[:n]:
+            return " ".join(current.split()[n:])
+    return current
+
+
+async def _transcribe_chunks(
+    chunks: List[Tuple[float, float, bytes]], source_lang: str, mode: str
+) -> dict:
+    """Transcribe overlapping chunks concurrently and stitch them in order."""
+    semaphore = asyncio.Semaphore(ASR_CHUNK_CONCURRENCY)
+
+    async def _one(chunk_bytes: bytes) -> Tuple[str, dict]:
+        async with semaphore:
+            return await _transcribe_one(chunk_bytes, source_lang, "wav", mode)
+
+    outcomes = await asyncio.gather(*(_one(chunk) for _, _, chunk in chunks))
+
+    segments = []
+    pieces = []
+    for index, ((start_s, end_s, _), (provider, result)) in enumerate(zip(chunks, outcomes)):
+        text = (result.get("transcript") or "").strip()
+        if pieces and text:
+            text = _stitch(pieces[-1], text)
+        if text:
+            pieces.append(text)
+        segments.append({
+            "index": index,
+            "start": start_s,
+            "end": end_s,
+            "text": text,
+            "provider": provider,
+            **({"error": result["error"]} if result.get("error") else {}),
+        })
+
+    first = next((r for _, r in outcomes if _acceptable(r)), outcomes[0][1])
+    detected = first.get("detected_language") or first.get("language") or source_lang
+    return {
+        "transcript": " ".join(pieces),
+        "detected_language": detected,
+        "language_name": first.get("language_name", detected),
+        "provider": "+".join(sorted({p for p, r in outcomes if _acceptable(r)})) or first.get("provider"),
+        "segments": segments,
+        "chunked": True,
+        **({} if pieces else {"error": first.get("error", "No speech recognised")}),
+    }
+
+
+async def transcribe(
+    audio_bytes: bytes,
+    source_lang: str = "auto",
+    audio_format: str = "webm",
+    mode: Optional[str] = None,
+) -> dict:
+    """
+    Transcribe a clip with Groq + Sarvam according to `mode` (defaults to ASR_MODE).
+    Returns the winning provider's result; `provider` says which one it was.
+    WAV clips longer than ASR_CHUNK_SECONDS are split at silence and transcribed
+    in parallel; the stitched result carries per-chunk `segments` with timings.
+    """
+    mode = mode or ASR_MODE
+    if mode == "ab":
+        mode = random.choice(("hedged", "sequential"))
+    mode = "sequential" if mode == "sequential" else "hedged"
+    started = time.monotonic()
+    audio_bytes, audio_format, prep = await asyncio.to_thread(
+        audio_preprocess.preprocess, audio_bytes, audio_format
+    )
+
+    chunks = [(0.0, 0.0, audio_bytes)]
+    if audio_preprocess.is_wav(audio_bytes):
+        chunks = await asyncio.to_thread(
+            audio_preprocess.split_wav, audio_bytes, ASR_CHUNK_SECONDS, ASR_CHUNK_OVERLAP_SECONDS
+        )
+
+    if len(chunks) > 1:
+        result = await _transcribe_chunks(chunks, source_lang, mode)
+        _mode_counters[mode]["chunked"] += 1
+        _mode_counters[mode]["chunks"] += len(chunks)
+    else:
+        _, result = await _transcribe_one(audio_bytes, source_lang, audio_format, mode)
+
+    elapsed_ms = (time.monotonic() - started) * 1000
+    _mode_latency[mode].append(elapsed_ms)
+    _input_latency[prep["input"]].append(elapsed_ms)
+    _mode_counters[mode]["requests"] += 1
+    if not _acceptable(result):
+        _mode_counters[mode]["no_transcript"] += 1
+    return result
+
+
+async def transcribe_file(f: BinaryIO, source_lang: str = "auto", audio_format: str = "webm") -> dict:
+    """
+    Transcribe a compressed upload straight from its file object, through the
+    same routing, breakers and fallbacks as transcribe(). Providers are tried
+    one after another (a file can't feed two requests at once), rewinding
+    before each; no preprocessing or chunking, which only apply to WAV.
+    """
+    provider, result, _ = await _sequential(f, source_lang, audio_format, provider_router.order(source_lang))
+    if _acceptable(result):
+        _counters[provider]["wins"] += 1
+    return result
+
+
+def _percentile(samples, q: float) -> Optional[float]:
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    return round(ordered[min(len(ordered) - 1, int(q * len(ordered)))], 1)
+
+
+def stats() -> dict:
+    """Per-provider win rates / latency, end-to-end p50/p99 per ASR mode and input kind."""
+    total_wins = sum(c["wins"] for c in _counters.values())
+    return {
+        "mode": ASR_MODE,
+        "hedge_delay_ms": ASR_HEDGE_DELAY_MS,
+        "providers": {
+            name: {
+                **counts,
+                "win_rate": round(counts["wins"] / total_wins, 3) if total_wins else None,
+                "p50_ms": _percentile(_provider_latency[name], 0.50),
+                "p99_ms": _percentile(_provider_latency[name], 0.99),
+            }
+            for name, counts in _counters.items()
+        },
+        "end_to_end": {
+            name: {
+                **counts,
+                "p50_ms": _percentile(_mode_latency[name], 0.50),
+                "p99_ms": _percentile(_mode_latency[name], 0.99),
+            }
+            for name, counts in _mode_counters.items()
+        },
+        "by_input": {
+            name: {
+                "requests": len(samples),
+                "p50_ms": _percentile(samples, 0.50),
+                "p99_ms": _percentile(samples, 0.99),
+            }
+            for name, samples in _input_latency.items()
+        },
+        "preprocess": audio_preprocess.stats(),
+        "language_id": lang_id.stats(),
+        "dedup": transcription_cache.stats(),
+    }
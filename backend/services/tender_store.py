@@ -0,0 +1,273 @@
+"""
+Tender Store Service
+Local SQLite store for live tenders polled from RSS feeds.
+Content-hash IDs deduplicate tenders across feeds and polls, an FTS5 index
+covers title/description/sectors, and tenders expire by deadline (or after
+TENDER_RETENTION_DAYS without being seen again).
+"""
+import os
+import re
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from datetime import datetime
+from email.utils import parsedate_to_datetime
+from typing import List, Optional
+
+TENDER_DB_PATH = os.getenv("TENDER_DB_PATH", "./tenders.db")
+TENDER_RETENTION_DAYS = int(os.getenv("TENDER_RETENTION_DAYS", "30"))
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS tenders (
+    id          TEXT PRIMARY KEY,
+    title       TEXT NOT NULL,
+    description TEXT,
+    sectors     TEXT,               -- JSON list
+    regions     TEXT,               -- JSON list
+    portal      TEXT,
+    portal_url  TEXT,
+    link        TEXT,
+    category    TEXT,
+    type        TEXT,
+    deadline    TEXT,
+    published   TEXT,
+    value_range TEXT,
+    eligibility TEXT,
+    expires_at  REAL NOT NULL,
+    first_seen  REAL NOT NULL,
+    last_seen   REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS ix_tenders_expires_at ON tenders(expires_at);
+CREATE INDEX IF NOT EXISTS ix_tenders_last_seen ON tenders(last_seen);
+
+CREATE VIRTUAL TABLE IF NOT EXISTS tenders_fts USING fts5(
+    title, description, sectors,
+    content='tenders', content_rowid='rowid'
+);
+
+CREATE TRIGGER IF NOT EXISTS tenders_ai AFTER INSERT ON tenders BEGIN
+    INSERT INTO tenders_fts(rowid, title, description, sectors)
+    VALUES (new.rowid, new.title, new.description, new.sectors);
+END;
+CREATE TRIGGER IF NOT EXISTS tenders_ad AFTER DELETE ON tenders BEGIN
+    INSERT INTO tenders_fts(tenders_fts, rowid, title, description, sectors)
+    VALUES ('delete', old.rowid, old.title, old.description, old.sectors);
+END;
+CREATE TRIGGER IF NOT EXISTS tenders_au AFTER UPDATE OF title, description, sectors ON tenders BEGIN
+    INSERT INTO tenders_fts(tenders_fts, rowid, title, description, sectors)
+    VALUES ('delete', old.rowid, old.title, old.description, old.sectors);
+    INSERT INTO tenders_fts(rowid, title, description, sectors)
+    VALUES (new.rowid, new.title, new.description, new.sectors);
+END;
+"""
+
+_COLUMNS = (
+    "id", "title", "description", "sectors", "regions", "portal", "portal_url",
+    "link", "category", "type", "deadline", "published", "value_range", "eligibility",
+)
+
+_conn: Optional[sqlite3.Connection] = None
+_lock = threading.Lock()
+
+
+def _get_conn() -> sqlite3.Connection:
+    global _conn
+    if _conn is None:
+        conn = sqlite3.connect(TENDER_DB_PATH, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.executescript(_SCHEMA)
+        _conn = conn
+    return _conn
+
+
+# ─── IDs & dates ────────────────────────────────────────────────────────────
+
+def _normalize_title(title: str) -> str:
+    return " ".join(re.sub(r"[^\w\s]", " ", title.lower()).split())
+
+
+# CPPP/NIC tender IDs (2024_MoD_123456_1) and GeM bid numbers (GEM/2024/B/1234567)
+_TENDER_REF = re.compile(r"\b(\d{4}_[A-Za-z0-9]+_\d+_\d+|GEM/\d{4}/[A-Z]/\d+)\b", re.IGNORECASE)
+
+
+def tender_reference(*texts: Optional[str]) -> Optional[str]:
+    """The portal's own tender reference, if the link or description carries one."""
+    for text in texts:
+        match = _TENDER_REF.search(text or "")
+        if match:
+            return match.group(1).upper()
+    return None
+
+
+def tender_id(title: str, link: str = "", description: str = "", published: str = "") -> str:
+    """
+    Stable content-hash ID — the same notice gets the same ID in every feed and
+    process. Generic titles ("Supply of stationery items") are shared by many
+    notices, so the hash also covers the tender reference from the link or
+    description, or failing that the publication date — as a calendar date,
+    since feeds format it differently (RFC-822, ISO, dd-mm-yyyy).
+    """
+    published_at = _parse_datetime(published)
+    published = published_at.date().isoformat() if published_at else (published or "").strip()
+    discriminator = tender_reference(link, description) or published
+    key = _normalize_title(title)
+    if discriminator:
+        key = f"{key}\x1f{discriminator.lower()}"
+    digest = hashlib.sha256(key.encode("utf-8")).hexdigest()
+    return f"rss-{digest[:16]}"
+
+
+_DATE_FORMATS = ("%d-%m-%Y", "%d/%m/%Y", "%Y-%m-%d", "%d-%b-%Y", "%d %b %Y")
+
+
+def _parse_datetime(value: Optional[str]) -> Optional[datetime]:
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        return parsedate_to_datetime(value)
+    except (TypeError, ValueError, IndexError):
+        pass
+    try:
+        return datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except ValueError:
+        pass
+    for fmt in _DATE_FORMATS:
+        try:
+            return datetime.strptime(value, fmt)
+        except ValueError:
+            continue
+    return None
+
+
+def parse_date(value: Optional[str]) -> Optional[float]:
+    parsed = _parse_datetime(value)
+    return parsed.timestamp() if parsed else None
+
+
+def _expires_at(item: dict, now: float) -> float:
+    """Deadline if the feed gave one, otherwise the retention window from last sighting."""
+    deadline = item.get("deadline")
+    if deadline and deadline != item.get("published"):
+        deadline_ts = parse_date(deadline)
+        if deadline_ts is not None:
+            return deadline_ts
+    return now + TENDER_RETENTION_DAYS * 86400
+
+
+def _row_to_dict(row: sqlite3.Row) -> dict:
+    item = {col: row[col] for col in _COLUMNS}
+    item["sectors"] = json.loads(item["sectors"] or "[]")
+    item["regions"] = json.loads(item["regions"] or "[]")
+    return item
+
+
+# ─── Public API ─────────────────────────────────────────────────────────────
+
+def upsert_many(items: List[dict]) -> List[dict]:
+    """
+    Insert new tenders and refresh `last_seen` on ones already stored.
+    Returns only the tenders that were not in the store before.
+    """
+    now = time.time()
+    new_items = []
+    seen = set()
+    with _lock:
+        conn = _get_conn()
+        with conn:
+            for item in items:
+                tid = item.get("id") or tender_id(
+                    item["title"], item.get("link") or "", item.get("description") or "", item.get("published") or "",
+                )
+                if tid in seen:
+                    continue
+                seen.add(tid)
+
+                expires_at = _expires_at(item, now)
+                updated = conn.execute(
+                    "UPDATE tenders SET last_seen = ?, expires_at = MAX(expires_at, ?) WHERE id = ?",
+                    (now, expires_at, tid),
+                ).rowcount
+                if updated:
+                    continue
+
+                record = {**item, "id": tid}
+                values = [record.get(col) for col in _COLUMNS]
+                values[_COLUMNS.index("sectors")] = json.dumps(record.get("sectors", []))
+                values[_COLUMNS.index("regions")] = json.dumps(record.get("regions", []))
+                conn.execute(
+                    f"INSERT INTO tenders ({', '.join(_COLUMNS)}, expires_at, first_seen, last_seen) "
+                    f"VALUES ({', '.join('?' * len(_COLUMNS))}, ?, ?, ?)",
+                    (*values, expires_at, now, now),
+                )
+                new_items.append(record)
+    return new_items
+
+
+def expire(now: Optional[float] = None) -> int:
+    """Delete tenders past their deadline / retention window. Returns rows removed."""
+    now = now or time.time()
+    with _lock:
+        conn = _get_conn()
+        with conn:
+            return conn.execute("DELETE FROM tenders WHERE expires_at < ?", (now,)).rowcount
+
+
+def active_tenders(limit: int = 50000) -> List[dict]:
+    """All unexpired tenders, most recently seen first."""
+    with _lock:
+        rows = _get_conn().execute(
+            f"SELECT {', '.join(_COLUMNS)} FROM tenders WHERE expires_at >= ? "
+            "ORDER BY last_seen DESC, rowid DESC LIMIT ?",
+            (time.time(), limit),
+        ).fetchall()
+    return [_row_to_dict(r) for r in rows]
+
+
+def search(query: str, limit: int = 20) -> List[dict]:
+    """FTS5 keyword search over title, description and sectors, best match first."""
+    terms = re.findall(r"\w+", query)
+    if not terms:
+        return []
+    match = " OR ".join(f'"{t}"' for t in terms)
+    with _lock:
+        rows = _get_conn().execute(
+            f"SELECT {', '.join('t.' + c for c in _COLUMNS)}, bm25(tenders_fts) AS rank "
+            "FROM tenders_fts JOIN tenders t ON t.rowid = tenders_fts.rowid "
+            "WHERE tenders_fts MATCH ? AND t.expires_at >= ? "
+            "ORDER BY rank LIMIT ?",
+            (match, time.time(), limit),
+        ).fetchall()
+    return [_row_to_dict(r) for r in rows]
+
+
+def get_many(ids: List[str]) -> List[dict]:
+    """Fetch unexpired tenders by ID (missing or expired IDs are skipped)."""
+    if not ids:
+        return []
+    with _lock:
+        rows = _get_conn().execute(
+            f"SELECT {', '.join(_COLUMNS)} FROM tenders "
+            f"WHERE id IN ({', '.join('?' * len(ids))}) AND expires_at >= ?",
+            (*ids, time.time()),
+        ).fetchall()
+    return [_row_to_dict(r) for r in rows]
+
+
+def count() -> int:
+    with _lock:
+        return _get_conn().execute(
+            "SELECT COUNT(*) FROM tenders WHERE expires_at >= ?", (time.time(),)
+        ).fetchone()[0]
+
+
+def revision() -> str:
+    """Cheap fingerprint that changes whenever tenders are added or removed."""
+    with _lock:
+        total, max_rowid = _get_conn().execute(
+            "SELECT COUNT(*), COALESCE(MAX(rowid), 0) FROM tenders"
+        ).fetchone()
+    return f"tenders:{total}:{max_rowid}"
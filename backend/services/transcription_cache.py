@@ -0,0 +1,110 @@
+"""
+Transcription Cache Service — dedupes re-uploaded recordings
+Flaky mobile networks make the frontend resend the same clip. Results are
+cached by SHA-256 of the decoded audio bytes + source_lang in a bounded,
+TTL'd in-memory LRU, and concurrent requests for the same key share one
+in-flight transcription (single-flight) instead of each calling a provider.
+Only usable transcripts are cached; failures are retried on the next request.
+"""
+import os
+import time
+import asyncio
+import hashlib
+import tempfile
+from collections import OrderedDict
+from typing import Awaitable, BinaryIO, Callable, Dict
+
+TRANSCRIPTION_CACHE_SIZE = int(os.getenv("TRANSCRIPTION_CACHE_SIZE", "500"))
+TRANSCRIPTION_CACHE_TTL = int(os.getenv("TRANSCRIPTION_CACHE_TTL", "600"))
+
+_HASH_CHUNK = 1024 * 1024
+_COPY_SPOOL_BYTES = 1024 * 1024       # copies larger than this go to disk
+
+_cache: "OrderedDict[str, tuple]" = OrderedDict()     # key → (result, expires_at)
+_inflight: Dict[str, asyncio.Task] = {}
+_stats = {"hits": 0, "shared": 0, "misses": 0, "stored": 0}
+
+
+def key_for_bytes(audio_bytes: bytes, source_lang: str) -> str:
+    return f"{hashlib.sha256(audio_bytes).hexdigest()}:{source_lang}"
+
+
+def key_for_file(f: BinaryIO, source_lang: str) -> str:
+    """Hash a (spooled) upload in chunks, without reading it into memory."""
+    digest = hashlib.sha256()
+    f.seek(0)
+    while chunk := f.read(_HASH_CHUNK):
+        digest.update(chunk)
+    return f"{digest.hexdigest()}:{source_lang}"
+
+
+def copy_file(f: BinaryIO) -> BinaryIO:
+    """
+    Copy an upload for a computation that may outlive the request whose form
+    files get closed. The copy is rewound and deleted once closed.
+    """
+    copy = tempfile.SpooledTemporaryFile(max_size=_COPY_SPOOL_BYTES)
+    f.seek(0)
+    while chunk := f.read(_HASH_CHUNK):
+        copy.write(chunk)
+    copy.seek(0)
+    return copy
+
+
+def covers(key: str) -> bool:
+    """Whether a fresh cached result or an in-flight computation exists for `key`."""
+    entry = _cache.get(key)
+    return bool(entry and entry[1] > time.monotonic()) or key in _inflight
+
+
+def _usable(result: dict) -> bool:
+    return not result.get("error") and bool((result.get("transcript") or "").strip())
+
+
+def _store(key: str, result: dict) -> None:
+    _cache[key] = (result, time.monotonic() + TRANSCRIPTION_CACHE_TTL)
+    _cache.move_to_end(key)
+    while len(_cache) > TRANSCRIPTION_CACHE_SIZE:
+        _cache.popitem(last=False)
+    _stats["stored"] += 1
+
+
+async def get_or_compute(key: str, compute: Callable[[], Awaitable[dict]]) -> dict:
+    """
+    Return the cached result for `key`, join an in-flight computation for it,
+    or start one. The computation runs as its own task, so a client that
+    disconnects doesn't cancel it for the others waiting on the same clip.
+    """
+    entry = _cache.get(key)
+    if entry and entry[1] > time.monotonic():
+        _cache.move_to_end(key)
+        _stats["hits"] += 1
+        return entry[0]
+
+    task = _inflight.get(key)
+    if task is not None:
+        _stats["shared"] += 1
+    else:
+        _stats["misses"] += 1
+        task = asyncio.create_task(compute())
+        _inflight[key] = task
+
+        def _done(t: asyncio.Task) -> None:
+            _inflight.pop(key, None)
+            if not t.cancelled() and t.exception() is None and _usable(t.result()):
+                _store(key, t.result())
+
+        task.add_done_callback(_done)
+    return await asyncio.shield(task)
+
+
+def stats() -> dict:
+    lookups = _stats["hits"] + _stats["shared"] + _stats["misses"]
+    return {
+        **_stats,
+        "dedup_rate": round((_stats["hits"] + _stats["shared"]) / lookups, 3) if lookups else None,
+        "entries": len(_cache),
+        "in_flight": len(_inflight),
+        "capacity": TRANSCRIPTION_CACHE_SIZE,
+        "ttl_seconds": TRANSCRIPTION_CACHE_TTL,
+    }
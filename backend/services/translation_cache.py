@@ -0,0 +1,143 @@
+"""
+Translation Cache Service
+Two-tier cache for Sarvam translations keyed by (normalized text, source_lang, model):
+an in-memory LRU in front of a local SQLite store with TTL. Onboarding re-translates
+the same short phrases (business types, city names) constantly, so most lookups
+never leave the process.
+"""
+import os
+import time
+import sqlite3
+import hashlib
+import threading
+import unicodedata
+from collections import OrderedDict
+from typing import Dict, Iterable, Optional
+
+TRANSLATION_CACHE_DB = os.getenv("TRANSLATION_CACHE_DB", "./translation_cache.db")
+TRANSLATION_CACHE_TTL = int(os.getenv("TRANSLATION_CACHE_TTL", str(30 * 86400)))
+TRANSLATION_CACHE_SIZE = int(os.getenv("TRANSLATION_CACHE_SIZE", "5000"))
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS translations (
+    key         TEXT PRIMARY KEY,
+    source_lang TEXT NOT NULL,
+    model       TEXT NOT NULL,
+    text        TEXT NOT NULL,
+    translation TEXT NOT NULL,
+    expires_at  REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS ix_translations_expires_at ON translations(expires_at);
+"""
+
+_memory: "OrderedDict[str, tuple]" = OrderedDict()    # key → (translation, expires_at)
+_lock = threading.Lock()
+_conn: Optional[sqlite3.Connection] = None
+_stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "writes": 0}
+
+
+def _get_conn() -> sqlite3.Connection:
+    global _conn
+    if _conn is None:
+        conn = sqlite3.connect(TRANSLATION_CACHE_DB, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.executescript(_SCHEMA)
+        with conn:
+            # Persistent tier TTL: expired rows are ignored on read and purged on open
+            conn.execute("DELETE FROM translations WHERE expires_at <= ?", (time.time(),))
+        _conn = conn
+    return _conn
+
+
+def normalize(text: str) -> str:
+    """NFC + collapsed whitespace — the same phrase typed twice maps to one entry."""
+    return " ".join(unicodedata.normalize("NFC", text).split())
+
+
+def _key(text: str, source_lang: str, model: str) -> str:
+    raw = f"{model}\x1f{source_lang}\x1f{normalize(text)}"
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def _remember(key: str, translation: str, expires_at: float) -> None:
+    _memory[key] = (translation, expires_at)
+    _memory.move_to_end(key)
+    while len(_memory) > TRANSLATION_CACHE_SIZE:
+        _memory.popitem(last=False)
+
+
+def get_many(texts: Iterable[str], source_lang: str, model: str) -> Dict[str, str]:
+    """
+    Batch lookup. Returns {text: translation} for every text found in either tier;
+    memory misses are resolved with a single SQLite query.
+    """
+    now = time.time()
+    found: Dict[str, str] = {}
+    pending: Dict[str, str] = {}       # key → text
+    with _lock:
+        for text in texts:
+            key = _key(text, source_lang, model)
+            entry = _memory.get(key)
+            if entry and entry[1] > now:
+                _memory.move_to_end(key)
+                found[text] = entry[0]
+                _stats["memory_hits"] += 1
+            else:
+                pending[key] = text
+
+        if pending:
+            keys = list(pending)
+            rows = _get_conn().execute(
+                f"SELECT key, translation, expires_at FROM translations "
+                f"WHERE key IN ({', '.join('?' * len(keys))}) AND expires_at > ?",
+                (*keys, now),
+            ).fetchall()
+            for key, translation, expires_at in rows:
+                found[pending.pop(key)] = translation
+                _remember(key, translation, expires_at)
+                _stats["disk_hits"] += 1
+            _stats["misses"] += len(pending)
+    return found
+
+
+def get(text: str, source_lang: str, model: str) -> Optional[str]:
+    return get_many([text], source_lang, model).get(text)
+
+
+def put_many(translations: Dict[str, str], source_lang: str, model: str) -> None:
+    """Store {text: translation} pairs in both tiers."""
+    if not translations:
+        return
+    expires_at = time.time() + TRANSLATION_CACHE_TTL
+    rows = []
+    with _lock:
+        for text, translation in translations.items():
+            key = _key(text, source_lang, model)
+            _remember(key, translation, expires_at)
+            rows.append((key, source_lang, model, normalize(text), translation, expires_at))
+        conn = _get_conn()
+        with conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO translations "
+                "(key, source_lang, model, text, translation, expires_at) VALUES (?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+        _stats["writes"] += len(rows)
+
+
+def put(text: str, source_lang: str, model: str, translation: str) -> None:
+    put_many({text: translation}, source_lang, model)
+
+
+def stats() -> dict:
+    with _lock:
+        lookups = _stats["memory_hits"] + _stats["disk_hits"] + _stats["misses"]
+        hits = _stats["memory_hits"] + _stats["disk_hits"]
+        return {
+            **_stats,
+            "lookups": lookups,
+            "hit_rate": round(hits / lookups, 3) if lookups else None,
+            "memory_entries": len(_memory),
+            "memory_capacity": TRANSLATION_CACHE_SIZE,
+            "ttl_seconds": TRANSLATION_CACHE_TTL,
+        }